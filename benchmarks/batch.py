@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+'''
+Multi-shot comboPlot benchmark for MuseAnalysis.
+
+Writes N synthetic shots, then runs them through comboPlot once shot by
+shot (comboPlot.run) and once through the stage pipeline
+(comboPlot.pipeline), each in a fresh interpreter, and reports shots/s.
+For the pipeline it also reports each stage's busy time per slot, from
+the scheduler's instrumentation: the largest is the bound on the batch
+time. Overlap needs as many cores as the stages' limits add up to.
+
+usage: python benchmarks/batch.py [-n 8] [-l compute=2 -l render=1 ...]
+'''
+
+
+def worker(root, shots, how, limits):
+    '''
+    run the shots one way in this process, print wall seconds and the
+    per-stage records as JSON
+    '''
+    import matplotlib
+    matplotlib.use("Agg")
+
+    from MuseAnalysis import comboPlot, figures, instrument
+
+    os.chdir(root)
+    data_path = os.path.join(root, "data", "")
+    figures.mode = "reuse"
+
+    log = os.path.join(root, f"{how}.jsonl")
+    if how == "pipeline":
+        instrument.enable(log, memory=False)
+
+    t = time.perf_counter()
+    if how == "serial":
+        for shot in shots:
+            comboPlot.run(shot, data_path)
+    else:
+        comboPlot.pipeline(shots, data_path, limits)
+    wall = time.perf_counter() - t
+    instrument.disable()
+
+    busy = {}
+    if os.path.exists(log):
+        with open(log) as f:
+            for line in f:
+                rec = json.loads(line)
+                if rec["stage"].startswith("pipeline."):
+                    name = rec["stage"].split(".", 1)[1]
+                    busy[name] = busy.get(name, 0.0) + rec["wall_s"]
+
+    print(json.dumps(dict(wall=wall, busy=busy)))
+
+
+def main():
+    from MuseAnalysis.synthetic import makeShot
+
+    parser = argparse.ArgumentParser(description="multi-shot comboPlot benchmark")
+    parser.add_argument("-n", type=int, default=8, help="shots")
+    parser.add_argument("-l", "--limit", action="append", default=[], metavar="STAGE=N")
+    parser.add_argument("--worker", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        root, shots, how, limits = args.worker
+        worker(root, shots.split(","), how, json.loads(limits))
+        return
+
+    limits = {}
+    for item in args.limit:
+        name, _, n = item.partition("=")
+        limits[name] = int(n)
+
+    with tempfile.TemporaryDirectory(prefix="musebench") as root:
+        shots = [f"2312{k:05d}" for k in range(args.n)]
+        for k, shot in enumerate(shots):
+            makeShot(os.path.join(root, "data"), shot, seed=k)
+
+        print(f"{args.n} shots, {os.cpu_count()} cores, limits {limits or 'default'}")
+        for how in ["serial", "pipeline"]:
+            cmd = [sys.executable, __file__, "--worker", root, ",".join(shots), how, json.dumps(limits)]
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            res = json.loads(out.splitlines()[-1])
+            print(f"{how:9s} {res['wall']:7.2f} s  {args.n / res['wall']:6.2f} shots/s")
+
+            if res["busy"]:
+                from MuseAnalysis.comboPlot import stages
+                for name, stage in stages(limits).items():
+                    per_slot = res["busy"].get(name, 0.0) / stage.limit
+                    print(f"  {name:8s} {stage.kind:8s} x{stage.limit:<3d} busy {per_slot:7.2f} s per slot")
+
+
+if __name__ == "__main__":
+    main()
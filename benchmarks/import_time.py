@@ -0,0 +1,87 @@
+import argparse
+import subprocess
+import sys
+
+'''
+Import-time benchmark for MuseAnalysis.
+
+Each module is imported in a fresh interpreter. The run fails if a module
+drags in matplotlib or scipy at import time, or exceeds the time budget.
+
+usage: python benchmarks/import_time.py [--budget 0.5] [--repeat 5]
+'''
+
+MODULES = [
+    "MuseAnalysis",
+    "MuseAnalysis.collect_settings",
+    "MuseAnalysis.RF",
+    "MuseAnalysis.DoubleProbe",
+    "MuseAnalysis.OceanSpectra",
+    "MuseAnalysis.comboPlot",
+    # the other command line tools
+    "MuseAnalysis.archive",
+    "MuseAnalysis.campaign",
+    "MuseAnalysis.fluctuation",
+    "MuseAnalysis.instrument",
+    "MuseAnalysis.lag",
+    "MuseAnalysis.quicklook",
+    "MuseAnalysis.rfevents",
+    "MuseAnalysis.stack",
+    "MuseAnalysis.tiles",
+    "MuseAnalysis.watcher",
+    "MuseAnalysis.window",
+]
+
+# these must only be loaded once a plot or fit is requested
+HEAVY = ["matplotlib", "scipy"]
+
+PROBE = '''
+import sys, time
+t = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(dt, ",".join(heavy))
+'''
+
+
+def timeImport(module, repeat=5):
+    '''
+    Best-of-N wall time (s) to import module in a clean interpreter,
+    and the heavy dependencies it pulled in.
+    '''
+
+    best = float("inf")
+    heavy = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                             capture_output=True, text=True, check=True).stdout.split()
+        best = min(best, float(out[0]))
+        heavy = out[1].split(",") if len(out) > 1 else []
+
+    return best, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MuseAnalysis import-time benchmark")
+    parser.add_argument("-b", "--budget", type=float, default=0.5, help="max seconds per module")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        dt, heavy = timeImport(module, args.repeat)
+        status = "ok"
+        if heavy:
+            status = "FAIL imports " + ",".join(heavy)
+            failed = True
+        elif dt > args.budget:
+            status = f"FAIL over {args.budget:.2f} s"
+            failed = True
+        print(f"{module:32s} {dt*1e3:8.1f} ms  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
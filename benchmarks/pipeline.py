@@ -0,0 +1,188 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+'''
+Pipeline benchmark for MuseAnalysis.
+
+Writes synthetic shots of several sizes, then times and memory-profiles the
+load, filter, fit and render stages of each diagnostic. Results are stored
+as JSON (default benchmarks/results/<commit>.json) and can be compared
+against an earlier run.
+
+usage: python benchmarks/pipeline.py [-s small,medium] [-o out.json] [-c baseline.json]
+'''
+
+# shot sizes, passed to synthetic.makeShot
+SIZES = {
+    "small": dict(duration=10, daq_rate=1000, rf_rate=5, integration=0.02, N_pixels=2048),
+    "medium": dict(duration=60, daq_rate=2000, rf_rate=10, integration=0.01, N_pixels=2048),
+    "large": dict(duration=300, daq_rate=2000, rf_rate=10, integration=0.01, N_pixels=3648),
+}
+
+
+def measure(fn, repeat=3):
+    '''
+    best-of-N wall time (s), plus peak python allocation (MB) of one traced run
+    '''
+
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak / 1e6
+
+
+def stages(path, spec_file, out):
+    '''
+    (diagnostic, stage, callable) for one shot
+    '''
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.OceanSpectra import OceanSpectra
+    from MuseAnalysis.RF import RFpower, getPair
+    from MuseAnalysis.savgol import savgol
+
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    spec = OceanSpectra(spec_file)
+    rf1 = RFpower(path + "RFLog1.txt")
+    rf2 = RFpower(path + "RFLog2.txt")
+    with open(path + "RFLog1.txt") as f:
+        rf_lines = f.readlines()
+
+    def render(fn):
+        def run():
+            fn()
+            plt.close("all")
+        return run
+
+    def filterProbe():
+        # as plotRaw filters them: every channel in one chunked call
+        savgol(np.vstack([probe.raw[p["column"]] for p in probe.channels.channels.values()]), 50, 3)
+
+    def findPeaks():
+        spec.lines, spec.freqs = [], []
+        for f0 in [656.279, 486.135, 434.0462]:
+            spec.findPeak(f0)
+
+    return [
+        ("DoubleProbe", "load", lambda: DoubleProbe(path + "NIDAQtext.txt")),
+        ("DoubleProbe", "filter", filterProbe),
+        ("DoubleProbe", "fit", lambda: probe.plotIV(plot=False)),
+        ("DoubleProbe", "render_IV", render(lambda: probe.plotIV(save=out + "plotIV.png"))),
+        ("DoubleProbe", "render_raw", render(lambda: probe.plotRaw(save=out + "plotRaw.png"))),
+        ("OceanSpectra", "load", lambda: OceanSpectra(spec_file)),
+        ("OceanSpectra", "peaks", findPeaks),
+        ("OceanSpectra", "render_2d", render(lambda: spec.plot2d(j=len(spec.data)//2, save=out + "plot2d.png"))),
+        ("RF", "getPair", lambda: [getPair(line) for line in rf_lines]),
+        ("RF", "load", lambda: RFpower(path + "RFLog1.txt")),
+        ("RF", "render", render(lambda: rf1.plotRF().savefig(out + "plotRF.png"))),
+        ("RF", "render_combo", render(lambda: rf1.comboPlot(rf2).savefig(out + "comboRF.png"))),
+    ]
+
+
+def run(sizes, repeat=3, fixed_width=False):
+
+    from MuseAnalysis.synthetic import makeShot
+
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        for size in sizes:
+            shot = "231223001"
+            path = makeShot(root, shot, fixed_width=fixed_width, **SIZES[size])
+            spec_file = os.path.join(root, "spectroscopy", f"spec_{shot}.txt")
+
+            for diagnostic, stage, fn in stages(path, spec_file, path):
+                wall, peak = measure(fn, repeat)
+                results.append(dict(size=size, diagnostic=diagnostic, stage=stage,
+                                    wall_s=wall, peak_mb=peak))
+                print(f"{size:8s} {diagnostic:13s} {stage:12s} {wall*1e3:10.1f} ms {peak:9.1f} MB")
+
+    return results
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results, baseline, threshold=1.2):
+    '''
+    print time ratios against a baseline run; returns True if any stage regressed
+    '''
+
+    with open(baseline) as f:
+        base = json.load(f)
+    ref = {(r["size"], r["diagnostic"], r["stage"]): r for r in base["results"]}
+
+    print(f"\ncompared to {base['meta']['commit']} (threshold {threshold:.2f}x)")
+    regressed = False
+    for r in results:
+        key = (r["size"], r["diagnostic"], r["stage"])
+        if key not in ref:
+            continue
+        ratio = r["wall_s"] / ref[key]["wall_s"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{key[0]:8s} {key[1]:13s} {key[2]:12s} {ratio:6.2f}x{flag}")
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MuseAnalysis pipeline benchmark")
+    parser.add_argument("-s", "--sizes", default="small,medium", help=f"comma list of {list(SIZES)}")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="results json (default benchmarks/results/<commit>.json)")
+    parser.add_argument("-c", "--compare", help="baseline results json")
+    parser.add_argument("-t", "--threshold", type=float, default=1.2, help="regression ratio")
+    parser.add_argument("--fixed-width", action="store_true", help="fixed-width RF logs instead of csv")
+    args = parser.parse_args()
+
+    results = run(args.sizes.split(","), args.repeat, args.fixed_width)
+
+    commit = gitCommit()
+    out = args.output
+    if out is None:
+        out = os.path.join(os.path.dirname(__file__), "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+
+    meta = dict(commit=commit,
+                date=datetime.datetime.now().isoformat(timespec="seconds"),
+                python=platform.python_version(),
+                numpy=np.__version__,
+                machine=platform.machine())
+    with open(out, "w") as f:
+        json.dump(dict(meta=meta, results=results), f, indent=1)
+    print(f"saved {out}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
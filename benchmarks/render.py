@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+'''
+Batch rendering benchmark for MuseAnalysis.
+
+Renders the same synthetic shot N times in one process through
+comboPlot.run (plotIV, plotRaw, plotRF, RFpower.comboPlot, plot2d and the
+time panel), once per figures mode, in a fresh interpreter each, and
+reports per-shot render time and RSS growth. With template reuse both
+should stay flat over the batch.
+
+usage: python benchmarks/render.py [-n 50] [-m keep,close,reuse]
+'''
+
+
+def worker(root, n, mode):
+    '''
+    render n shots in this process, print per-shot seconds and RSS (MB)
+    '''
+    import matplotlib
+    matplotlib.use("Agg")
+
+    from MuseAnalysis import comboPlot, figures
+
+    figures.mode = mode
+    os.chdir(root)
+    data_path = os.path.join(root, "data", "")
+
+    rows = []
+    for k in range(n):
+        t = time.perf_counter()
+        comboPlot.run(f"2312{k:05d}", data_path)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        rows.append((time.perf_counter() - t, rss))
+
+    print(json.dumps(rows))
+
+
+def makeShots(root, n):
+    '''
+    one synthetic shot linked under n shot numbers
+    '''
+    from MuseAnalysis.synthetic import makeShot
+
+    data = os.path.join(root, "data")
+    spec = os.path.join(data, "spectroscopy")
+    makeShot(data, "231200000")
+    src = os.path.join(spec, "spec_231200000.txt")
+    for k in range(1, n):
+        os.symlink(os.path.join(data, "231200000"), os.path.join(data, f"2312{k:05d}"))
+        os.symlink(src, os.path.join(spec, f"spec_2312{k:05d}.txt"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="batch rendering benchmark")
+    parser.add_argument("-n", type=int, default=50, help="shots per mode")
+    parser.add_argument("-m", "--modes", default="keep,close,reuse")
+    parser.add_argument("--worker", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        root, n, mode = args.worker
+        worker(root, int(n), mode)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="musebench") as root:
+        makeShots(root, args.n)
+
+        for mode in args.modes.split(","):
+            out = subprocess.run([sys.executable, __file__, "--worker", root, str(args.n), mode],
+                                 capture_output=True, text=True, check=True).stdout
+            rows = json.loads(out.splitlines()[-1])
+            sec = [r[0] for r in rows]
+            rss = [r[1] for r in rows]
+
+            # first shot builds the layouts, judge the steady state
+            half = len(rows) // 2
+            print(f"{mode:6s}  first {sec[0]:6.2f} s  "
+                  f"median {sorted(sec[1:])[len(sec[1:]) // 2]:6.3f} s/shot  "
+                  f"RSS {rss[1]:7.1f} -> {rss[-1]:7.1f} MB  "
+                  f"({(rss[-1] - rss[half]) / max(len(rows) - half, 1):+.2f} MB/shot in 2nd half)")
+
+
+if __name__ == "__main__":
+    main()
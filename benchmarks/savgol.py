@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+'''
+Savitzky-Golay filtering benchmark for MuseAnalysis.
+
+Filters C channels of N samples with scipy's single pass savgol_filter and
+with savgol.savgol for each thread count, checks the outputs are identical
+and reports throughput (Msamples/s). Scaling needs as many cores as
+threads.
+
+usage: python benchmarks/savgol.py [-n 20000000] [-c 5] [-w 1,2,4,8]
+'''
+
+
+def best(fn, repeat=3):
+    t_best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        t_best = min(t_best, time.perf_counter() - t)
+    return t_best, out
+
+
+def main():
+    from scipy.signal import savgol_filter
+    from MuseAnalysis.savgol import savgol
+
+    parser = argparse.ArgumentParser(description="Savitzky-Golay filtering benchmark")
+    parser.add_argument("-n", type=int, default=20_000_000, help="samples per channel")
+    parser.add_argument("-c", "--channels", type=int, default=5)
+    parser.add_argument("-w", "--workers", default="1,2,4,8")
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--order", type=int, default=3)
+    args = parser.parse_args()
+
+    x = np.random.default_rng(0).standard_normal((args.channels, args.n))
+    size = x.size / 1e6
+    print(f"{args.channels} x {args.n} samples, window {args.window}, order {args.order}, "
+          f"{os.cpu_count()} cores")
+
+    t, ref = best(lambda: savgol_filter(x, args.window, args.order))
+    print(f"savgol_filter      {t:7.3f} s  {size / t:7.1f} Msamples/s")
+
+    for w in map(int, args.workers.split(",")):
+        t, out = best(lambda: savgol(x, args.window, args.order, workers=w))
+        same = "identical" if np.array_equal(out, ref) else "DIFFERENT"
+        print(f"savgol workers={w:<3d} {t:7.3f} s  {size / t:7.1f} Msamples/s  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+'''
+Shared memory handoff benchmark for MuseAnalysis.
+
+Loads a synthetic shot and runs one probe I-V fit per time window on a
+process pool, once sending the DoubleProbe itself with every task (pickled
+arrays) and once sending a SharedStore handle. Reports the bytes sent per
+task and the wall time of each. Scaling needs as many cores as workers.
+
+usage: python benchmarks/shared.py [-d 300] [-r 20000] [-n 64] [-w 1,2,4]
+'''
+
+
+def fitWindow(args):
+    from MuseAnalysis.ivfit import fitIV
+    from MuseAnalysis.shared import attach
+
+    probe, t0, t1 = args
+    probe = attach(probe)
+    i0, i1 = probe.cropIndex(t0, t1)
+    V, I = probe.probeVI()
+    P, _ = fitIV(V[i0:i1], I[None, i0:i1])
+    return P[0]
+
+
+def run(workers, tasks):
+    t = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        out = list(pool.map(fitWindow, tasks))
+    return time.perf_counter() - t, out
+
+
+def main():
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.shared import SharedStore
+    from MuseAnalysis.synthetic import makeShot
+
+    parser = argparse.ArgumentParser(description="shared memory handoff benchmark")
+    parser.add_argument("-d", "--duration", type=float, default=300, help="shot length (s)")
+    parser.add_argument("-r", "--rate", type=float, default=20000, help="NIDAQ rate (Hz)")
+    parser.add_argument("-n", "--windows", type=int, default=64, help="fit windows (tasks)")
+    parser.add_argument("-w", "--workers", default="1,2,4")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        path = makeShot(root, "231223001", duration=args.duration, daq_rate=args.rate)
+        probe = DoubleProbe(path + "NIDAQtext.txt")
+
+    edges = np.linspace(0, probe.time[-1] - probe.time[0], args.windows + 1)
+    windows = list(zip(edges[:-1], edges[1:]))
+    print(f"{len(probe.time)} samples, {args.windows} windows, {os.cpu_count()} cores")
+
+    with SharedStore() as store:
+        handle = store.share(probe)
+        for name, obj in [("pickled", probe), ("shared", handle)]:
+            size = len(pickle.dumps(obj)) / 1e3
+            print(f"{name:8s} {size:10.1f} kB per task")
+
+        for w in map(int, args.workers.split(",")):
+            t_pickled, ref = run(w, [(probe, t0, t1) for t0, t1 in windows])
+            t_shared, out = run(w, [(handle, t0, t1) for t0, t1 in windows])
+            same = "identical" if np.array_equal(ref, out) else "DIFFERENT"
+            print(f"workers={w:<3d} pickled {t_pickled:7.3f} s  shared {t_shared:7.3f} s  {same}")
+
+
+if __name__ == "__main__":
+    main()
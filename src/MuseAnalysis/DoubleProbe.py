@@ -1,14 +1,18 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import sys
 
-from matplotlib.gridspec import GridSpec
-from scipy.signal import savgol_filter
-from scipy.optimize import curve_fit
+from .instrument import stage, timed
+from . import figures
+from .archive import ShotArchive, isArchive
+from .channels import resolve
+from .timebase import Timebase
+
+# matplotlib and scipy are imported inside the methods that use them,
+# so loading data (or importing the package) stays fast and headless
 
 '''
 Muse Analysis for NIDAC data
-usage: python MuseAnalysis/DoubleProbe.py data/231219083/
+usage: python -m MuseAnalysis.DoubleProbe data/231219083/
 
 be sure to include '/' at end of shot path
 
@@ -18,38 +22,146 @@ Updated 22 Dec 2023
 
 class DoubleProbe():
 
-    def __init__(self,fin):
+    def __init__(self,fin, **kwargs):
 
         self.fname = fin
-        self.loadData(fin)
+        self.window = None
+        self.loadData(fin, **kwargs)
 
 
     def loadData(self,fin, 
-                      V_FACTOR=40/1.76, # to V
-                      I_FACTOR=4e-2/0.85, # to mA
+                      V_FACTOR=None, # to V, None for the channel map's bias gain
+                      I_FACTOR=None, # to mA, None for the channel map's shunt gain
+                      float32=False, # store channels as float32
+                      channels=None, # ChannelMap, dict or json file; None looks for channels.json
+                      only=None, # channel / probe / column names to load, None for all
                     ):
         '''
-        after 12/22 use Vfac=40/1.76, Ifac=4e-2/0.85
-        12/19 data uses Vfac=10, Ifac=97.8757/5
+        after 12/22 use Vfac=40/1.76, Ifac=4e-2/0.85 (the default map)
+        12/19 data uses Vfac=10, Ifac=97.8757/5 (the default map for shots
+        before channels.BIAS_BOX)
+
+        Columns are named by the channel map (channels.py), each raw column
+        is kept as an attribute of that name (AI0, AI1, ...) and in self.raw;
+        with only= the other columns are not converted (or read from archives).
+        V_FACTOR and I_FACTOR set the gains of the first probe.
+
+        The time column is kept as a Timebase (t0, dt and off-grid samples),
+        unix_time and time are rebuilt from it on access.
+        '''
+
+        with stage("DoubleProbe.load", file=fin) as rec:
+            if isArchive(fin):
+                # archives carry the map they were written with
+                with ShotArchive(fin) as ar:
+                    channels = resolve(channels, fin, ar.meta["nidaq"].get("channels"))
+                    columns = channels.columns if only is None else channels.columnsFor(only)
+                    data = np.column_stack([ar.channel(name).astype(float) for name in columns])
+            else:
+                channels = resolve(channels, fin)
+                if only is None:
+                    columns = channels.columns
+                    data = np.genfromtxt(fin,delimiter=',')
+                else:
+                    # the C parser, only the requested columns are converted
+                    columns = channels.columnsFor(only)
+                    data = np.loadtxt(fin, delimiter=',', ndmin=2,
+                                      usecols=[channels.index(c) for c in columns])
+            rec["n"] = len(data)
+            rec["bytes"] = data.nbytes
+
+        if data.shape[1] != len(columns):
+            raise ValueError(f"{fin}: {data.shape[1]} columns, channel map has "
+                             f"{len(columns)} {columns}")
+        self.channels = channels
+
+        # copy each channel out, so the (N,k) table is freed
+        dtype = np.float32 if float32 else float
+        self.raw = {}
+        for j, name in enumerate(columns):
+            if name == "time":
+                self.timebase = Timebase.fromSamples(data[:,j])
+            else:
+                self.raw[name] = np.array(data[:,j], dtype)
+                setattr(self, name, self.raw[name])
+
+        if V_FACTOR is not None:
+            self.V_factor = V_FACTOR
+        if I_FACTOR is not None:
+            self.I_factor = I_FACTOR
+
+
+    # gains of the first probe, the single probe setup before channel maps
+    @property
+    def V_factor(self):
+        return self.channels.gain(self.channels.probe()[1]["V"])
+
+    @V_factor.setter
+    def V_factor(self, gain):
+        self.channels.setGain(self.channels.probe()[1]["V"], gain)
+
+    @property
+    def I_factor(self):
+        return self.channels.gain(self.channels.probe()[1]["I"])
+
+    @I_factor.setter
+    def I_factor(self, gain):
+        self.channels.setGain(self.channels.probe()[1]["I"], gain)
+
+
+    def signal(self, name):
+        '''
+        calibrated data of a named channel (pressure, bias, shunt, ...)
         '''
+        ch = self.channels.channels[name]
+        return self.channels.calibrate(name, self.raw[ch["column"]])
 
-        data = np.genfromtxt(fin,delimiter=',')
 
-        time_long, AI0, AI1, AI2, AI3, AO0, AO1 = data.T  # s
-        self.unix_time = time_long
-        self.AI0 = AI0  # pressure
-        self.AI1 = AI1  # floating probe
-        self.AI2 = AI2  # bias
-        self.AI3 = AI3  # shunt
-        self.AO0 = AO0  # bias request
-        self.AO1 = AO1  # unused
+    def probeVI(self, probe=None):
+        '''
+        (V, I) in V and mA of a probe, the first one if None
+        '''
+        _, p = self.channels.probe(probe)
+        return self.signal(p["V"]), self.signal(p["I"])
+
 
-        self.time = time_long - time_long[0] # seconds
+    @property
+    def unix_time(self):
+        # s from 1904
+        return self.timebase.values()
 
-        self.V_factor = V_FACTOR
-        self.I_factor = I_FACTOR
+    @unix_time.setter
+    def unix_time(self, t):
+        self.timebase = Timebase.fromSamples(t)
+
+    @property
+    def time(self):
+        # seconds from first sample
+        t = self.timebase.values()
+        t -= t[0]
+        return t
+
+    def indexOf(self, t):
+        '''
+        index of the sample nearest t seconds after the first sample, O(1)
+        '''
+        return int(self.timebase.index(self.timebase.t0 + t))
+
+
+    def plasmaWindow(self, rf=None, **kwargs):
+        '''
+        detect (t0, t1), s from the first sample, where the plasma is on from
+        pressure, shunt current and (optional) RFpower forward power.
+        Kept in self.window for plotIV; None if nothing was detected.
+        '''
+        from .window import plasmaWindow
+
+        with stage("DoubleProbe.window", n=len(self.timebase)):
+            self.window = plasmaWindow(self, rf, **kwargs)
+        return self.window
    
 
+    @timed("DoubleProbe.plotRaw")
     def plotRaw(self,
                      sg_window = 50, # savgol window
                      sg_order = 3, # savgol polynomial order
@@ -57,74 +169,85 @@ class DoubleProbe():
         '''
         Show raw data from all NIdac channels.
         '''
+        import matplotlib.pyplot as plt
+        from .savgol import savgol
 
         time_long = self.unix_time
-        pressure = self.AI0
-        V_bias_request = self.AO0 
-        V_bias = self.AI2
-        V_shunt = self.AI3
-        V_float = self.AI1
+        # uncalibrated, one panel per named channel
+        names = list(self.channels.channels)
+        raw = [self.raw[self.channels.channels[name]["column"]] for name in names]
 
         # fits
-        fpressure = savgol_filter(pressure, sg_window, sg_order)
-        fV_bias_request = savgol_filter(V_bias_request, sg_window, sg_order)
-        fV_bias = savgol_filter(V_bias, sg_window, sg_order)
-        fV_shunt = savgol_filter(V_shunt, sg_window, sg_order)
-        fV_float = savgol_filter(V_float, sg_window, sg_order)
+        with stage("DoubleProbe.filter", n=len(names)*len(time_long)):
+            filtered = savgol(np.vstack(raw), sg_window, sg_order)
 
         # raw data 
-        fig,axs = plt.subplots(6,1, figsize=(10,8))
-        axs[0].plot(time_long, '.', label='time')
-        axs[1].plot(pressure, '.', label='pressure')
-        axs[2].plot(V_bias_request, '.', label='bias request') #5x
-        axs[3].plot(V_bias, '.', label='bias') # 10x
-        axs[4].plot(V_shunt, '.', label='shunt') # divide by 5, multiply 97 gain, divide by 1kOhm
-        axs[5].plot(V_float, '.', label='float') # divide by 5, multiply 97 gain, divide by 1kOhm
-
-        axs[1].plot(fpressure, 'C2--')
-        axs[2].plot(fV_bias_request, 'C2--')
-        axs[3].plot(fV_bias, 'C2--')
-        axs[4].plot(fV_shunt, 'C2--')
-        axs[5].plot(fV_float, 'C2--')
+        n = len(names) + 1
+        fig, axs, fresh = figures.figure(f"DoubleProbe.plotRaw.{n}",
+                                         lambda: plt.subplots(n,1, figsize=(10,8*n/6), squeeze=False))
+        axs = axs[:,0]
+        figures.line(axs[0], "raw", None, time_long, '.', label='time')
+        for ax, name, x, fx in zip(axs[1:], names, raw, filtered):
+            figures.line(ax, "raw", None, x, '.', label=name.replace("_", " "))
+            figures.line(ax, "filter", None, fx, 'C2--')
         
-        axs[-1].set_xlabel("integer count")
-        for a in axs:
-            a.legend(loc=0)
-            a.grid()
-            
         fig.suptitle(self.fname)
-        plt.tight_layout()
+        if fresh:
+            axs[-1].set_xlabel("integer count")
+            for a in axs:
+                figures.legend(a, loc=0)
+                a.grid()
+            
+            fig.tight_layout()
 
         if save:
-            fig.savefig(save)
+            with stage("DoubleProbe.savefig", file=save):
+                figures.save(fig, save, fresh)
 
 
-    def plotIV(self, t0=2.2, # crop start time
-                     t1=6.8, # crop finish time
+    @timed("DoubleProbe.plotIV")
+    def plotIV(self, t0=None, # crop start time, None for the plasma window
+                     t1=None, # crop finish time, None for the plasma window
                      sg_window = 50, # savgol window
                      sg_order = 3, # savgol polynomial order
-                     Area_probe_m2 = 6.8e-6, # probe area
+                     Area_probe_m2 = None, # probe area, None for the channel map's
                      plot = True,
                      save = False,
+                     bootstrap = 0, # number of bootstrap resamples, 0 for off
+                     block = None, # bootstrap block length, None for residual bootstrap
+                     probe = None, # probe name in the channel map, None for the first
                      ):
         '''
         Plot V(t) I(t) I(V)
         Add filtering and fit to I-V tanh.
+        Fit results are kept in self.fit (and self.boot when bootstrapping).
+        fitProbes fits all probes at once without plotting.
         '''
+        self.fitIV(t0, t1, sg_window, sg_order, Area_probe_m2, bootstrap, block, probe)
+        if plot:
+            self.drawIV(save)
+
 
-        # should code the conversion in ONE place to avoid bugs
-        V_probe = self.AI2 * self.V_factor  # V
-        I_probe = self.AI3 * self.I_factor # mA
+    @timed("DoubleProbe.fitIV")
+    def fitIV(self, t0=None, t1=None, sg_window=50, sg_order=3, Area_probe_m2=None,
+                    bootstrap=0, block=None, probe=None):
+        '''
+        the fitting half of plotIV (same arguments), without matplotlib;
+        returns self.fit, what drawIV needs is kept in self.iv
+        '''
+        from scipy.optimize import curve_fit
+        from .savgol import savgol
+
+        # calibration lives in the channel map
+        V_probe, I_probe = self.probeVI(probe) # V, mA
         time = self.time # s
+        if Area_probe_m2 is None:
+            Area_probe_m2 = self.channels.probe(probe)[1].get("area", 6.8e-6)
 
         self.V = V_probe
         self.I = I_probe
 
-        def argNear(arr,val):
-            return np.argmin( np.abs(arr - val) )
-
-        t0_idx = argNear(time,t0)
-        t1_idx = argNear(time,t1)
+        t0_idx, t1_idx = self.cropIndex(t0, t1)
 
         # cut
         V_cut = V_probe[t0_idx:t1_idx]
@@ -132,15 +255,12 @@ class DoubleProbe():
         t_cut = time[t0_idx:t1_idx]
 
         # filter
-        V_filter = savgol_filter(V_cut, sg_window, sg_order)
-        I_filter = savgol_filter(I_cut, sg_window, sg_order)
-
-        # fit
-        def IV_tanh(Vbias,Te,Isat,I_offset):
-            return Isat * np.tanh( Vbias / 2. / Te ) + I_offset
+        with stage("DoubleProbe.filter", n=2*len(V_cut)):
+            V_filter, I_filter = savgol(np.vstack([V_cut, I_cut]), sg_window, sg_order)
 
         # this fit uses cut (but NOT filtered) data
-        param, cov = curve_fit(IV_tanh, V_cut, I_cut)
+        with stage("DoubleProbe.fit", n=len(V_cut)):
+            param, cov = curve_fit(IV_tanh, V_cut, I_cut)
         I_fit = IV_tanh(V_cut,*param)
         Te, Isat, I_offset = param
     
@@ -148,7 +268,8 @@ class DoubleProbe():
         dT, dIsat, dIoff = err
 
         # this fits filtered data
-        param2, cov2 = curve_fit(IV_tanh, V_filter, I_filter)
+        with stage("DoubleProbe.fit", n=len(V_filter)):
+            param2, cov2 = curve_fit(IV_tanh, V_filter, I_filter)
         I_fit2 = IV_tanh(V_filter,*param2)
         Te2, Isat2, I_offset2 = param2
     
@@ -156,58 +277,191 @@ class DoubleProbe():
         dT2, dIsat2, dIoff2 = err2
 
         # compute density
-        e = 1.6e-19
-        A = Area_probe_m2
-        m = 938e6 # H, eV 
-        c = 2.99e8 # m/s
-        I = Isat /1e3 # A
-        v = c*np.sqrt(Te/m)
-        ne = I / (e * A * v)
+        ne = density(Te, Isat, Area_probe_m2)
         dn = ne * np.sqrt( (dIsat/Isat)**2 + (dT/Te)**2 )
 
-        # plot
-        if plot:
+        self.fit = dict(Te=Te, dTe=dT, Isat=Isat, dIsat=dIsat, I_offset=I_offset, dI_offset=dIoff,
+                        ne=ne, dne=dn, Te_filter=Te2, Isat_filter=Isat2)
 
-            fig = plt.figure(layout="constrained", figsize=(10,6))
-            gs = GridSpec(2, 2, figure=fig)
-            ax0 = fig.add_subplot(gs[0, 1])
-            ax1 = fig.add_subplot(gs[1, 1])
-            ax2 = fig.add_subplot(gs[:, 0])
+        # bootstrap intervals, the covariance above assumes white Gaussian noise
+        self.boot = None
+        if bootstrap:
+            from .bootstrap import bootstrapIV
+            with stage("DoubleProbe.bootstrap", n=bootstrap*len(V_cut)):
+                self.boot = bootstrapIV(V_cut, I_cut, param, bootstrap, block=block,
+                                        Area_probe_m2=Area_probe_m2)
 
-            time = self.time # s
-            ax0.plot(time, V_probe, 'C0.', label='V')
-            ax1.plot(time, I_probe, 'C1.', label='mA')
-            ax2.plot(V_probe, I_probe, 'C4.')
+        # small, so a fit done in another process can be sent back for drawing
+        self.iv = dict(probe=probe, t0_idx=t0_idx, t1_idx=t1_idx, sg_window=sg_window, sg_order=sg_order,
+                       V_filter=V_filter, I_filter=I_filter, I_fit=I_fit, I_fit2=I_fit2)
+        return self.fit
 
-            ax1.set_xlabel('time [s]')
-            ax2.set_xlabel('V')
-            ax2.set_ylabel('mA')
-            ax0.plot(t_cut, V_cut, 'C3.', ms=1, label='cut')
-            ax1.plot(t_cut, I_cut, 'C3.', ms=1, label='cut')
-            ax2.plot(V_cut, I_cut, 'C3.', ms=1)
+
+    @timed("DoubleProbe.drawIV")
+    def drawIV(self, save=False):
+        '''
+        the plotting half of plotIV, from the last fitIV
+        '''
+        iv, fit = self.iv, self.fit
+        V_probe, I_probe = self.probeVI(iv["probe"])
+        self.V = V_probe
+        self.I = I_probe
+
+        t0_idx, t1_idx = iv["t0_idx"], iv["t1_idx"]
+        V_cut = V_probe[t0_idx:t1_idx]
+        I_cut = I_probe[t0_idx:t1_idx]
+        time = self.time # s
+        t_cut = time[t0_idx:t1_idx]
+        V_filter, I_filter, I_fit, I_fit2 = iv["V_filter"], iv["I_filter"], iv["I_fit"], iv["I_fit2"]
+        sg_window, sg_order = iv["sg_window"], iv["sg_order"]
+        Te, dT, Isat, dIsat = fit["Te"], fit["dTe"], fit["Isat"], fit["dIsat"]
+        I_offset, dIoff, ne, dn = fit["I_offset"], fit["dI_offset"], fit["ne"], fit["dne"]
+
+        # the bootstrap adds a legend entry, so it is its own layout
+        key = "DoubleProbe.plotIV" + (".boot" if self.boot is not None else "")
+        fig, (ax0, ax1, ax2), fresh = figures.figure(key, layoutIV)
+
+        figures.line(ax0, "V", time, V_probe, 'C0.', label='V')
+        figures.line(ax1, "I", time, I_probe, 'C1.', label='mA')
+        figures.line(ax2, "IV", V_probe, I_probe, 'C4.', decimated=False)
+
+        figures.line(ax0, "cut", t_cut, V_cut, 'C3.', ms=1, label='cut')
+        figures.line(ax1, "cut", t_cut, I_cut, 'C3.', ms=1, label='cut')
+        figures.line(ax2, "cut", V_cut, I_cut, 'C3.', ms=1, decimated=False)
     
-            ax0.plot(t_cut, V_filter, 'C2--', lw=0.5)
-            ax1.plot(t_cut, I_filter, 'C2--', lw=0.5)
-            ax2.plot(V_cut, I_filter, 'C2--', lw=2, label=f"filter: savgol (window,order) = {sg_window}, {sg_order}")
+        figures.line(ax0, "filter", t_cut, V_filter, 'C2--', lw=0.5)
+        figures.line(ax1, "filter", t_cut, I_filter, 'C2--', lw=0.5)
+        figures.line(ax2, "filter", V_cut, I_filter, 'C2--', lw=2, decimated=False,
+                     label=f"filter: savgol (window,order) = {sg_window}, {sg_order}")
     
-            ax2.plot(V_cut, I_fit, 'C1:', lw=5, label="fit cut")
-            ax2.plot([],[],' ', label=rf"$T_e$ = {Te:.1f}$\pm${dT:.1f} eV")
-            ax2.plot([],[],' ', label=r"$I_{sat}$"+rf" = {Isat:.2f}$\pm${dIsat:.2f} mA")
-            ax2.plot([],[],' ', label=rf"$n_e$ = {ne/1e16:.1f}$\pm${dn/1e16:.2f}"+r"$\times 10^{16}$ $m^{-3}$")
-            ax2.plot([],[],' ', label=r"$I_{offset}$"+rf" = {I_offset:.2f}$\pm${dIoff:.2f} mA")
-
-            ax2.plot(V_filter, I_fit2, 'C3:', lw=5, label="fit filtered")
+        figures.line(ax2, "fit", V_cut, I_fit, 'C1:', lw=5, decimated=False, label="fit cut")
+        figures.line(ax2, "Te", [], [], ' ', decimated=False, label=rf"$T_e$ = {Te:.1f}$\pm${dT:.1f} eV")
+        figures.line(ax2, "Isat", [], [], ' ', decimated=False, label=r"$I_{sat}$"+rf" = {Isat:.2f}$\pm${dIsat:.2f} mA")
+        figures.line(ax2, "ne", [], [], ' ', decimated=False, label=rf"$n_e$ = {ne/1e16:.1f}$\pm${dn/1e16:.2f}"+r"$\times 10^{16}$ $m^{-3}$")
+        figures.line(ax2, "Ioff", [], [], ' ', decimated=False, label=r"$I_{offset}$"+rf" = {I_offset:.2f}$\pm${dIoff:.2f} mA")
+        if self.boot is not None:
+            lo, hi = self.boot["Te"]
+            figures.line(ax2, "boot", [], [], ' ', decimated=False, label=rf"$T_e$ 95% bootstrap [{lo:.1f}, {hi:.1f}] eV")
+
+        figures.line(ax2, "fit2", V_filter, I_fit2, 'C3:', lw=5, decimated=False, label="fit filtered")
     
-            ax2.set_ylim( 1.1*np.min(I_cut), 1.1*np.max(I_cut) )
+        ax2.set_ylim( 1.1*np.min(I_cut), 1.1*np.max(I_cut) )
     
-            [a.legend(loc=0) for a in [ax0,ax1,ax2] ]
+        [figures.legend(a, loc=0) for a in [ax0,ax1,ax2] ]
+        if fresh:
+            ax1.set_xlabel('time [s]')
+            ax2.set_xlabel('V')
+            ax2.set_ylabel('mA')
             [a.grid() for a in [ax0,ax1,ax2] ]
-            fig.suptitle(self.fname)
+        fig.suptitle(self.fname)
     
-            if save:
+        if save:
+            with stage("DoubleProbe.savefig", file=save):
+                figures.save(fig, save, fresh)
+
+
+    def cropIndex(self, t0=None, t1=None):
+        '''
+        sample range of (t0, t1), s from the first sample; a missing end
+        comes from the plasma window (2.2 - 6.8 s if none is found)
+        '''
+        if t0 is None or t1 is None:
+            from .window import DEFAULT
+            window = self.window or self.plasmaWindow() or DEFAULT
+            t0 = window[0] if t0 is None else t0
+            t1 = window[1] if t1 is None else t1
+
+        return self.indexOf(t0), self.indexOf(t1)
+
+
+    @timed("DoubleProbe.fitProbes")
+    def fitProbes(self, probes=None, # probe names, None for all in the channel map
+                        t0=None, # crop start time, None for the plasma window
+                        t1=None, # crop finish time, None for the plasma window
+                        ):
+        '''
+        I-V tanh fit of every probe in one batched solve, on the cut (not
+        filtered) data as plotIV; results by probe name in self.fits, with
+        the same keys as self.fit
+        '''
+        from .ivfit import fitIV
+
+        names = list(self.channels.probes) if probes is None else list(probes)
+        i0, i1 = self.cropIndex(t0, t1)
+
+        V, I = zip(*[self.probeVI(name) for name in names])
+        V_cut = np.stack([v[i0:i1] for v in V])
+        I_cut = np.stack([i[i0:i1] for i in I])
+
+        with stage("DoubleProbe.fit", n=I_cut.size, probes=len(names)):
+            param, err = fitIV(V_cut, I_cut)
+
+        self.fits = {}
+        for name, (Te, Isat, I_offset), (dT, dIsat, dIoff) in zip(names, param, err):
+            ne = density(Te, Isat, self.channels.probes[name].get("area", 6.8e-6))
+            dn = ne * np.sqrt( (dIsat/Isat)**2 + (dT/Te)**2 )
+            self.fits[name] = dict(Te=Te, dTe=dT, Isat=Isat, dIsat=dIsat, I_offset=I_offset,
+                                   dI_offset=dIoff, ne=ne, dne=dn)
+        return self.fits
+
+
+    def fluctuations(self, channel="AI1",
+                           nperseg = 256, # samples per segment
+                           average = 4, # segments per spectrogram column
+                           ):
+        '''
+        spectrogram (times on unix_time, freqs, PSD) and Welch PSD of one
+        channel, streamed in chunks
+        '''
+        from .fluctuation import spectrogram, welch
+
+        x = getattr(self, channel)
+        fs = 1 / self.timebase.dt
+        with stage("DoubleProbe.stft", channel=channel, n=len(x)):
+            times, freqs, S = spectrogram(x, fs, self.timebase, nperseg, average=average)
+            _, psd = welch(x, fs, nperseg)
+
+        return dict(times=times, freqs=freqs, S=S, psd=psd)
+
+
+    @timed("DoubleProbe.plotFluctuations")
+    def plotFluctuations(self, channels = ("AI1", "AI3"), # floating probe, shunt
+                               nperseg = 256,
+                               average = 4,
+                               save = False,
+                               ):
+        '''
+        Spectrogram and Welch PSD of the fluctuation channels.
+        '''
+        import matplotlib.pyplot as plt
+        from .fluctuation import plotSpectrogram
+
+        labels = dict(AI1="float", AI3="shunt")
+        fig, axs = plt.subplots(len(channels), 2, figsize=(12, 3*len(channels)+1),
+                                gridspec_kw=dict(width_ratios=[3, 1]), squeeze=False)
+
+        t0 = self.timebase.t0
+        for (ax, ax2), ch in zip(axs, channels):
+            res = self.fluctuations(ch, nperseg, average)
+            mesh = plotSpectrogram(ax, res["times"] - t0, res["freqs"], res["S"])
+            fig.colorbar(mesh, ax=ax, label="dB V$^2$/Hz")
+            ax.set_ylabel(f"{labels.get(ch, ch)} (Hz)")
+
+            ax2.semilogy(res["freqs"], res["psd"])
+            ax2.set_xlabel("Hz")
+            ax2.grid()
+
+        axs[-1,0].set_xlabel("s")
+        fig.suptitle(self.fname)
+        fig.tight_layout()
+
+        if save:
+            with stage("DoubleProbe.savefig", file=save):
                 fig.savefig(save)
+        return fig
 
 
+    @timed("DoubleProbe.plotPressure")
     def plotPressure(self, axs=None,
                            sg_window = 50, # savgol window
                            sg_order = 3, # savgol polynomial order
@@ -215,6 +469,7 @@ class DoubleProbe():
                            t_global = None, # use global time ref to match other diagnostics
                            save = False,
                            ):
+        from .savgol import savgol
 
         try:
             # set x-axis to global time
@@ -223,38 +478,82 @@ class DoubleProbe():
         except:
             time = self.time
 
-        V = self.AI0
+        V = self.signal("pressure")
 
-        P_raw = 10**((V - 5.5)/0.5) # V -> P conversion from manual
-        P_H2 = P_raw / 0.42 # -> H2 scale factor from manual
+        P_raw, P_H2 = pressure(V)
 
         # use savgol filter
-        P_raw_filter = savgol_filter(P_raw, sg_window, sg_order)
-        P_H2_filter = savgol_filter(P_H2, sg_window, sg_order)
+        with stage("DoubleProbe.filter", n=2*len(P_raw)):
+            P_raw_filter, P_H2_filter = savgol(np.vstack([P_raw, P_H2]), sg_window, sg_order)
 
         if axs==None:
+            import matplotlib.pyplot as plt
             fig,axs = plt.subplots(1,1)
             axs.set_xlabel('s')
             axs.set_title(self.fname)
 
-        axs.plot(time, P_H2, 'C0.', label="pressure H2")
-        axs.plot(time, P_H2_filter, 'C1.')
+        figures.line(axs, "P_H2", time, P_H2, 'C0.', label="pressure H2")
+        figures.line(axs, "P_H2_filter", time, P_H2_filter, 'C1.')
 
         if plotRaw:
-            axs.plot(time, P_raw, 'C2.', label="pressure observed (N2)")
-            axs.plot(time, P_raw_filter, 'C4.')
+            figures.line(axs, "P_raw", time, P_raw, 'C2.', label="pressure observed (N2)")
+            figures.line(axs, "P_raw_filter", time, P_raw_filter, 'C4.')
   
         axs.set_ylabel('Torr')
         axs.ticklabel_format(axis='y', style='sci', scilimits=(0,0) )
 
-        axs.legend()
-        axs.grid()
+        figures.legend(axs)
+        axs.grid(True)
 
         if save:
             fig.savefig(save)
 
 
+##
+# helper functions
+def layoutIV():
+    '''
+    I-V panel on the left, V(t) over I(t) on the right
+    '''
+    import matplotlib.pyplot as plt
+    from matplotlib.gridspec import GridSpec
+
+    fig = plt.figure(layout="constrained", figsize=(10,6))
+    gs = GridSpec(2, 2, figure=fig)
+    ax0 = fig.add_subplot(gs[0, 1])
+    ax1 = fig.add_subplot(gs[1, 1])
+    ax2 = fig.add_subplot(gs[:, 0])
+    return fig, (ax0, ax1, ax2)
+
+
+def IV_tanh(Vbias,Te,Isat,I_offset):
+    return Isat * np.tanh( Vbias / 2. / Te ) + I_offset
+
+
+def pressure(V, gas_factor=0.42):
+    '''
+    gauge voltage -> (P observed as N2, P for the gas) in Torr
+    '''
+    P_raw = 10**((V - 5.5)/0.5) # V -> P conversion from manual
+    return P_raw, P_raw / gas_factor # -> H2 scale factor from manual
+
+
+def density(Te, Isat, Area_probe_m2=6.8e-6):
+    '''
+    ne (m^-3) from Te (eV) and Isat (mA), Bohm speed for hydrogen
+    '''
+    e = 1.6e-19
+    A = Area_probe_m2
+    m = 938e6 # H, eV 
+    c = 2.99e8 # m/s
+    I = Isat /1e3 # A
+    v = c*np.sqrt(Te/m)
+    return I / (e * A * v)
+
+
 if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
     path = sys.argv[1]
     data = DoubleProbe(path+"NIDAQtext.txt")
     
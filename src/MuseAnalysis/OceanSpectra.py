@@ -1,21 +1,45 @@
 import numpy as np
-import matplotlib.pyplot as plt
+import os
 import sys
 
+from .instrument import stage, timed
+from . import decimate
+from . import figures
+from .archive import ShotArchive, isArchive, writeSpectra
+
+# Balmer lines (nm), masked out of continuum fits
+BALMER = [656.279, 486.135, 434.0462, 410.174]
+
 class OceanSpectra():
 
-    def __init__(self,fin):
+    def __init__(self,fin, **kwargs):
 
         self.fname = fin
-        self.loadData(fin)
+        self.loadData(fin, **kwargs)
 
 
         # for plotting peaks
         self.lines = []
         self.freqs = []
 
+        # saturated pixels, set by rejectArtifacts
+        self.mask = None
+
+        # subtracted so far, set by subtractDark / subtractContinuum
+        self.dark = None
+        self.continuum = None
+
+
+    @timed("OceanSpectra.load")
+    def loadData(self,fin, t_range=None, windows=None):
+        '''
+        t_range = (t0, t1) in ms from the first spectrum keeps only that window
+        windows = [(lo, hi), ...] in nm keeps only those pixels; the other
+        columns of a text file are not converted
+        '''
 
-    def loadData(self,fin):
+        if isArchive(fin):
+            return self.loadArchive(fin, t_range, windows)
 
         with open(fin) as f:
             indata = f.readlines()
@@ -38,36 +62,195 @@ class OceanSpectra():
         # parse spectral axis (nm)
         spectral_axis = np.array(indata[j_start+1].strip().split('\t'),float)
 
-        # parse spectra
-        human_time = []
-        unix_time = []
-        data = []
-        for line in indata[j_start+2:]:
-            stream = line.strip().split('\t')
+        if windows is not None:
+            cols = windowPixels(spectral_axis, windows)
+            spectral_axis = spectral_axis[cols]
 
-            human_time.append(stream[0])
-            unix_time.append(stream[1])
-            data.append(stream[2:])
+            # the C parser converts only unix time and the window pixels
+            human_time = [line.split('\t', 1)[0] for line in indata[j_start+2:]]
+            with stage("OceanSpectra.convert", n=len(human_time)) as rec:
+                table = np.loadtxt(indata[j_start+2:], delimiter='\t', ndmin=2,
+                                   usecols=[1] + list(cols + 2))
+                unix_time = table[:,0].astype(int)
+                data = table[:,1:]
+                rec["bytes"] = data.nbytes
 
+        else:
+            # parse spectra
+            human_time = []
+            unix_time = []
+            data = []
+            for line in indata[j_start+2:]:
+                stream = line.strip().split('\t')
 
-        unix_time = np.array(unix_time, int)
-        data = np.array(data, float)
+                human_time.append(stream[0])
+                unix_time.append(stream[1])
+                data.append(stream[2:])
 
 
+            with stage("OceanSpectra.convert", n=len(data)) as rec:
+                unix_time = np.array(unix_time, int)
+                data = np.array(data, float)
+                rec["bytes"] = data.nbytes
+
+
+        # get time
+        time_axis = unix_time - unix_time[0] # ms
+        j0, j1 = 0, len(data)
+        if t_range is not None:
+            j0, j1 = np.searchsorted(time_axis, t_range)
+
         # save
         self.raw_data = indata
-        self.human_time = human_time
-        self.unix_time = unix_time
-        self.data = data
+        self.human_time = human_time[j0:j1]
+        self.unix_time = unix_time[j0:j1]
+        self.data = data[j0:j1]
         self.meta = meta
 
-        self.N_spectra = len(data)
+        self.N_spectra = len(self.data)
 
-        # get time
         self.dt = float(meta['Integration Time (sec)'])
-        self.time_axis = unix_time - unix_time[0] # ms
+        self.time_axis = time_axis[j0:j1]
         self.spectral_axis = spectral_axis
 
+    def loadArchive(self,fin, t_range=None, windows=None):
+        '''
+        same attributes as loadData, from an archive (raw_data is None).
+        With t_range only the chunks covering it are decoded.
+        '''
+
+        with ShotArchive(fin) as ar:
+            m = ar.meta["spectra"]
+            unix_time = ar.read("spectra/unix_time.npy")
+            j0, j1 = 0, len(unix_time)
+            if t_range is not None:
+                j0, j1 = ar.spectraRange(*t_range)
+
+            self.meta = m["meta"]
+            self.human_time = m["human_time"][j0:j1]
+            self.unix_time = unix_time[j0:j1]
+            self.spectral_axis = ar.read("spectra/spectral_axis.npy")
+            self.data = ar.spectra(j0, j1)
+
+        if windows is not None:
+            cols = windowPixels(self.spectral_axis, windows)
+            self.spectral_axis = self.spectral_axis[cols]
+            self.data = self.data[:, cols]
+
+        self.raw_data = None
+        self.N_spectra = len(self.data)
+
+        self.dt = float(self.meta['Integration Time (sec)'])
+        self.time_axis = self.unix_time - unix_time[0] # ms
+
+    def save(self, fout):
+        '''
+        write a compressed spectra archive (.muse), readable with OceanSpectra(fout)
+        '''
+        return writeSpectra(self, fout)
+
+    def plasmaStart(self, frac=0.2):
+        '''
+        time (ms, on time_axis) where the total intensity first rises
+        frac of the way from its baseline to its maximum
+        '''
+
+        total = self.data.sum(axis=1)
+        base = np.median(total[:max(len(total) // 10, 1)])
+        level = base + frac * (total.max() - base)
+        j = int(np.argmax(total >= level))
+
+        return float(self.time_axis[j])
+
+    def subtractDark(self, dark=None, margin=100, # ms before plasma start
+                     ):
+        '''
+        subtract a dark spectrum from every row of data, in place.
+
+        dark = None averages the spectra taken before plasma start,
+        a file name uses that (text or archive) dark file, cached per file,
+        an array is used as is.
+        '''
+
+        if dark is None:
+            pre = self.time_axis < self.plasmaStart() - margin
+            if not pre.any():
+                raise ValueError(f"{self.fname}: no spectra before plasma start for a dark frame")
+            dark = self.data[pre].mean(axis=0)
+        elif isinstance(dark, (str, os.PathLike)):
+            dark = darkReference(dark)
+
+        self.data -= dark
+        self.dark = dark if self.dark is None else self.dark + dark
+
+    def subtractContinuum(self, order=3,
+                                lines=BALMER, # nm, excluded from the fit
+                                width=3.0, # nm either side of each line
+                          ):
+        '''
+        fit a polynomial continuum to every spectrum and subtract it, in place.
+        All spectra share the line mask, so the fit is one matrix product.
+        '''
+
+        op, basis = continuumOperator(self.spectral_axis, order, tuple(lines), width)
+        coeffs = self.data @ op # (N_spectra, order+1)
+        self.data -= coeffs @ basis
+        self.continuum = coeffs
+
+    def rejectArtifacts(self, nsigma=6.0,
+                              window=5, # running median length, time and wavelength
+                              saturation=65535, # detector full scale (16383 for 14 bit models)
+                        ):
+        '''
+        repair cosmic-ray spikes and mask saturated pixels, in place.
+
+        A spike stands above the running median along time AND along
+        wavelength by nsigma times the noise (column MAD plus shot noise),
+        so persistent lines and broadband turn-on are left alone. Spikes
+        are replaced by the time median. Saturated pixels are kept but
+        flagged in self.mask, which findPeak and plot2d honour. Shot noise
+        and saturation are judged on raw counts, so a subtracted dark is
+        added back for them; after subtractContinuum raw counts are lost
+        and this raises.
+        Returns the number of pixels touched.
+        '''
+        from scipy.ndimage import median_filter
+
+        if self.continuum is not None:
+            raise ValueError(f"{self.fname}: reject artifacts before subtracting the continuum")
+
+        data = self.data
+        dark = 0 if self.dark is None else self.dark
+        med_t = median_filter(data, size=(window, 1), mode="mirror")
+        med_s = median_filter(data, size=(1, window), mode="mirror")
+
+        # noise: robust spread of each wavelength column, plus shot noise on
+        # bright pixels (sqrt(counts) overestimates it, which is the safe side)
+        resid = data - med_t
+        sigma = 1.4826 * np.median(np.abs(resid), axis=0)
+        sigma = np.sqrt(np.maximum(sigma, 1.0)**2 + np.abs(med_t + dark))
+
+        spikes = (resid > nsigma * sigma) & (data - med_s > nsigma * sigma)
+        saturated = data + dark >= saturation
+
+        # a saturated line is real signal, not a cosmic ray
+        spikes &= ~saturated
+        data[spikes] = med_t[spikes]
+
+        self.mask = saturated
+        self.artifacts = dict(spikes=int(spikes.sum()), saturated=int(saturated.sum()))
+        return self.artifacts
+
+    def resample(self, grid, method="linear"):
+        '''
+        map every spectrum onto a new wavelength grid (nm) in place,
+        "linear" interpolation or "rebin" (overlap-weighted mean)
+        '''
+        from .resample import resample
+
+        self.data = resample(self.data, self.spectral_axis, grid, method)
+        self.spectral_axis = np.asarray(grid, float)
+
     def findPeak(self,f0=656.363, # nm
                  ):
 
@@ -78,6 +261,8 @@ class OceanSpectra():
         j0 = np.argmin( np.abs(freq - f0) )
 
         f_time = self.data[:,j0] 
+        if self.mask is not None:
+            f_time = np.ma.masked_array(f_time, self.mask[:,j0])
 
         self.lines.append(f_time)
         self.freqs.append(f0)
@@ -88,39 +273,110 @@ class OceanSpectra():
 
         N_lines = len(self.lines)
         for j in np.arange(N_lines):
-            axs.plot(time, self.lines[j], label=f"{self.freqs[j]} nm")
+            decimate.plot(axs, time, self.lines[j], label=f"{self.freqs[j]} nm")
 
+    @timed("OceanSpectra.plot2d")
     def plot2d(self, j=50, save=False):
+        import matplotlib.pyplot as plt
 
         s_ax = self.spectral_axis
         t_ax = self.time_axis
         data = self.data
+        if self.mask is not None:
+            # keep saturated pixels out of the colour scale
+            data = np.ma.masked_array(data, self.mask)
 
-        fig,axs = plt.subplots(2,1,figsize=(10,5))
+        fig, axs, fresh = figures.figure("OceanSpectra.plot2d", lambda: plt.subplots(2,1,figsize=(10,5)))
 
-        C = axs[0].contourf(t_ax, s_ax, data.T, cmap='inferno')
-        axs[0].set_ylabel('wavelength (nm)')
-        axs[0].set_xlabel('time (ms)')
+        # contour sets cannot take new data, the previous shot's is replaced
+        old = figures.artist(axs[0], "contour")
+        if old is not None:
+            old.remove()
+        with stage("OceanSpectra.contourf", n=data.size):
+            C = figures.keep(axs[0], "contour", axs[0].contourf(t_ax, s_ax, data.T, cmap='inferno'))
 
         t_slice = t_ax[j]
-        axs[0].axvline(t_slice, color='r', ls='--')
-        fig.colorbar(C)
+        vline = figures.artist(axs[0], "slice")
+        if vline is None:
+            figures.keep(axs[0], "slice", axs[0].axvline(t_slice, color='r', ls='--'))
+            figures.keep(axs[0], "colorbar", fig.colorbar(C))
+        else:
+            vline.set_xdata([t_slice, t_slice])
+            figures.artist(axs[0], "colorbar").update_normal(C)
 
-        axs[1].plot( s_ax, data[j], 'r', lw=0.7, label=f"t = {t_slice} ms" )
-        axs[1].set_xlabel('wavelength (nm)')
-        axs[1].set_ylabel('counts')
-        axs[1].legend()
-        axs[1].grid()
+        figures.line(axs[1], "slice", s_ax, data[j], 'r', lw=0.7, decimated=False, label=f"t = {t_slice} ms")
+        figures.legend(axs[1])
 
         fig.suptitle(self.fname)
-        fig.tight_layout()
+        if fresh:
+            axs[0].set_ylabel('wavelength (nm)')
+            axs[0].set_xlabel('time (ms)')
+            axs[1].set_xlabel('wavelength (nm)')
+            axs[1].set_ylabel('counts')
+            axs[1].grid()
+            fig.tight_layout()
 
         if save:
-            fig.savefig(save)
+            with stage("OceanSpectra.savefig", file=save):
+                figures.save(fig, save, fresh)
+
+
+##
+# helper functions
+_dark_cache = {}
+
+def windowPixels(spectral_axis, windows):
+    '''
+    sorted pixel indices with lo <= wavelength <= hi for any (lo, hi) in
+    windows (nm); the nearest pixel if a window falls between pixels
+    '''
+    keep = np.zeros(len(spectral_axis), bool)
+    for lo, hi in windows:
+        inside = (spectral_axis >= lo) & (spectral_axis <= hi)
+        if not inside.any():
+            inside[np.argmin(np.abs(spectral_axis - (lo + hi) / 2))] = True
+        keep |= inside
+    return np.flatnonzero(keep)
+
+
+def darkReference(fin):
+    '''
+    mean spectrum of a dark file, cached on (path, mtime) so a campaign
+    sharing one dark file only parses it once
+    '''
+
+    key = (os.path.abspath(fin), os.path.getmtime(fin))
+    if key not in _dark_cache:
+        _dark_cache[key] = OceanSpectra(fin).data.mean(axis=0)
+
+    return _dark_cache[key]
+
+
+def continuumOperator(spectral_axis, order=3, lines=tuple(BALMER), width=3.0):
+    '''
+    (op, basis) with coeffs = data @ op the least-squares polynomial fit of
+    each spectrum outside the line windows and coeffs @ basis the continuum
+    '''
+
+    x = np.asarray(spectral_axis, float)
+    # scale to [-1, 1] for a well conditioned Vandermonde matrix
+    u = (x - x.mean()) / (np.ptp(x) / 2 or 1)
+    V = np.vander(u, order + 1, increasing=True) # (N_pixels, order+1)
+
+    mask = np.ones(len(x), bool)
+    for f0 in lines:
+        mask &= np.abs(x - f0) > width
+
+    op = np.zeros((len(x), order + 1))
+    op[mask] = np.linalg.pinv(V[mask]).T
+
+    return op, V.T
 
 
 ### Test Driver
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     fin = sys.argv[1]
     data = OceanSpectra(fin)
 
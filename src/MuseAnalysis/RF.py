@@ -1,7 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import sys
-from matplotlib.gridspec import GridSpec
+
+from .instrument import stage, timed
+from . import figures
+from .archive import ShotArchive, isArchive, splitSelector
 
 '''
 Muse Data Analysis Script
@@ -19,20 +21,32 @@ class RFpower:
 
     def loadData(self,fin):
 
+        with stage("RFpower.load", file=fin) as rec:
+            if isArchive(fin):
+                # "shot.muse:RFLog2" picks the log, default RFLog1
+                path, log = splitSelector(fin)
+                with ShotArchive(path) as ar:
+                    arr, t0 = ar.rf(log or "RFLog1")
+
+            else:
+                with open(fin) as f:
+                    datain = f.readlines()
+
+                arr = []
+                for line in datain:
 
-        with open(fin) as f:
-            datain = f.readlines()
+                    data = getPair(line)
 
-        arr = []
-        for line in datain:
+                    try:
+                        if len(data) == 2:
+                            arr.append(data)
+                    except:
+                        continue
 
-            data = getPair(line)
+                # get time offset from first data point
+                t0 = float(datain[0][:14])
 
-            try:
-                if len(data) == 2:
-                    arr.append(data)
-            except:
-                continue
+            rec["n"] = len(arr)
 
         time,power = np.transpose(arr)
 
@@ -40,9 +54,6 @@ class RFpower:
         t_fwd, t_rev = time.reshape(N,2).T
         P_fwd, P_rev = power.reshape(N,2).T
 
-        # get time offset from first data point
-        t0 = float(datain[0][:14])
-
         # save
         self.T_fwd = t_fwd - t0
         self.P_fwd = P_fwd
@@ -55,35 +66,60 @@ class RFpower:
         self.data = np.array(arr)
         self.t0 = t0
 
-    def plotRF(self):
+    @timed("RFpower.plotRF")
+    def plotRF(self, save=False):
 
-        fig = plt.figure(layout="constrained")
-        gs = GridSpec(3, 1, figure=fig)
-        ax0 = fig.add_subplot(gs[:-1])
-        ax1 = fig.add_subplot(gs[-1])
+        # one template per log, RFLog1 and RFLog2 are drawn side by side
+        log = str(self.fname).replace(":", "/").split("/")[-1].split(".")[0]
+        fig, (ax0, ax1), fresh = figures.figure("RFpower.plotRF:" + log, layout)
 
         s = self
-        ax0.plot(s.T_fwd, s.P_fwd, 'o-', label="Forward Power")
-        ax0.plot(s.T_rev, s.P_rev, 'o-', label="Reflected Power")
-        ax1.plot(s.T_rev, s.P_rev, 'C1o-', label="Reflected Power")
+        figures.line(ax0, "fwd", s.T_fwd, s.P_fwd, 'o-', label="Forward Power")
+        figures.line(ax0, "rev", s.T_rev, s.P_rev, 'o-', label="Reflected Power")
+        figures.line(ax1, "rev", s.T_rev, s.P_rev, 'C1o-', label="Reflected Power")
         
-        ax0.set_ylabel("Power (W)")
-        ax1.set_ylabel("Reflected (W)")
-        ax1.set_xlabel("Time (s)")
+        fig.suptitle(self.fname)
+        if fresh:
+            ax0.set_ylabel("Power (W)")
+            ax1.set_ylabel("Reflected (W)")
+            ax1.set_xlabel("Time (s)")
         
-        ax0.grid()
-        ax1.grid()
-        ax0.legend()
+            ax0.grid()
+            ax1.grid()
+            figures.legend(ax0)
         
-        fig.suptitle(self.fname)
-        fig.tight_layout()
+            fig.tight_layout()
+
+        if save:
+            with stage("RFpower.savefig", file=save):
+                figures.save(fig, save, fresh)
 
         return fig
 
-    def addPower(self, rf2):
-        pass
+    def events(self, **kwargs):
+        '''
+        high reflected power events of this log, see rfevents.EventDetector
+        '''
+        from .rfevents import detectEvents
+        return detectEvents(self.t_rev_abs, self.P_fwd, self.P_rev, **kwargs)
+
+    def addPower(self, rf2, N=100):
+        '''
+        total forward and reflected power of both generators, interpolated
+        onto N points from the first to the last sample (s from self.t0)
+        '''
+        t_axis = np.linspace( self.data[0,0], self.data[-1,0], N ) - self.t0
+        P_fwd_total = np.interp(t_axis, self.T_fwd, self.P_fwd) + np.interp(t_axis, rf2.T_fwd, rf2.P_fwd)
+        P_rev_total = np.interp(t_axis, self.T_rev, self.P_rev) + np.interp(t_axis, rf2.T_rev, rf2.P_rev)
+
+        self.t_total = t_axis
+        self.P_fwd_total = P_fwd_total
+        self.P_rev_total = P_rev_total
+
+        return t_axis, P_fwd_total, P_rev_total
 
-    def comboPlot(self, rf2):
+    @timed("RFpower.comboPlot")
+    def comboPlot(self, rf2, save=False):
 
         rf1 = self
     
@@ -99,51 +135,55 @@ class RFpower:
         p2_rev = rf2.P_rev
     
         # need to interpolate
-        t_axis = np.linspace( rf1.data[0,0], rf1.data[-1,0], 100 ) - rf1.t0
-        p1_fwd_interp = np.interp(t_axis, t1_fwd, p1_fwd)
-        p2_fwd_interp = np.interp(t_axis, t2_fwd, p2_fwd)
-        P_fwd_total = p1_fwd_interp + p2_fwd_interp
-        p1_rev_interp = np.interp(t_axis, t1_rev, p1_rev)
-        p2_rev_interp = np.interp(t_axis, t2_rev, p2_rev)
-        P_rev_total = p1_rev_interp + p2_rev_interp
+        t_axis, P_fwd_total, P_rev_total = rf1.addPower(rf2)
     
         # plot
-        fig = plt.figure(layout="constrained", figsize=(10,8))
-        gs = GridSpec(3, 1, figure=fig)
-        ax0 = fig.add_subplot(gs[:-1])
-        ax1 = fig.add_subplot(gs[-1])
-
-        ax0.plot(t_axis, P_fwd_total, 'C2', lw=3, label="Total Foward")
-        ax0.plot(t_axis, P_rev_total, 'C3', lw=3, label="Total Reflected")
-        ax0.plot(t1_fwd, p1_fwd, 'C0o--', mfc='none', label="Forward 1")
-        ax0.plot(t2_fwd, p2_fwd, 'C0x--', label="Forward 2")
-        ax0.plot(t1_rev, p1_rev, 'C1o--', mfc='none', label="Reflected 1")
-        ax0.plot(t2_rev, p2_rev, 'C1x--', label="Reflected 2")
+        fig, (ax0, ax1), fresh = figures.figure("RFpower.comboPlot", lambda: layout(figsize=(10,8)))
+
+        figures.line(ax0, "fwd", t_axis, P_fwd_total, 'C2', lw=3, decimated=False, label="Total Foward")
+        figures.line(ax0, "rev", t_axis, P_rev_total, 'C3', lw=3, decimated=False, label="Total Reflected")
+        figures.line(ax0, "fwd1", t1_fwd, p1_fwd, 'C0o--', mfc='none', label="Forward 1")
+        figures.line(ax0, "fwd2", t2_fwd, p2_fwd, 'C0x--', label="Forward 2")
+        figures.line(ax0, "rev1", t1_rev, p1_rev, 'C1o--', mfc='none', label="Reflected 1")
+        figures.line(ax0, "rev2", t2_rev, p2_rev, 'C1x--', label="Reflected 2")
     
-        ax1.plot(t1_rev, p1_rev, 'C1o--', mfc='none', label="Reflected Power 1")
-        ax1.plot(t2_rev, p2_rev, 'C1x--', label="Reflected Power 2")
+        figures.line(ax1, "rev1", t1_rev, p1_rev, 'C1o--', mfc='none', label="Reflected Power 1")
+        figures.line(ax1, "rev2", t2_rev, p2_rev, 'C1x--', label="Reflected Power 2")
         
-        ax0.set_ylabel("Power (W)")
-        ax1.set_ylabel("Reflected (W)")
-        ax1.set_xlabel("Time (s)")
+        fig.suptitle(self.fname)
+        if fresh:
+            ax0.set_ylabel("Power (W)")
+            ax1.set_ylabel("Reflected (W)")
+            ax1.set_xlabel("Time (s)")
         
-        ax0.grid()
-        ax1.grid()
-        ax0.legend()
+            ax0.grid()
+            ax1.grid()
+            figures.legend(ax0)
         
-        fig.suptitle(self.fname)
-        fig.tight_layout()
-
+            fig.tight_layout()
 
-        # save data
-        self.P_fwd_total = P_fwd_total
-        self.P_rev_total = P_rev_total
-    
+        if save:
+            with stage("RFpower.savefig", file=save):
+                figures.save(fig, save, fresh)
     
         return fig
         
 ##
 # helper function
+def layout(**kwargs):
+    '''
+    power panel over a reflected power panel, 2:1
+    '''
+    import matplotlib.pyplot as plt
+    from matplotlib.gridspec import GridSpec
+
+    fig = plt.figure(layout="constrained", **kwargs)
+    gs = GridSpec(3, 1, figure=fig)
+    ax0 = fig.add_subplot(gs[:-1])
+    ax1 = fig.add_subplot(gs[-1])
+    return fig, (ax0, ax1)
+
+
 def getPair(line):
 
     try:
@@ -170,6 +210,8 @@ def getPair(line):
 ##
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     path = sys.argv[1]
     
     try:
@@ -0,0 +1,399 @@
+import io
+import json
+import os
+import zipfile
+import zlib
+
+import numpy as np
+
+from glob import glob
+
+'''
+Single-file shot archive (<shot>.muse).
+
+A deflate-compressed zip of .npy members plus meta.json:
+
+    meta.json                     settings, spectrometer header, sizes, derived results
+    nidaq/<column>/<k>.npy        NIDAQ channels in chunks of CHUNK samples
+    spectra/spectral_axis.npy
+    spectra/unix_time.npy
+    spectra/key/<k>.npy           first spectrum of each delta-encoded chunk
+    spectra/data/<k>.npy          spectra in chunks of SPEC_CHUNK rows
+    rf/<log>.npy                  parsed (time, power) pairs of each RF log
+
+Members are read on demand, so a sample or time range only touches the
+chunks it overlaps. DoubleProbe, OceanSpectra and RFpower accept an
+archive path in place of the text file ("shot.muse:RFLog2" selects an RF log).
+
+Spectra are quantized to integer counts and stored per chunk either as
+time differences from the chunk's first spectrum ("delta") or, when the
+chunk is noise dominated and differencing does not help, as plain counts
+("raw"), each in the smallest integer type that holds it, LZMA compressed.
+An archive may hold spectra only (OceanSpectra.save / writeSpectra).
+
+usage: python -m MuseAnalysis.archive export data/231223001/ [-s spec.txt] [-o out.muse]
+       python -m MuseAnalysis.archive unpack 231223001.muse data/231223001/
+'''
+
+VERSION = 2
+SUFFIX = ".muse"
+
+CHUNK = 1 << 16 # NIDAQ samples per chunk
+SPEC_CHUNK = 256 # spectra per chunk
+
+NIDAQ_COLUMNS = ["time", "AI0", "AI1", "AI2", "AI3", "AO0", "AO1"]
+RF_LOGS = ["RFLog1", "RFLog2"]
+
+
+def isArchive(fin):
+    return splitSelector(fin)[0].endswith(SUFFIX)
+
+
+def splitSelector(fin):
+    '''
+    "shot.muse:RFLog2" -> ("shot.muse", "RFLog2")
+    '''
+    fin = str(fin)
+    k = fin.rfind(SUFFIX + ":")
+    if k < 0:
+        return fin, None
+    k += len(SUFFIX)
+    return fin[:k], fin[k+1:]
+
+
+def readSettings(fin):
+    '''
+    settings.txt "key: value" lines to a dict, same rules as loggen
+    '''
+
+    settings = {}
+    with open(fin) as f:
+        for line in f:
+            if ":" not in line:
+                continue
+            head, body = line.split(":", 1)
+            head = head.strip()
+            if head in settings:
+                head = head + "_1"
+            settings[head] = body.strip()
+
+    return settings
+
+
+def _writeArray(zf, name, arr, compress_type=None):
+    if compress_type is None:
+        with zf.open(name, "w", force_zip64=True) as f:
+            np.lib.format.write_array(f, np.ascontiguousarray(arr), allow_pickle=False)
+        return
+
+    buf = io.BytesIO()
+    np.lib.format.write_array(buf, np.ascontiguousarray(arr), allow_pickle=False)
+    zf.writestr(name, buf.getvalue(), compress_type=compress_type)
+
+
+def _smallestInt(arr):
+    '''
+    cast an integer array to the narrowest dtype that holds its range
+    '''
+    lo, hi = (int(arr.min()), int(arr.max())) if arr.size else (0, 0)
+    for dtype in [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32]:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return arr.astype(dtype)
+    return arr.astype(np.int64)
+
+
+def _writeSpectra(zf, spec, chunk=SPEC_CHUNK):
+    '''
+    write the spectra section of an archive, returns its meta dict
+    '''
+
+    _writeArray(zf, "spectra/spectral_axis.npy", spec.spectral_axis)
+    _writeArray(zf, "spectra/unix_time.npy", spec.unix_time)
+
+    q = np.rint(spec.data).astype(np.int64)
+    quantized = not np.array_equal(q, spec.data)
+
+    encoding = []
+    for k, j in enumerate(range(0, max(len(q), 1), chunk)):
+        block = _smallestInt(q[j:j+chunk])
+        delta = _smallestInt(np.diff(q[j:j+chunk], axis=0))
+
+        # differencing doubles white noise, so keep whichever form a fast
+        # trial compression says is smaller
+        if len(block) > 1 and len(zlib.compress(delta.tobytes(), 1)) < len(zlib.compress(block.tobytes(), 1)):
+            _writeArray(zf, f"spectra/key/{k}.npy", block[0], zipfile.ZIP_LZMA)
+            _writeArray(zf, f"spectra/data/{k}.npy", delta, zipfile.ZIP_LZMA)
+            encoding.append("delta")
+        else:
+            _writeArray(zf, f"spectra/data/{k}.npy", block, zipfile.ZIP_LZMA)
+            encoding.append("raw")
+
+    return dict(source=os.path.basename(str(spec.fname)), meta=spec.meta,
+                human_time=list(spec.human_time), n=len(q),
+                chunk=chunk, chunks=len(encoding), encoding=encoding, quantized=quantized)
+
+
+def writeSpectra(spec, fout):
+    '''
+    save an OceanSpectra on its own as a compressed archive
+    '''
+
+    meta = dict(version=VERSION, shot=None, derived={})
+    with zipfile.ZipFile(fout, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        meta["spectra"] = _writeSpectra(zf, spec)
+        zf.writestr("meta.json", json.dumps(meta))
+
+    return fout
+
+
+def _writeChunks(zf, prefix, arr, chunk):
+    N = len(arr)
+    k = 0
+    for j in range(0, max(N, 1), chunk):
+        _writeArray(zf, f"{prefix}/{k}.npy", arr[j:j+chunk])
+        k += 1
+    return k
+
+
+def exportShot(path, fout=None, spec_file=None, derived=None,
+                     compresslevel=6,
+                     float32=False, # store NIDAQ channels (not time) as float32
+               ):
+    '''
+    pack a shot directory (and its spectroscopy file) into one archive.
+    Missing diagnostics are skipped. Returns the archive path.
+    '''
+    from .DoubleProbe import DoubleProbe
+    from .OceanSpectra import OceanSpectra
+    from .RF import RFpower
+
+    path = os.path.join(path, "")
+    shot = os.path.basename(os.path.dirname(path))
+    if fout is None:
+        fout = os.path.join(os.path.dirname(os.path.dirname(path)), shot + SUFFIX)
+
+    if spec_file is None:
+        found = glob(os.path.join(os.path.dirname(os.path.dirname(path)), "spectroscopy", f"*{shot}*txt"))
+        spec_file = found[0] if found else None
+
+    meta = dict(version=VERSION, shot=shot, derived=derived or {})
+
+    with zipfile.ZipFile(fout, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zf:
+
+        if os.path.exists(path + "settings.txt"):
+            meta["settings"] = readSettings(path + "settings.txt")
+
+        if os.path.exists(path + "NIDAQtext.txt"):
+            probe = DoubleProbe(path + "NIDAQtext.txt")
+            columns = probe.channels.columns
+            for name in columns:
+                col = probe.unix_time if name == "time" else probe.raw[name]
+                if float32 and name != "time":
+                    col = col.astype(np.float32)
+                chunks = _writeChunks(zf, f"nidaq/{name}", col, CHUNK)
+            meta["nidaq"] = dict(columns=columns, n=len(probe.unix_time), chunk=CHUNK, chunks=chunks,
+                                 channels=probe.channels.toDict())
+
+        if spec_file is not None:
+            meta["spectra"] = _writeSpectra(zf, OceanSpectra(spec_file))
+
+        meta["rf"] = {}
+        for log in RF_LOGS:
+            try:
+                rf = RFpower(path + log + ".txt")
+            except Exception:
+                continue
+            _writeArray(zf, f"rf/{log}.npy", rf.data)
+            meta["rf"][log] = dict(t0=rf.t0, n=len(rf.data))
+
+        zf.writestr("meta.json", json.dumps(meta))
+
+    return fout
+
+
+class ShotArchive:
+
+    def __init__(self, fin):
+
+        self.fname = splitSelector(fin)[0]
+        self.zf = zipfile.ZipFile(self.fname)
+        self.meta = json.loads(self.zf.read("meta.json"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.zf.close()
+
+    def has(self, section):
+        return bool(self.meta.get(section))
+
+    def read(self, name):
+        with self.zf.open(name) as f:
+            return np.lib.format.read_array(f, allow_pickle=False)
+
+    def _empty(self, name):
+        '''
+        a 0 row array of a member's dtype and row shape, from its header
+        '''
+        with self.zf.open(name) as f:
+            version = np.lib.format.read_magic(f)
+            header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = header(f)
+        return np.empty((0,) + tuple(shape[1:]), dtype)
+
+    def _readRange(self, prefix, chunk, chunks, i0, i1):
+        '''
+        rows [i0, i1) of a chunked member, reading only overlapping chunks
+        '''
+        k0 = i0 // chunk
+        k1 = min(max(i1 - 1, i0) // chunk + 1, chunks)
+        if k0 >= k1:
+            return self._empty(f"{prefix}/0.npy")
+        parts = [self.read(f"{prefix}/{k}.npy") for k in range(k0, k1)]
+        arr = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        return arr[i0 - k0*chunk : i1 - k0*chunk]
+
+    def channel(self, name, i0=0, i1=None):
+        '''
+        one NIDAQ column, optionally samples [i0, i1) only
+        '''
+        m = self.meta["nidaq"]
+        i1 = m["n"] if i1 is None else min(i1, m["n"])
+        i0 = min(i0, i1)
+        return self._readRange(f"nidaq/{name}", m["chunk"], m["chunks"], i0, i1)
+
+    def nidaq(self, i0=0, i1=None):
+        '''
+        NIDAQ table as in NIDAQtext.txt, shape (N, 7)
+        '''
+        cols = [self.channel(name, i0, i1).astype(float) for name in self.meta["nidaq"]["columns"]]
+        return np.column_stack(cols)
+
+    def spectraChunk(self, k):
+        '''
+        decoded integer spectra of chunk k
+        '''
+        m = self.meta["spectra"]
+        block = self.read(f"spectra/data/{k}.npy").astype(np.int64)
+
+        if m.get("encoding", ["raw"] * m["chunks"])[k] == "delta":
+            key = self.read(f"spectra/key/{k}.npy").astype(np.int64)
+            block = np.cumsum(np.vstack([key, block]), axis=0)
+
+        return block
+
+    def spectra(self, j0=0, j1=None):
+        '''
+        spectra rows [j0, j1) as float counts, decoding only overlapping chunks
+        '''
+        m = self.meta["spectra"]
+        j1 = m["n"] if j1 is None else min(j1, m["n"])
+        j0 = min(j0, j1)
+        chunk = m["chunk"]
+
+        k0 = j0 // chunk
+        k1 = min(max(j1 - 1, j0) // chunk + 1, m["chunks"])
+        if k0 >= k1:
+            return np.empty((0, len(self.read("spectra/spectral_axis.npy"))))
+        parts = [self.spectraChunk(k) for k in range(k0, k1)]
+        arr = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        return arr[j0 - k0*chunk : j1 - k0*chunk].astype(float)
+
+    def spectraRange(self, t0=None, t1=None):
+        '''
+        index range [j0, j1) of spectra with t0 <= time_axis (ms) < t1
+        '''
+        unix_time = self.read("spectra/unix_time.npy")
+        time_axis = unix_time - unix_time[0]
+        j0 = 0 if t0 is None else int(np.searchsorted(time_axis, t0, side="left"))
+        j1 = len(time_axis) if t1 is None else int(np.searchsorted(time_axis, t1, side="left"))
+        return j0, j1
+
+    def rf(self, log="RFLog1"):
+        '''
+        (time, power) pairs and the time offset t0 of one RF log
+        '''
+        return self.read(f"rf/{log}.npy"), self.meta["rf"][log]["t0"]
+
+
+def unpackShot(fin, path):
+    '''
+    write an archive back out as the original text files
+    '''
+
+    path = os.path.join(path, "")
+    os.makedirs(path, exist_ok=True)
+
+    with ShotArchive(fin) as ar:
+        if ar.has("settings"):
+            with open(path + "settings.txt", "w") as f:
+                for key, val in ar.meta["settings"].items():
+                    f.write(f"{key}: {val}\n")
+
+        if ar.has("nidaq"):
+            np.savetxt(path + "NIDAQtext.txt", ar.nidaq(), delimiter=",", fmt="%.17g")
+            if "channels" in ar.meta["nidaq"] and ar.meta["nidaq"]["columns"] != NIDAQ_COLUMNS:
+                with open(path + "channels.json", "w") as f:
+                    json.dump(ar.meta["nidaq"]["channels"], f, indent=1)
+
+        for log in ar.meta.get("rf", {}):
+            data, t0 = ar.rf(log)
+            with open(path + log + ".txt", "w") as f:
+                # first 14 characters of the first line are read back as t0
+                for t, p in data.tolist():
+                    f.write(f"{t!r:<14},{p!r}\n")
+
+        if ar.has("spectra"):
+            m = ar.meta["spectra"]
+            with open(path + m["source"], "w") as f:
+                f.write(f"Data from {m['source']}\n\n")
+                for key, val in m["meta"].items():
+                    f.write(f"{key}: {val}\n")
+                f.write(">>>>>Begin Spectral Data<<<<<\n")
+                f.write("\t\t" + "\t".join(map(repr, ar.read("spectra/spectral_axis.npy").tolist())) + "\n")
+                unix_time = ar.read("spectra/unix_time.npy")
+                data = ar.spectra()
+                for j in range(len(data)):
+                    f.write(f"{m['human_time'][j]}\t{unix_time[j]}\t" + "\t".join(map(repr, data[j].tolist())) + "\n")
+
+
+def main():
+    '''
+    Export shot directories to single-file archives, or unpack them again
+    '''
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    ex = sub.add_parser("export")
+    ex.add_argument("shots", nargs="+", help="shot directories")
+    ex.add_argument("-s", "--spectra", help="spectroscopy file (single shot only)")
+    ex.add_argument("-o", "--output", help="archive path (single shot only)")
+    ex.add_argument("--float32", action="store_true", help="store NIDAQ channels as float32")
+
+    un = sub.add_parser("unpack")
+    un.add_argument("archive")
+    un.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        single = len(args.shots) == 1
+        for shot in args.shots:
+            fout = exportShot(shot,
+                              fout=args.output if single else None,
+                              spec_file=args.spectra if single else None,
+                              float32=args.float32)
+            print(fout)
+    else:
+        unpackShot(args.archive, args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import numpy as np
+import os
+
+from .DoubleProbe import IV_tanh, density
+from .ivfit import fitBatch
+from .shared import ArrayHandle, SharedStore, attach, detach
+
+'''
+Bootstrap confidence intervals for the double probe I-V fit.
+
+The least-squares fit of I = Isat tanh(V / 2Te) + I_offset is repeated on
+resampled data: residuals of the original fit are drawn with replacement
+(or in moving blocks, for the correlated noise of a swept probe) and added
+back to the fitted curve. All resamples of a chunk are refit together by a
+batched Levenberg-Marquardt, each step one stacked 3x3 solve, so 1000
+resamples take a fraction of a second; very large counts are split over a
+process pool, which reads V and the fit from shared memory.
+'''
+
+
+def resampleResiduals(resid, n_boot, block=None, rng=None):
+    '''
+    (n_boot, N) resampled residuals; block=None draws points independently,
+    otherwise blocks of that length are joined (moving block bootstrap)
+    '''
+
+    rng = np.random.default_rng(rng)
+    N = len(resid)
+    if not block or block <= 1:
+        return resid[rng.integers(0, N, size=(n_boot, N))]
+
+    block = min(int(block), N)
+    n_blocks = -(-N // block)
+    starts = rng.integers(0, N - block + 1, size=(n_boot, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)).reshape(n_boot, -1)[:, :N]
+    return resid[idx]
+
+
+def _work(args):
+    '''
+    refit n_boot resamples in chunks of at most chunk, bounding memory
+    '''
+    V, fit, resid, p0, n_boot, block, seed, chunk = args
+    shared = isinstance(V, ArrayHandle)
+    V, fit, resid = attach(V), attach(fit), attach(resid)
+    try:
+        rng = np.random.default_rng(seed)
+        out = []
+        for k in range(0, n_boot, chunk):
+            Y = fit + resampleResiduals(resid, min(chunk, n_boot - k), block, rng)
+            out.append(fitBatch(V, Y, p0))
+        return np.concatenate(out)
+    finally:
+        if shared:
+            # pool workers are reused, release the views of this call
+            del V, fit, resid
+            detach()
+
+
+def bootstrapIV(V, I, param,
+                n_boot=1000,
+                block=None, # moving block length, None for i.i.d. residuals
+                workers=None, # processes, None to use a pool only for large n_boot
+                seed=0,
+                chunk=250, # resamples per batched fit
+                Area_probe_m2=6.8e-6,
+                ci=95,
+                ):
+    '''
+    percentile intervals for Te, Isat and ne from n_boot refits around the
+    fitted param = (Te, Isat, I_offset); returns a dict with the
+    (low, high) interval per quantity, the medians and the samples
+    '''
+
+    V = np.asarray(V, float)
+    I = np.asarray(I, float)
+    param = np.asarray(param, float)
+    fit = IV_tanh(V, *param)
+    resid = I - fit
+
+    if workers is None:
+        # a pool only pays for itself well above a few thousand resamples
+        workers = min(os.cpu_count() or 1, n_boot // 5000) or 1
+
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    counts = np.full(workers, n_boot // workers)
+    counts[:n_boot % workers] += 1
+    def tasks(V, fit, resid):
+        return [(V, fit, resid, param, int(c), block, s, chunk) for c, s in zip(counts, seeds)]
+
+    if workers == 1:
+        P = _work(tasks(V, fit, resid)[0])
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        # workers get handles, not copies of the arrays
+        with SharedStore() as store, ProcessPoolExecutor(max_workers=workers) as pool:
+            handles = store.put(V), store.put(fit), store.put(resid)
+            P = np.concatenate(list(pool.map(_work, tasks(*handles))))
+
+    Te, Isat = P[:, 0], P[:, 1]
+    samples = dict(Te=Te, Isat=Isat, I_offset=P[:, 2], ne=density(Te, Isat, Area_probe_m2))
+
+    lo, hi = (100 - ci) / 2, (100 + ci) / 2
+    result = dict(n_boot=n_boot, block=block, ci=ci, samples=samples)
+    for key, x in samples.items():
+        q = np.percentile(x, [lo, 50, hi])
+        result[key] = (q[0], q[2])
+        result[key + "_median"] = q[1]
+
+    return result
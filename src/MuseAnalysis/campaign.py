@@ -0,0 +1,330 @@
+import numpy as np
+import os
+
+'''
+Streaming statistics over a campaign of shots.
+
+Shots are read one at a time from a generator and reduced to a few
+numbers (Te, Isat, ne, peak H2 pressure, RF power and reflected fraction)
+plus the pressure and RF power samples. Each quantity folds into a
+Summary: count / mean / variance (Welford, merged with Chan's formula),
+min / max, a log-bucket quantile sketch with bounded relative error, and
+an optional fixed-edge histogram. Summaries built on separate workers
+merge exactly, so a campaign can be split over a process pool.
+
+usage: python -m MuseAnalysis.campaign data/2312* [-w 4] [-o stats.json]
+'''
+
+
+class QuantileSketch:
+    '''
+    mergeable quantile sketch with relative accuracy alpha: values fall in
+    logarithmic buckets gamma^(k-1) < |x| <= gamma^k, gamma = (1+a)/(1-a)
+    '''
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.pos = {}
+        self.neg = {}
+        self.zero = 0
+        self.count = 0
+
+
+    def _fold(self, store, x):
+        k, n = np.unique(np.ceil(np.log(x) / np.log(self.gamma)).astype(np.int64), return_counts=True)
+        for key, c in zip(k.tolist(), n.tolist()):
+            store[key] = store.get(key, 0) + c
+
+
+    def add(self, x):
+        x = np.asarray(x, float).ravel()
+        x = x[np.isfinite(x)]
+        tiny = np.finfo(float).tiny
+        self._fold(self.pos, x[x > tiny])
+        self._fold(self.neg, -x[x < -tiny])
+        self.zero += int(np.count_nonzero(np.abs(x) <= tiny))
+        self.count += len(x)
+
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("sketches with different accuracy cannot be merged")
+        for store, ostore in [(self.pos, other.pos), (self.neg, other.neg)]:
+            for key, c in ostore.items():
+                store[key] = store.get(key, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+
+    def quantile(self, q):
+        '''
+        value at quantile q (0..1), NaN for an empty sketch
+        '''
+        if self.count == 0:
+            return np.nan
+
+        # buckets in increasing value order: negatives (large |x| first), zero, positives
+        keys = [(-self.gamma**k * 2 / (1 + self.gamma), c) for k, c in sorted(self.neg.items(), reverse=True)]
+        keys += [(0.0, self.zero)]
+        keys += [(self.gamma**k * 2 / (1 + self.gamma), c) for k, c in sorted(self.pos.items())]
+
+        values = np.array([v for v, c in keys])
+        cum = np.cumsum([c for v, c in keys])
+        rank = q * (self.count - 1)
+        return float(values[np.searchsorted(cum, rank, side="right")])
+
+
+class Summary:
+    '''
+    running count, mean, variance, min, max, quantile sketch and histogram
+    '''
+
+    def __init__(self, bins=None, alpha=0.01):
+        self.n = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(alpha)
+        self.bins = None if bins is None else np.asarray(bins, float)
+        self.hist = None if bins is None else np.zeros(len(self.bins) - 1, np.int64)
+
+
+    def add(self, x):
+        x = np.asarray(x, float).ravel()
+        x = x[np.isfinite(x)]
+        if len(x) == 0:
+            return
+
+        # a batch is merged in as a partial summary of its own
+        part = Summary()
+        part.n = len(x)
+        part.mean = float(x.mean())
+        part.M2 = float(((x - part.mean)**2).sum())
+        part.min = float(x.min())
+        part.max = float(x.max())
+        self._mergeMoments(part)
+
+        self.sketch.add(x)
+        if self.hist is not None:
+            self.hist += np.histogram(x, self.bins)[0]
+
+
+    def _mergeMoments(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.M2 += other.M2 + delta**2 * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+
+    def merge(self, other):
+        self._mergeMoments(other)
+        self.sketch.merge(other.sketch)
+        if self.hist is not None and other.hist is not None:
+            if not np.array_equal(self.bins, other.bins):
+                raise ValueError("histograms with different bins cannot be merged")
+            self.hist += other.hist
+        return self
+
+
+    @property
+    def variance(self):
+        return self.M2 / (self.n - 1) if self.n > 1 else np.nan
+
+
+    def result(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        out = dict(count=self.n, mean=self.mean if self.n else np.nan,
+                   std=float(np.sqrt(self.variance)),
+                   min=self.min if self.n else np.nan, max=self.max if self.n else np.nan)
+        for q in quantiles:
+            out[f"p{100*q:g}"] = self.sketch.quantile(q)
+        if self.hist is not None:
+            out["bins"] = self.bins.tolist()
+            out["hist"] = self.hist.tolist()
+        return out
+
+
+# histogram edges of the quantities with a known range, the rest are sketch only
+BINS = {
+    "Te": np.linspace(0, 50, 51), # eV
+    "ne": np.geomspace(1e14, 1e19, 51), # m^-3
+    "pressure_peak": np.geomspace(1e-5, 1e-1, 41), # Torr
+    "rf_reflected_fraction": np.linspace(0, 1, 41),
+}
+
+
+class CampaignStats:
+
+    def __init__(self, bins=BINS, alpha=0.01):
+        self.bins = bins
+        self.alpha = alpha
+        self.summaries = {}
+        self.shots = []
+        self.failed = []
+
+
+    def add(self, shot, values):
+        '''
+        fold one shot's {quantity: value or array} into the summaries
+        '''
+        for name, x in values.items():
+            if name not in self.summaries:
+                self.summaries[name] = Summary(self.bins.get(name), self.alpha)
+            self.summaries[name].add(x)
+        self.shots.append(shot)
+
+
+    def merge(self, other):
+        for name, s in other.summaries.items():
+            if name in self.summaries:
+                self.summaries[name].merge(s)
+            else:
+                self.summaries[name] = s
+        self.shots += other.shots
+        self.failed += other.failed
+        return self
+
+
+    def result(self):
+        return dict(n_shots=len(self.shots), failed=self.failed,
+                    quantities={name: s.result() for name, s in sorted(self.summaries.items())})
+
+
+def shotValues(path, sg_window=50):
+    '''
+    {quantity: value or samples} for one shot directory or .muse archive;
+    diagnostics that are missing are left out
+    '''
+    from .DoubleProbe import DoubleProbe, pressure
+    from .RF import RFpower
+    from .archive import isArchive
+    from .window import smooth
+
+    if isArchive(path):
+        probe_file = path
+        rf_files = [f"{path}:RFLog1", f"{path}:RFLog2"]
+    else:
+        path = os.path.join(path, "")
+        probe_file = path + "NIDAQtext.txt"
+        rf_files = [path + "RFLog1.txt", path + "RFLog2.txt"]
+
+    values = {}
+    try:
+        probe = DoubleProbe(probe_file)
+    except (OSError, KeyError, ValueError):
+        probe = None
+
+    rfs = []
+    for fin in rf_files:
+        try:
+            rfs.append(RFpower(fin))
+        except (OSError, KeyError, ValueError):
+            continue
+
+    if rfs:
+        rf = rfs[0]
+        if len(rfs) > 1:
+            t, fwd, rev = rf.addPower(rfs[1], N=len(rf.T_fwd))
+        else:
+            fwd, rev = rf.P_fwd, rf.P_rev
+        on = fwd > 0.1 * fwd.max()
+        values["rf_fwd_total"] = fwd
+        values["rf_rev_total"] = rev
+        values["rf_fwd_mean"] = fwd[on].mean()
+        values["rf_reflected_fraction"] = rev[on].sum() / fwd[on].sum()
+
+    if probe is not None:
+        P_raw, P_H2 = pressure(probe.signal("pressure"))
+        values["pressure_H2"] = P_H2
+        values["pressure_peak"] = smooth(P_H2, sg_window).max()
+
+        probe.plasmaWindow(rf=rfs or None)
+        probe.plotIV(plot=False)
+        for key in ["Te", "Isat", "ne"]:
+            values[key] = probe.fit[key]
+
+    return values
+
+
+def iterShots(paths):
+    '''
+    yield (shot, values or None) one shot at a time
+    '''
+    for path in paths:
+        try:
+            yield path, shotValues(path)
+        except Exception as err:
+            print(f"{path}: {err!r}")
+            yield path, None
+
+
+def aggregate(paths, **kwargs):
+    '''
+    CampaignStats over paths, streaming one shot at a time
+    '''
+    stats = CampaignStats(**kwargs)
+    for shot, values in iterShots(paths):
+        if values is None:
+            stats.failed.append(shot)
+        else:
+            stats.add(shot, values)
+    return stats
+
+
+def campaignStats(paths, workers=1, **kwargs):
+    '''
+    aggregate paths split over a process pool, partial results merged
+    '''
+    paths = list(paths)
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1:
+        return aggregate(paths, **kwargs)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    parts = [paths[k::workers] for k in range(workers)]
+    with ProcessPoolExecutor(workers) as pool:
+        partials = list(pool.map(partial(aggregate, **kwargs), parts))
+
+    stats = partials[0]
+    for part in partials[1:]:
+        stats.merge(part)
+    return stats
+
+
+def main():
+    '''
+    Distribution of Te, ne, pressure and RF power over many shots
+    '''
+    import argparse
+    import json
+    import sys
+    from glob import glob
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("shots", nargs="+", help="shot directories or .muse archives (globs allowed)")
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    parser.add_argument("-o", "--output", help="json file, default stdout")
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.shots for p in (sorted(glob(pattern)) or [pattern])]
+    result = campaignStats(paths, args.workers).result()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=1)
+    else:
+        json.dump(result, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == "__main__":
+    main()
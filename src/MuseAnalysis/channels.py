@@ -0,0 +1,199 @@
+import copy
+import json
+import os
+
+'''
+Channel maps for the NIDAQ table.
+
+A map names the columns of NIDAQtext.txt in file order, assigns columns
+to named channels with a linear calibration (value = gain * raw + offset)
+and groups bias / shunt channels into probes:
+
+    {"columns": ["time", "AI0", "AI1", "AI2", "AI3", "AO0", "AO1", "AI4", "AI5"],
+     "channels": {"pressure": {"column": "AI0"},
+                  "bias2": {"column": "AI4", "gain": 22.7},
+                  "shunt2": {"column": "AI5", "gain": 0.047}, ...},
+     "probes": {"probe2": {"V": "bias2", "I": "shunt2", "area": 6.8e-6}, ...}}
+
+The default is the single probe layout since 12/22; shots numbered
+before BIAS_BOX get the old bias box gains. A shot directory overrides it
+with a channels.json next to NIDAQtext.txt.
+'''
+
+CONFIG = "channels.json"
+
+# bias box change on 12/22, earlier shots use these gains
+BIAS_BOX = 231222000
+BIAS_BOX_GAINS = dict(bias=10, shunt=97.8757/5)
+
+DEFAULT = dict(
+    columns=["time", "AI0", "AI1", "AI2", "AI3", "AO0", "AO1"],
+    # in plotRaw panel order
+    channels=dict(
+        pressure=dict(column="AI0"),
+        bias_request=dict(column="AO0"),
+        bias=dict(column="AI2", gain=40/1.76), # to V
+        shunt=dict(column="AI3", gain=4e-2/0.85), # to mA
+        float=dict(column="AI1"), # floating probe
+    ),
+    probes=dict(
+        probe=dict(V="bias", I="shunt", area=6.8e-6), # m^2
+    ),
+)
+
+
+class ChannelMap:
+
+    def __init__(self, columns, channels, probes):
+
+        self.columns = list(columns)
+        self.channels = {name: dict(ch) for name, ch in channels.items()}
+        self.probes = {name: dict(p) for name, p in probes.items()}
+
+        if "time" not in self.columns:
+            raise ValueError("channel map has no 'time' column")
+        for name, ch in self.channels.items():
+            if ch["column"] not in self.columns:
+                raise ValueError(f"channel {name!r} uses unknown column {ch['column']!r}")
+        for name, p in self.probes.items():
+            for role in ["V", "I"]:
+                if p.get(role) not in self.channels:
+                    raise ValueError(f"probe {name!r} {role} is not a channel: {p.get(role)!r}")
+
+
+    @classmethod
+    def default(cls, shot=None):
+        '''
+        the single probe map, with the old bias box gains for a shot
+        numbered before BIAS_BOX
+        '''
+        channels = cls.fromDict(DEFAULT)
+        if shot is not None and int(shot) < BIAS_BOX:
+            for name, gain in BIAS_BOX_GAINS.items():
+                channels.setGain(name, gain)
+        return channels
+
+
+    @classmethod
+    def fromDict(cls, d):
+        return cls(d["columns"], d.get("channels", {}), d.get("probes", {}))
+
+
+    @classmethod
+    def load(cls, fin):
+        with open(fin) as f:
+            return cls.fromDict(json.load(f))
+
+
+    @classmethod
+    def find(cls, fin):
+        '''
+        the channels.json beside a NIDAQ file, else the default map for
+        its shot
+        '''
+        config = os.path.join(os.path.dirname(str(fin)), CONFIG)
+        if os.path.exists(config):
+            return cls.load(config)
+        return cls.default(shotNumber(fin))
+
+
+    def toDict(self):
+        return dict(columns=list(self.columns),
+                    channels=copy.deepcopy(self.channels),
+                    probes=copy.deepcopy(self.probes))
+
+
+    def save(self, fout):
+        with open(fout, "w") as f:
+            json.dump(self.toDict(), f, indent=1)
+
+
+    def copy(self):
+        return ChannelMap.fromDict(self.toDict())
+
+
+    def index(self, column):
+        return self.columns.index(column)
+
+
+    def columnsFor(self, names):
+        '''
+        the columns (time first, then in file order) holding the named
+        channels, the V / I channels of named probes and named columns;
+        "probes" stands for every probe
+        '''
+        need = {"time"}
+        for name in names:
+            if name == "probes":
+                need |= set(self.columnsFor(self.probes))
+            elif name in self.probes:
+                need |= {self.channels[self.probes[name][role]]["column"] for role in ["V", "I"]}
+            elif name in self.channels:
+                need.add(self.channels[name]["column"])
+            elif name in self.columns:
+                need.add(name)
+            else:
+                raise KeyError(f"{name!r} is not a channel, probe or column")
+        return [c for c in self.columns if c in need]
+
+
+    def probe(self, name=None):
+        '''
+        (name, settings) of a probe, the first one if name is None
+        '''
+        if name is None:
+            name = next(iter(self.probes))
+        return name, self.probes[name]
+
+
+    def gain(self, channel):
+        return self.channels[channel].get("gain", 1.0)
+
+
+    def setGain(self, channel, gain):
+        self.channels[channel]["gain"] = gain
+
+
+    def calibrate(self, channel, raw):
+        '''
+        gain * raw + offset of a named channel
+        '''
+        ch = self.channels[channel]
+        value = raw * ch.get("gain", 1.0)
+        if ch.get("offset"):
+            value = value + ch["offset"]
+        return value
+
+
+def resolve(channels=None, fin=None, stored=None):
+    '''
+    ChannelMap from a ChannelMap, dict or json file; None gives the map an
+    archive stored, else the channels.json beside fin, else the default
+    '''
+    if channels is None:
+        # a stored default map is rebuilt, so archives written before the
+        # bias box rule still get the old gains
+        if stored and stored != ChannelMap.default().toDict():
+            return ChannelMap.fromDict(stored)
+        return ChannelMap.find(fin)
+    if isinstance(channels, dict):
+        return ChannelMap.fromDict(channels)
+    if isinstance(channels, (str, os.PathLike)):
+        return ChannelMap.load(channels)
+    return channels.copy()
+
+
+def shotNumber(fin):
+    '''
+    shot number of a NIDAQ file (its directory) or a .muse archive, None
+    when the name is not a number
+    '''
+    from .archive import isArchive, splitSelector
+
+    if fin is None:
+        return None
+    if isArchive(fin):
+        name = os.path.basename(splitSelector(fin)[0]).rsplit(".", 1)[0]
+    else:
+        name = os.path.basename(os.path.dirname(os.path.abspath(str(fin))))
+    return int(name) if name.isdigit() else None
@@ -1,6 +1,5 @@
 import glob
 import json
-import pandas as pd
 import argparse
 
 
@@ -47,6 +46,8 @@ def main():
     with open(out+".json", "w") as f:
         json.dump(logs, f)
 
+    import pandas as pd
+
     df = pd.DataFrame(data=logs).T
     df.to_csv(out+".csv", sep="\t")
 
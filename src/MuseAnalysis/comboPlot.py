@@ -1,14 +1,15 @@
 from .RF import RFpower
 from .DoubleProbe import DoubleProbe
 from .OceanSpectra import OceanSpectra
+from . import instrument
+from .instrument import stage
+from . import figures
 
 import numpy as np
-import matplotlib.pyplot as plt
 # import sys
 import os
 
 from glob import glob
-from matplotlib.gridspec import GridSpec
 import argparse
 
 def main():
@@ -22,16 +23,24 @@ def main():
     '''
 
     parser = argparse.ArgumentParser(description=main.__doc__)
-    parser.add_argument("-t","--target")
+    parser.add_argument("-t","--target", nargs="+", help="one or more shot numbers")
     parser.add_argument("-s","--show",action="store_true")
+    parser.add_argument("-i","--instrument", help="append stage timing as JSON lines to this file ('-' for stderr)")
+    parser.add_argument("-p","--pipeline", action="store_true",
+                        help="overlap loading, fitting, drawing and saving of several shots (not with --show)")
+    parser.add_argument("-l","--limit", action="append", default=[], metavar="STAGE=N",
+                        help="tasks of a pipeline stage (load, compute, render, save) run at once")
 
     args = parser.parse_args()
 
+    # only pay for matplotlib once arguments are valid
+    import matplotlib.pyplot as plt
+
     if hasattr(args, "help"):
         if args.help:
             parser.print_help()
-    if hasattr(args, "target"):
-        shot = args.target
+    if hasattr(args, "target") and args.target:
+        shots = args.target
     else:
         raise ValueError("No target specified")
     if hasattr(args, "show"):
@@ -44,78 +53,151 @@ def main():
     data_path = os.getenv("MUSE_DATA_PATH")
     if data_path is None:
         data_path = "./"
+
+    if args.instrument:
+        instrument.enable(args.instrument)
+
+    # a batch that is not shown draws every shot into the same figures
+    if len(shots) > 1 and not iflag_show:
+        figures.mode = "reuse"
+
+    if args.pipeline and not iflag_show:
+        limits = {}
+        for item in args.limit:
+            name, _, n = item.partition("=")
+            limits[name] = int(n)
+        failed = pipeline(shots, data_path, limits)
+        for shot, e in failed.items():
+            print(f"{shot} failed: {e!r}")
+    else:
+        for shot in shots:
+            run(shot, data_path)
+
+    if iflag_show:
+        plt.show()
+    figures.release()
+
+
+def run(shot, data_path="./"):
+    '''
+    load, fit and plot one shot, figures are saved into its directory
+    '''
     path = f"{data_path}{shot}/"
-    
+    instrument.setContext(shot=shot)
 
-    fig,axs = plt.subplots(5,1, figsize=(12,9))
-    axs[0].set_title(shot)
+    with stage("comboPlot.load"):
+        rf1 = loadRF(path+"RFLog1.txt")
+        rf2 = loadRF(path+"RFLog2.txt")
+        probe = loadProbe(shot, path)
+        spec = loadSpectra(shot)
 
-    # seconds between Jan 1 1904 and Jan 1 1970, both GMT midnight
-    t_gap = 2082844800.0
+    with stage("comboPlot.analyse"):
+        analysis = analyseProbe(probe, rf1, rf2)
 
-    ### Load Data
+    render(shot, path, rf1, rf2, probe, spec, analysis)
+    figures.finish()
 
-    # double probe
-    try:
-        probe = DoubleProbe(path+"NIDAQtext.txt")
 
-        if int(shot) < 231222000: # threshold for bias box change
-            probe.V_factor = 10
-            probe.I_factor = 97.8757/5
+def loadRF(fin):
+    '''
+    RFpower of one log, None if it is missing or unreadable
+    '''
+    try:
+        return RFpower(fin)
+    except:
+        return None
 
-        probe.plotIV(save=path+"plotIV.png")
-        probe.plotRaw(save=path+"plotRaw.png")
 
+def loadProbe(shot, path):
+    '''
+    DoubleProbe of the shot, the channel map has the bias box gains of
+    its date (channels.BIAS_BOX)
+    '''
+    try:
+        return DoubleProbe(path+"NIDAQtext.txt")
     except:
-        print("no probe data")
+        return None
 
-    # spectroscopy
+
+def loadSpectra(shot):
     try:
         path2 = glob(f"data/spectroscopy/*{shot}*txt")[0]
-        spec = OceanSpectra(path2)
-        t_spec = spec.unix_time # ms from 1970
-        T_spec = t_spec/1e3  + t_gap # sec from 1904
-        hasSpec = True
+        return OceanSpectra(path2)
     except:
         print("spectroscopy data not found")
-        hasSpec = False
+        return None
 
-    # RF power
-    try:
-        rf1 = RFpower(path+"RFLog1.txt")
-        rf1.plotRF()
-        hasRF1 = True
-    except:
-        hasRF1 = False
 
+def analyseProbe(probe, rf1=None, rf2=None):
+    '''
+    plasma window and I-V fit, the attributes render needs from them; no
+    matplotlib, so it can run in another process
+    '''
+    if probe is None:
+        return None
     try:
-        rf2 = RFpower(path+"RFLog2.txt")
-        rf2.plotRF()
-        hasRF2 = True
+        # fit only where the plasma was on
+        rfs = [rf for rf in (rf1, rf2) if rf is not None]
+        probe.plasmaWindow(rf=rfs or None)
+        probe.fitIV()
     except:
-        hasRF2 = False
+        return None
+    return dict(window=probe.window, fit=probe.fit, boot=probe.boot, iv=probe.iv)
 
-    if hasRF1 and hasRF2:
-        rf1.comboPlot(rf2)
 
+def render(shot, path, rf1, rf2, probe, spec, analysis):
+    '''
+    draw and save the figures of one shot, from what analyseProbe found
+    '''
+    import matplotlib.pyplot as plt
 
+    fig, axs, fresh = figures.figure("comboPlot", lambda: plt.subplots(5,1, figsize=(12,9)))
+    axs[0].set_title(shot)
 
-    ### Get Common Time
-    T_probe = probe.unix_time # s from 1904
+    # seconds between Jan 1 1904 and Jan 1 1970, both GMT midnight
+    t_gap = 2082844800.0
+
+    # RF power
+    with stage("comboPlot.rf"):
+        for rf in (rf1, rf2):
+            if rf is not None:
+                rf.plotRF()
+        if rf1 is not None and rf2 is not None:
+            rf1.comboPlot(rf2)
+
+    # double probe
+    with stage("comboPlot.probe"):
+        try:
+            if analysis is None:
+                print("no probe fit")
+            else:
+                # the fit may have run in another process
+                vars(probe).update(analysis)
+                probe.drawIV(save=path+"plotIV.png")
+            probe.plotRaw(save=path+"plotRaw.png")
+        except:
+            print("no probe data")
+
+    # spectroscopy
+    hasSpec = spec is not None
+    if hasSpec:
+        t_spec = spec.unix_time # ms from 1970
+        T_spec = t_spec/1e3  + t_gap # sec from 1904
 
+    ### Get Common Time
 
     # this will break if there is no RF1 data
-    T_rf1_fwd = rf1.t_fwd_abs
-    T_rf1_rev = rf1.t_rev_abs
+    t0_global = rf1.t_fwd_abs[0]
+
+    # shifted copies, the loaded arrays may be read-only shared memory
+    T_probe = probe.unix_time - t0_global # s from 1904
+    V_probe, I_probe = probe.probeVI() # not from the fit, which may have failed
+    T_rf1_fwd = rf1.t_fwd_abs - t0_global
+    T_rf1_rev = rf1.t_rev_abs - t0_global
     p1_fwd = rf1.P_fwd
     p1_rev = rf1.P_rev
-    t0_global = T_rf1_fwd[0]
-
-    T_probe -= t0_global
-    T_rf1_fwd -= t0_global
-    T_rf1_rev -= t0_global
     if hasSpec:
-        T_spec -= t0_global
+        T_spec = T_spec - t0_global
 
     if hasSpec:
         t_start = np.min([T_spec[0], T_probe[0], T_rf1_fwd[0], T_rf1_rev[0]])
@@ -126,46 +208,132 @@ def main():
 
 
     ### Plot
+    with stage("comboPlot.render"):
+        if hasSpec:
+            spec.findPeak(f0=656.279) #H-alpha
+            spec.findPeak(f0=486.135) #H-beta
+            spec.findPeak(f0=434.0462) #H-gamma
 
-    if hasSpec:
-        spec.findPeak(f0=656.279) #H-alpha
-        spec.findPeak(f0=486.135) #H-beta
-        spec.findPeak(f0=434.0462) #H-gamma
+            # plot identified freq peaks over time
+            N_lines = len(spec.lines)
+            for j in np.arange(N_lines):
+                figures.line(axs[0], f"line{j}", T_spec, spec.lines[j], label=f"{spec.freqs[j]} nm")
+            axs[0].set_ylabel('counts')
 
-        # plot identified freq peaks over time
-        N_lines = len(spec.lines)
-        for j in np.arange(N_lines):
-            axs[0].plot(T_spec, spec.lines[j], label=f"{spec.freqs[j]} nm")
-        axs[0].set_ylabel('counts')
+            # make a second panel with 2D spectragram
+            spec.plot2d(j=150)
+        else:
+            # a reused figure still holds the previous shot's lines
+            for j in range(3):
+                figures.blank(axs[0], f"line{j}")
 
-        # make a second panel with 2D spectragram
-        spec.plot2d(j=150)
 
+        figures.line(axs[1], "fwd", T_rf1_fwd, p1_fwd,'o-',label="P forward")
+        figures.line(axs[1], "rev", T_rf1_rev, p1_rev,'o-',label="P reverse")
 
-    axs[1].plot(T_rf1_fwd, p1_fwd,'o-',label="P forward")
-    axs[1].plot(T_rf1_rev, p1_rev,'o-',label="P reverse")
+        probe.plotPressure(axs[2], t_global=T_probe)
+        # probe.plotPressure()
 
-    probe.plotPressure(axs[2], t_global=T_probe)
-    # probe.plotPressure()
-    axs[2].grid()
+        figures.line(axs[3], "V", T_probe, V_probe, label='probe V')
+        figures.line(axs[4], "I", T_probe, I_probe, label='shunt I')
 
-    axs[3].plot(T_probe, probe.V, label='probe V')
-    axs[4].plot(T_probe, probe.I, label='shunt I')
+        for a in axs:
+            a.set_xlim(t_start, t_end) 
+            figures.legend(a)
 
-    axs[1].set_ylabel('RF Power (W)')
-    axs[3].set_ylabel('V')
-    axs[4].set_ylabel('mA')
+        if fresh:
+            axs[1].set_ylabel('RF Power (W)')
+            axs[3].set_ylabel('V')
+            axs[4].set_ylabel('mA')
+            for a in axs:
+                a.grid(True)
+            axs[-1].set_xlabel('time (s)')
 
-    for a in axs:
-        a.set_xlim(t_start, t_end) 
-        a.legend()
-        a.grid()
-    axs[-1].set_xlabel('time (s)')
+            fig.tight_layout()
 
-    fig.tight_layout()
-    fig.savefig(path+"plotTime.png")
-    if iflag_show:
-        plt.show()
+    with stage("comboPlot.savefig"):
+        figures.save(fig, path+"plotTime.png", fresh)
+
+
+def stages(limits=None):
+    '''
+    the pipeline stages, with limits {stage: n} overriding how many tasks
+    of a stage run at once; more than one renderer runs in processes
+    (pyplot is not thread safe), each with its own reused figures. Shots
+    render in order, as the first one fixes the layout of reused figures.
+    '''
+    from .scheduler import Stage, THREAD, PROCESS
+
+    limits = dict(limits or {})
+    unknown = set(limits) - {"load", "compute", "render", "save"}
+    if unknown:
+        raise ValueError(f"unknown stages {sorted(unknown)}")
+
+    render = limits.get("render", 1)
+    return dict(load=Stage(THREAD, limits.get("load", 4)),
+                compute=Stage(PROCESS, limits.get("compute", os.cpu_count() or 1)),
+                render=Stage(THREAD if render == 1 else PROCESS, render, ordered=True),
+                save=Stage(THREAD, limits.get("save", 2)))
+
+
+def renderShot(shot, path, mode, rf1, rf2, probe, spec, analysis):
+    '''
+    render() without writing files; returns the drawn figures for saveShot
+    '''
+    old = figures.mode, figures.defer
+    figures.mode = mode
+    figures.defer = True
+    try:
+        render(shot, path, rf1, rf2, probe, spec, analysis)
+        return figures.queued()
+    except:
+        # a half drawn template must not be reused by the next shot
+        figures.release()
+        figures.queued()
+        raise
+    finally:
+        figures.finish()
+        # later save() calls in this process write their files again
+        figures.mode, figures.defer = old
+
+
+def saveShot(drawn):
+    for fname, rgba, dpi in drawn:
+        with stage("comboPlot.savefig", file=fname):
+            figures.write(fname, rgba, dpi)
+    return [fname for fname, rgba, dpi in drawn]
+
+
+def pipeline(shots, data_path="./", limits=None):
+    '''
+    run shots through a scheduler.Pipeline: per shot the logs load on
+    threads, the probe is fitted in a process pool, one thread draws and
+    the PNGs are written on threads, so later shots load and fit while
+    earlier ones are drawn. Returns {shot: exception} of failed shots.
+    '''
+    import matplotlib
+    from .scheduler import Pipeline
+
+    # drawing happens off the main thread, and nothing is shown
+    matplotlib.use("Agg")
+
+    st = stages(limits)
+    # enough shots in flight to keep every stage busy
+    pipe = Pipeline(st, window=sum(s.limit for s in st.values()))
+
+    for shot in shots:
+        path = f"{data_path}{shot}/"
+        rf1 = pipe.add(("rf1", shot), "load", loadRF, path+"RFLog1.txt", group=shot)
+        rf2 = pipe.add(("rf2", shot), "load", loadRF, path+"RFLog2.txt", group=shot)
+        probe = pipe.add(("probe", shot), "load", loadProbe, shot, path, group=shot)
+        spec = pipe.add(("spectra", shot), "load", loadSpectra, shot, group=shot)
+        fit = pipe.add(("fit", shot), "compute", analyseProbe, after=[probe, rf1, rf2], group=shot)
+        drawn = pipe.add(("render", shot), "render", renderShot, shot, path, figures.mode,
+                         after=[rf1, rf2, probe, spec, fit], group=shot)
+        pipe.add(("save", shot), "save", saveShot, after=[drawn], group=shot)
+
+    results, errors = pipe.run()
+    return {shot: e for (name, shot), e in errors.items() if name == "save"}
 
 
 if __name__ == "__main__":
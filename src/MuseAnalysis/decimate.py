@@ -0,0 +1,121 @@
+import numpy as np
+import os
+
+'''
+Min/max envelope decimation for time-series plots.
+
+Each series is cut into one bin per horizontal pixel of the target axes
+and reduced to the min and max sample of each bin (kept in time order), so
+spikes survive but a plot never draws more than ~2 points per pixel.
+Images (spectrograms) keep the per-pixel max of their time columns.
+
+Set MUSE_DECIMATE=0 (or decimate.enabled = False) to draw full resolution.
+'''
+
+enabled = os.getenv("MUSE_DECIMATE", "1") != "0"
+
+
+def minmax(x, y, n_bins):
+    '''
+    reduce (x, y) to the per-bin min and max of y, at most 2*n_bins + 2 points
+
+    returns the original arrays when they are already short enough; masked
+    samples (e.g. saturated pixels) come back as NaN and never win a bin
+    '''
+
+    if np.ma.isMaskedArray(y):
+        y = np.ma.filled(y.astype(float), np.nan)
+    y = np.asarray(y)
+    N = len(y)
+    if x is None:
+        x = np.arange(N)
+    x = np.asarray(x)
+
+    n_bins = int(n_bins)
+    if n_bins < 1 or N <= 2 * n_bins:
+        return x, y
+
+    # equal bins of k samples, pad the tail with the last sample
+    k = -(-N // n_bins)
+    n_bins = -(-N // k)
+    pad = n_bins * k - N
+    yb = np.concatenate([y, np.repeat(y[-1:], pad)]).reshape(n_bins, k)
+
+    base = np.arange(n_bins) * k
+    if y.dtype.kind == "f":
+        # skip NaN, a bin of only NaN keeps one and is drawn as a gap
+        nan = np.isnan(yb)
+        j_min = base + np.argmin(np.where(nan, np.inf, yb), axis=1)
+        j_max = base + np.argmax(np.where(nan, -np.inf, yb), axis=1)
+    else:
+        j_min = base + np.argmin(yb, axis=1)
+        j_max = base + np.argmax(yb, axis=1)
+
+    # keep time order within each bin, and the end points so the x range is unchanged
+    idx = np.stack([np.minimum(j_min, j_max), np.maximum(j_min, j_max)], axis=1).ravel()
+    idx = np.concatenate([[0], np.minimum(idx, N - 1), [N - 1]])
+
+    return x[idx], y[idx]
+
+
+def axisPixels(ax):
+    '''
+    width of the axes in device pixels
+    '''
+    width = ax.get_window_extent().width
+    return max(int(width), 100)
+
+
+def plot(ax, x, y, *args, n_bins=None, **kwargs):
+    '''
+    ax.plot(x, y, *args, **kwargs) with min/max decimation to the axes width.
+    x may be None to plot against sample index, like ax.plot(y).
+    '''
+
+    if not enabled:
+        if x is None:
+            return ax.plot(y, *args, **kwargs)
+        return ax.plot(x, y, *args, **kwargs)
+
+    if n_bins is None:
+        n_bins = axisPixels(ax)
+    xd, yd = minmax(x, y, n_bins)
+
+    return ax.plot(xd, yd, *args, **kwargs)
+
+
+def maxColumns(x, Z, n_bins):
+    '''
+    reduce the rows of Z (one per x) to the max of each of n_bins bins,
+    with x at the bin centre; returns the inputs when already short enough
+    '''
+
+    x = np.asarray(x)
+    Z = np.asarray(Z)
+    N = len(Z)
+    n_bins = int(n_bins)
+    if n_bins < 1 or N <= n_bins:
+        return x, Z
+
+    k = -(-N // n_bins)
+    n_bins = -(-N // k)
+    pad = n_bins * k - N
+    Zb = np.concatenate([Z, np.repeat(Z[-1:], pad, axis=0)]).reshape(n_bins, k, *Z.shape[1:])
+    xb = np.concatenate([x, np.repeat(x[-1:], pad)]).reshape(n_bins, k)
+
+    return xb.mean(axis=1), Zb.max(axis=1)
+
+
+def image(ax, x, y, Z, n_bins=None, **kwargs):
+    '''
+    ax.pcolormesh(x, y, Z.T, **kwargs) for Z (len(x), len(y)), with the x
+    columns reduced to the axes width (max per pixel, so bursts survive)
+    '''
+
+    if enabled:
+        if n_bins is None:
+            n_bins = axisPixels(ax)
+        x, Z = maxColumns(x, Z, n_bins)
+
+    kwargs.setdefault("shading", "auto")
+    return ax.pcolormesh(x, y, np.asarray(Z).T, **kwargs)
@@ -0,0 +1,185 @@
+import os
+
+'''
+Figure reuse for batch rendering.
+
+Plotting methods ask figure(key, build) for their layout. By default
+(mode "keep") build() makes a new figure every call, as interactive use
+expects. In mode "reuse" the first figure per key is kept: later shots get
+the same figure and axes back, line() swaps new data into the existing
+Line2D artists, legend() relabels the existing legend, and the layout
+computed for the first shot is frozen, so layout is not recomputed on
+every save. Mode "close" builds new figures but closes them after save(),
+so nothing piles up in pyplot.
+
+Select with MUSE_FIGURES=keep|reuse|close or figures.mode; release()
+closes the kept templates.
+
+With defer set, save() only draws the figure and queues its pixels;
+queued() hands them over and write() encodes and writes one PNG, so file
+output can run on other threads than drawing (see comboPlot.pipeline).
+'''
+
+mode = os.getenv("MUSE_FIGURES", "keep")
+defer = False
+
+_templates = {} # key -> (fig, axs)
+_queue = [] # (fname, rgba, dpi) drawn by save() while deferred
+
+
+def figure(key, build):
+    '''
+    (fig, axs, fresh) from build() -> (fig, axs), or the kept template for
+    key in reuse mode; fresh is True when the layout was just built
+    '''
+    if mode == "reuse":
+        import matplotlib.pyplot as plt
+
+        kept = _templates.get(key)
+        if kept is not None and plt.fignum_exists(kept[0].number):
+            return kept[0], kept[1], False
+
+    fig, axs = build()
+    if mode == "reuse":
+        _templates[key] = (fig, axs)
+    return fig, axs, True
+
+
+def _artists(ax):
+    if not hasattr(ax, "_muse_artists"):
+        ax._muse_artists = {}
+    return ax._muse_artists
+
+
+def artist(ax, key):
+    '''
+    the artist kept on ax under key, None on a fresh axes
+    '''
+    return _artists(ax).get(key)
+
+
+def keep(ax, key, obj):
+    '''
+    keep obj on ax under key for the next shot, returns obj
+    '''
+    _artists(ax)[key] = obj
+    return obj
+
+
+def line(ax, key, x, y, *args, decimated=True, label=None, **kwargs):
+    '''
+    decimate.plot(ax, x, y, *args, **kwargs) the first time, afterwards the
+    same line with its data (and label) replaced and the axes rescaled
+    '''
+    from . import decimate
+
+    if label is not None:
+        kwargs["label"] = label
+
+    ln = artist(ax, key)
+    if ln is None:
+        if decimated:
+            ln, = decimate.plot(ax, x, y, *args, **kwargs)
+        elif x is None:
+            ln, = ax.plot(y, *args, **kwargs)
+        else:
+            ln, = ax.plot(x, y, *args, **kwargs)
+        return keep(ax, key, ln)
+
+    if decimated and decimate.enabled:
+        x, y = decimate.minmax(x, y, decimate.axisPixels(ax))
+    elif x is None:
+        x = range(len(y))
+    ln.set_data(x, y)
+    if label is not None:
+        ln.set_label(label)
+
+    ax.relim()
+    ax.autoscale_view()
+    return ln
+
+
+def blank(ax, key):
+    '''
+    empty the line kept under key, if there is one
+    '''
+    ln = artist(ax, key)
+    if ln is not None:
+        ln.set_data([], [])
+
+
+def legend(ax, **kwargs):
+    '''
+    ax.legend(**kwargs) the first time, afterwards the same legend with its
+    texts set from the current labels; rebuilt if the labelled artists change
+    '''
+    handles, labels = ax.get_legend_handles_labels()
+    kept = artist(ax, "_legend")
+    if kept is not None and kept[1] == handles:
+        leg = kept[0]
+        for text, label in zip(leg.get_texts(), labels):
+            text.set_text(label)
+        return leg
+
+    leg = ax.legend(handles, labels, **kwargs)
+    keep(ax, "_legend", (leg, handles))
+    return leg
+
+
+def save(fig, fname, fresh=True):
+    '''
+    fig.savefig(fname); in reuse mode the first layout is then frozen, in
+    close mode the figure is closed
+    '''
+    if defer:
+        import numpy as np
+
+        fig.canvas.draw()
+        _queue.append((fname, np.array(fig.canvas.buffer_rgba()), fig.dpi))
+    else:
+        fig.savefig(fname)
+
+    if mode == "reuse" and fresh:
+        fig.set_layout_engine("none")
+    elif mode == "close":
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+
+
+def queued():
+    '''
+    the (fname, rgba, dpi) drawn since the last call, for write()
+    '''
+    out = _queue[:]
+    _queue.clear()
+    return out
+
+
+def write(fname, rgba, dpi):
+    '''
+    PNG of a deferred save(), the same pixels savefig would have written
+    '''
+    from matplotlib.image import imsave
+
+    imsave(fname, rgba, dpi=dpi)
+
+
+def finish():
+    '''
+    end of one shot: in close mode every pyplot figure is closed, including
+    those that were drawn but not saved
+    '''
+    if mode == "close":
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+
+def release():
+    '''
+    close every kept template
+    '''
+    import matplotlib.pyplot as plt
+
+    for fig, axs in _templates.values():
+        plt.close(fig)
+    _templates.clear()
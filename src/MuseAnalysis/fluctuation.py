@@ -0,0 +1,157 @@
+import numpy as np
+
+'''
+Streaming short-time Fourier spectra of probe fluctuation channels.
+
+A channel is cut into overlapping, Hann windowed segments. Segments are
+transformed a chunk at a time, so memory is bounded by the chunk size
+and not by the record length. Power spectral density uses the one-sided
+density scaling of scipy.signal.welch (V^2/Hz). Spectrogram columns
+average `average` consecutive segments (Welch) and are stamped with the
+unix_time of their centre sample.
+
+usage: python -m MuseAnalysis.fluctuation data/231223001/ [--nperseg 256]
+'''
+
+
+def hann(n):
+    '''
+    periodic Hann window, as scipy.signal.get_window("hann", n)
+    '''
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)
+
+
+def iterSegments(x, nperseg=256, noverlap=None, chunk=512):
+    '''
+    yield (first segment index, PSD of up to chunk segments) over x, which
+    only needs to support slicing (array, memmap)
+    '''
+    if noverlap is None:
+        noverlap = nperseg // 2
+    step = nperseg - noverlap
+    n_seg = (len(x) - noverlap) // step if len(x) >= nperseg else 0
+
+    w = hann(nperseg)
+    for k0 in range(0, n_seg, chunk):
+        k1 = min(k0 + chunk, n_seg)
+        xc = np.asarray(x[k0 * step:(k1 - 1) * step + nperseg], dtype=float)
+        seg = np.lib.stride_tricks.sliding_window_view(xc, nperseg)[::step]
+
+        # constant detrend per segment, as welch's default
+        seg = (seg - seg.mean(axis=1, keepdims=True)) * w
+        yield k0, np.abs(np.fft.rfft(seg, axis=1))**2
+
+
+def _scale(P, fs, w, nperseg):
+    '''
+    one-sided power spectral density from |rfft|^2
+    '''
+    P = P / (fs * (w**2).sum())
+    if nperseg % 2:
+        P[..., 1:] *= 2
+    else:
+        P[..., 1:-1] *= 2
+    return P
+
+
+def welch(x, fs, nperseg=256, noverlap=None, chunk=512):
+    '''
+    (freqs, PSD) averaged over every segment, streamed in chunks
+    '''
+    total = 0.0
+    count = 0
+    for k0, P in iterSegments(x, nperseg, noverlap, chunk):
+        total = total + P.sum(axis=0)
+        count += len(P)
+    if count == 0:
+        raise ValueError(f"record shorter than one segment ({nperseg} samples)")
+
+    freqs = np.fft.rfftfreq(nperseg, 1 / fs)
+    return freqs, _scale(total / count, fs, hann(nperseg), nperseg)
+
+
+def spectrogram(x, fs, timebase=None,
+                nperseg=256,
+                noverlap=None,
+                average=1, # segments per column (Welch averaging)
+                chunk=512, # segments transformed at once
+                ):
+    '''
+    (times, freqs, S) with S[i] the PSD of column i; times are the
+    timebase value (unix_time, s from 1904) at the column centre, or
+    seconds from the first sample without a timebase
+    '''
+    if noverlap is None:
+        noverlap = nperseg // 2
+    step = nperseg - noverlap
+    average = max(int(average), 1)
+
+    # chunks of whole columns, so no column straddles two chunks
+    chunk = max(chunk // average, 1) * average
+
+    cols = []
+    for k0, P in iterSegments(x, nperseg, noverlap, chunk):
+        m = len(P) // average * average
+        if m:
+            cols.append(P[:m].reshape(-1, average, P.shape[1]).mean(axis=1))
+    if not cols:
+        raise ValueError(f"record shorter than {average} segments of {nperseg} samples")
+
+    S = _scale(np.concatenate(cols), fs, hann(nperseg), nperseg)
+    freqs = np.fft.rfftfreq(nperseg, 1 / fs)
+
+    # centre sample of each column
+    centre = np.arange(len(S)) * average * step + ((average - 1) * step + nperseg) // 2
+    if timebase is None:
+        times = centre / fs
+    else:
+        times = timebase.at(centre)
+
+    return times, freqs, S
+
+
+def plotSpectrogram(ax, times, freqs, S, db=True, dynamic_range=80, **kwargs):
+    '''
+    draw S with time columns reduced to the axes width by decimate.image;
+    in dB the colour scale spans dynamic_range below the peak
+    '''
+    from . import decimate
+
+    Z = S
+    if db:
+        floor = S.max() * 10**(-dynamic_range / 10) or np.finfo(float).tiny
+        Z = 10 * np.log10(np.maximum(S, floor))
+    return decimate.image(ax, times, freqs, Z, **kwargs)
+
+
+def main():
+    '''
+    Fluctuation spectrograms and Welch PSD of the floating probe and shunt
+    '''
+    import argparse
+    import os
+
+    from .DoubleProbe import DoubleProbe
+    from .archive import isArchive
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("shot", help="shot directory or .muse archive")
+    parser.add_argument("--nperseg", type=int, default=256)
+    parser.add_argument("--average", type=int, default=4, help="segments per spectrogram column")
+    parser.add_argument("-s", "--save", help="png to write, default shot/plotFluct.png")
+    args = parser.parse_args()
+
+    if isArchive(args.shot):
+        probe = DoubleProbe(args.shot)
+        save = args.save or os.path.splitext(args.shot)[0] + "_plotFluct.png"
+    else:
+        path = os.path.join(args.shot, "")
+        probe = DoubleProbe(path + "NIDAQtext.txt")
+        save = args.save or path + "plotFluct.png"
+
+    probe.plotFluctuations(nperseg=args.nperseg, average=args.average, save=save)
+    print(save)
+
+
+if __name__ == "__main__":
+    main()
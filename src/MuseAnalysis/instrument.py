@@ -0,0 +1,221 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+'''
+Opt-in stage instrumentation for the analysis pipeline.
+
+Set MUSE_INSTRUMENT to a file path (or "-" for stderr), or call enable(),
+and every instrumented stage appends one JSON line:
+
+    {"stage": "DoubleProbe.fit", "wall_s": .., "cpu_s": .., "peak_mb": .., ...}
+
+When disabled, stage() costs one attribute lookup.
+
+Stages nest per thread. Peak memory comes from tracemalloc, which traces
+the whole process, so a stage's peak_mb also counts what other threads
+allocated while it ran. enable() exports MUSE_INSTRUMENT, so worker
+processes started after it append to the same log.
+
+Summarize one or many logs (e.g. from a batch run):
+usage: python -m MuseAnalysis.instrument run1.jsonl [run2.jsonl ...]
+'''
+
+
+class _State(threading.local):
+    stack = None # absolute traced peak seen so far by each open stage of this thread
+
+
+class _Shared:
+    out = None # open file, None when disabled
+    memory = True # trace peak allocations
+    context = {} # extra keys added to every record (e.g. shot)
+    stacks = [] # stack of every thread that has an open stage
+    lock = threading.Lock()
+
+
+_state = _Shared()
+_local = _State()
+
+
+def _stack():
+    if _local.stack is None:
+        _local.stack = []
+    return _local.stack
+
+
+def _resetPeak():
+    # every open stage, of any thread, keeps the peak seen before the reset
+    with _state.lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        for stack in _state.stacks:
+            for k in range(len(stack)):
+                stack[k] = max(stack[k], peak)
+        tracemalloc.reset_peak()
+
+
+def enable(fout="-", memory=True, **context):
+    '''
+    start emitting records to fout ("-" is stderr); context keys
+    (e.g. shot=231223001) are added to every record
+    '''
+
+    disable()
+    _state.out = sys.stderr if fout == "-" else open(fout, "a")
+    _state.memory = memory
+    _state.context = dict(context)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    # inherited by worker processes started from now on
+    os.environ["MUSE_INSTRUMENT"] = fout if fout == "-" else os.path.abspath(fout)
+    os.environ["MUSE_INSTRUMENT_MEMORY"] = "1" if memory else "0"
+
+
+def disable():
+    if _state.out is not None and _state.out is not sys.stderr:
+        _state.out.close()
+    _state.out = None
+    _state.context = {}
+    os.environ.pop("MUSE_INSTRUMENT", None)
+    os.environ.pop("MUSE_INSTRUMENT_MEMORY", None)
+
+
+def enabled():
+    return _state.out is not None
+
+
+def setContext(**context):
+    _state.context.update(context)
+
+
+def emit(record):
+    record.update(_state.context)
+    line = json.dumps(record, default=str) + "\n"
+    with _state.lock:
+        _state.out.write(line)
+        _state.out.flush()
+
+
+@contextmanager
+def stage(name, **info):
+    '''
+    time a block; yields a dict the caller may add sizes to, e.g. rec["n"] = len(x)
+    '''
+
+    if _state.out is None:
+        yield {}
+        return
+
+    rec = {"stage": name}
+    rec.update(info)
+
+    memory = _state.memory and tracemalloc.is_tracing()
+    if memory:
+        stack = _stack()
+        # open stages remember their peak before resetting for this one
+        _resetPeak()
+        with _state.lock:
+            if not stack:
+                _state.stacks.append(stack)
+            stack.append(0)
+        start = tracemalloc.get_traced_memory()[0]
+
+    t_wall = time.perf_counter()
+    t_cpu = time.process_time()
+    try:
+        yield rec
+    finally:
+        rec["wall_s"] = time.perf_counter() - t_wall
+        rec["cpu_s"] = time.process_time() - t_cpu
+        if memory:
+            with _state.lock:
+                peak = max(stack.pop(), tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1] = max(stack[-1], peak)
+                else:
+                    _state.stacks[:] = [s for s in _state.stacks if s is not stack]
+            # allocated by this stage above what was live when it started
+            rec["peak_mb"] = (peak - start) / 1e6
+        rec["pid"] = os.getpid()
+        rec["t"] = time.time()
+        emit(rec)
+
+
+def timed(name):
+    '''
+    decorator form of stage() for whole methods; adds self.fname when present
+    '''
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _state.out is None:
+                return fn(*args, **kwargs)
+            fname = getattr(args[0], "fname", None) if args else None
+            with stage(name, file=fname):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# enable from the environment, so any script or entry point can opt in
+if os.getenv("MUSE_INSTRUMENT"):
+    enable(os.getenv("MUSE_INSTRUMENT"), memory=os.getenv("MUSE_INSTRUMENT_MEMORY", "1") != "0")
+
+
+def aggregate(fins):
+    '''
+    per-stage count, total / mean / max wall and cpu time and max peak memory
+    over one or more JSON-lines logs
+    '''
+
+    summary = {}
+    for fin in fins:
+        with open(fin) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                s = summary.setdefault(rec["stage"], dict(count=0, wall_s=0.0, cpu_s=0.0,
+                                                          wall_max=0.0, peak_mb=0.0))
+                s["count"] += 1
+                s["wall_s"] += rec.get("wall_s", 0.0)
+                s["cpu_s"] += rec.get("cpu_s", 0.0)
+                s["wall_max"] = max(s["wall_max"], rec.get("wall_s", 0.0))
+                s["peak_mb"] = max(s["peak_mb"], rec.get("peak_mb", 0.0))
+
+    for s in summary.values():
+        s["wall_mean"] = s["wall_s"] / s["count"]
+
+    return summary
+
+
+def main():
+    '''
+    Summarize instrumentation logs, slowest stages first
+    '''
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("logs", nargs="+")
+    args = parser.parse_args()
+
+    summary = aggregate(args.logs)
+    print(f"{'stage':32s} {'count':>6s} {'total s':>9s} {'mean s':>9s} {'max s':>9s} {'cpu s':>9s} {'peak MB':>9s}")
+    for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["wall_s"]):
+        print(f"{name:32s} {s['count']:6d} {s['wall_s']:9.3f} {s['wall_mean']:9.3f} "
+              f"{s['wall_max']:9.3f} {s['cpu_s']:9.3f} {s['peak_mb']:9.1f}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import numpy as np
+
+'''
+Batched least-squares fit of the double probe characteristic
+I = Isat tanh(V / 2Te) + I_offset.
+
+Many I-V curves (probes of one shot, bootstrap resamples) are fitted at
+once by Levenberg-Marquardt, each step one stacked 3x3 solve, so the cost
+per curve is a few array passes instead of a curve_fit call.
+'''
+
+
+def fitBatch(V, Y, p0, n_iter=50, tol=1e-10):
+    '''
+    least-squares fit of IV_tanh to every row of Y (B, N) at once; V is
+    (N,) shared by all rows or (B, N), p0 = (Te, Isat, I_offset) is (3,)
+    or one start per row (B, 3); returns (B, 3)
+    '''
+
+    B = len(Y)
+    P = np.array(np.broadcast_to(np.asarray(p0, float), (B, 3)))
+    lam = np.full(B, 1e-3)
+    eye = np.eye(3)
+
+    def jac(P):
+        Te, Isat = P[:, :1], P[:, 1:2]
+        th = np.tanh(V / 2. / Te)
+        r = Y - (Isat * th + P[:, 2:])
+        dTe = Isat * (1 - th**2) * (-V / 2. / Te**2)
+        return r, (dTe, th)
+
+    r, (a, b) = jac(P)
+    cost = np.einsum("ij,ij->i", r, r)
+
+    for _ in range(n_iter):
+        JTJ, JTr = _normal(a, b, r)
+
+        diag = JTJ[:, [0, 1, 2], [0, 1, 2]]
+        A = JTJ + lam[:, None, None] * diag[:, :, None] * eye
+        step = np.linalg.solve(A, JTr[..., None])[..., 0]
+
+        trial = P + step
+        trial[:, 0] = np.maximum(trial[:, 0], 1e-3) # Te stays positive
+        r_t, (a_t, b_t) = jac(trial)
+        cost_t = np.einsum("ij,ij->i", r_t, r_t)
+
+        # accept per row, Levenberg-Marquardt damping update
+        ok = cost_t < cost
+        P[ok], r[ok], a[ok], b[ok] = trial[ok], r_t[ok], a_t[ok], b_t[ok]
+        lam = np.where(ok, lam / 3, lam * 4)
+        done = np.abs(cost - cost_t) <= tol * np.maximum(cost, 1e-300)
+        cost = np.where(ok, cost_t, cost)
+
+        if done.all():
+            break
+
+    return P
+
+
+def _normal(a, b, r):
+    '''
+    J^T J (B, 3, 3) and J^T r (B, 3) from row sums, the third column of J
+    is all ones
+    '''
+    B, N = r.shape
+    JTJ = np.empty((B, 3, 3))
+    JTJ[:, 0, 0] = np.einsum("ij,ij->i", a, a)
+    JTJ[:, 1, 1] = np.einsum("ij,ij->i", b, b)
+    JTJ[:, 2, 2] = N
+    JTJ[:, 0, 1] = JTJ[:, 1, 0] = np.einsum("ij,ij->i", a, b)
+    JTJ[:, 0, 2] = JTJ[:, 2, 0] = a.sum(1)
+    JTJ[:, 1, 2] = JTJ[:, 2, 1] = b.sum(1)
+    JTr = np.stack([np.einsum("ij,ij->i", a, r), np.einsum("ij,ij->i", b, r), r.sum(1)], axis=1)
+    return JTJ, JTr
+
+
+def initialGuess(V, Y):
+    '''
+    (B, 3) starting (Te, Isat, I_offset) per row: offset from the mean,
+    Isat from the spread of I, Te from the slope Isat / 2Te near V = 0
+    '''
+    V = np.broadcast_to(V, Y.shape)
+
+    I_offset = Y.mean(1)
+    Isat = (np.percentile(Y, 98, axis=1) - np.percentile(Y, 2, axis=1)) / 2
+
+    # least-squares slope over the central quarter of the sweep
+    w = np.abs(V) <= 0.25 * np.abs(V).max(1, keepdims=True)
+    n = np.maximum(w.sum(1), 1)
+    Vm = (w * V).sum(1) / n
+    Ym = (w * Y).sum(1) / n
+    dV = w * (V - Vm[:, None])
+    slope = (dV * (Y - Ym[:, None])).sum(1) / np.maximum((dV**2).sum(1), 1e-300)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Te = np.abs(Isat / 2 / slope)
+    Te = np.clip(np.nan_to_num(Te, nan=1.0, posinf=100.0), 0.1, 100.0)
+    return np.stack([Te, Isat, I_offset], axis=1)
+
+
+def fitIV(V, Y, p0=None, n_iter=100):
+    '''
+    fit every row of Y (B, N) against V ((N,) or (B, N)); returns the
+    parameters (B, 3) and their standard errors (B, 3), scaled by the
+    residual variance as curve_fit does
+    '''
+    Y = np.atleast_2d(np.asarray(Y, float))
+    V = np.asarray(V, float)
+    if p0 is None:
+        p0 = initialGuess(V, Y)
+
+    P = fitBatch(V, Y, p0, n_iter=n_iter)
+
+    Te, Isat = P[:, :1], P[:, 1:2]
+    th = np.tanh(V / 2. / Te)
+    r = Y - (Isat * th + P[:, 2:])
+    a = Isat * (1 - th**2) * (-V / 2. / Te**2)
+    JTJ, _ = _normal(np.broadcast_to(a, Y.shape), np.broadcast_to(th, Y.shape), r)
+
+    dof = max(Y.shape[1] - 3, 1)
+    s2 = np.einsum("ij,ij->i", r, r) / dof
+    cov = np.linalg.pinv(JTJ) * s2[:, None, None]
+    err = np.sqrt(np.abs(cov[:, [0, 1, 2], [0, 1, 2]]))
+    return P, err
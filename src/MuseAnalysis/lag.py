@@ -0,0 +1,230 @@
+import numpy as np
+import os
+
+from itertools import combinations
+
+'''
+Delays between diagnostics from FFT cross-correlation.
+
+Each signal (RF forward power, Balmer line intensities, probe current
+envelope) is put on a common uniform grid over the time the diagnostics
+overlap. Every signal is transformed once; each pair's normalized
+cross-correlation is one product and inverse FFT, O(N log N) instead of
+O(N^2). The lag is the correlation peak, refined to sub-sample by a
+parabola through its neighbours. A positive lag means the second signal
+follows the first.
+
+usage: python -m MuseAnalysis.lag data/231223001/ data/231223002.muse ... [-o lags.csv]
+'''
+
+# seconds between Jan 1 1904 and Jan 1 1970, both GMT midnight
+t_gap = 2082844800.0
+
+# column order of the output table
+FIELDS = ["shot", "a", "b", "lag_s", "r", "n", "dt"]
+
+
+def commonGrid(signals, dt):
+    '''
+    uniform grid (s from 1904) over the range every signal covers, and the
+    signals interpolated onto it as rows of an array
+    '''
+    t0 = max(t[0] for t, y in signals.values())
+    t1 = min(t[-1] for t, y in signals.values())
+    if t1 <= t0:
+        raise ValueError("signals do not overlap in time")
+
+    grid = np.arange(t0, t1, dt)
+    Y = np.vstack([np.interp(grid, t, np.asarray(y, float)) for t, y in signals.values()])
+    return grid, Y
+
+
+def xcorr(Y):
+    '''
+    normalized cross-correlation of every pair of rows of Y (k, N):
+    dict (i, j) -> r at lags -(N-1) .. N-1 samples, r(lag) =
+    sum_n y_i[n] y_j[n + lag] / (N std_i std_j)
+    '''
+    k, N = Y.shape
+    Z = Y - Y.mean(axis=1, keepdims=True)
+    norm = np.sqrt(N) * Z.std(axis=1)
+
+    # zero pad to a fast length >= 2N-1, so the circular product is linear
+    L = 1 << int(2 * N - 1).bit_length()
+    F = np.fft.rfft(Z, L, axis=1)
+
+    out = {}
+    for i, j in combinations(range(k), 2):
+        c = np.fft.irfft(np.conj(F[i]) * F[j], L)
+        c = np.concatenate([c[L - N + 1:], c[:N]])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[i, j] = c / (norm[i] * norm[j])
+    return out
+
+
+def peakLag(r, dt, max_lag=None):
+    '''
+    (lag in s, peak r) of a correlation from xcorr, within +-max_lag s
+    '''
+    N = (len(r) + 1) // 2
+    lags = np.arange(-(N - 1), N)
+    valid = np.isfinite(r)
+    if max_lag is not None:
+        valid &= np.abs(lags) * dt <= max_lag
+    if not valid.any():
+        return np.nan, np.nan
+
+    i = np.flatnonzero(valid)[np.argmax(r[valid])]
+    shift = 0.0
+    if 0 < i < len(r) - 1:
+        a, b, c = r[i - 1], r[i], r[i + 1]
+        denom = a - 2 * b + c
+        if denom < 0:
+            shift = 0.5 * (a - c) / denom
+    return float((lags[i] + shift) * dt), float(r[i])
+
+
+def lagTable(signals, dt=0.01, max_lag=1.0, shot=""):
+    '''
+    one row per pair of signals; signals is {name: (t s from 1904, y)}
+    '''
+    names = list(signals)
+    grid, Y = commonGrid(signals, dt)
+    rows = []
+    for (i, j), r in xcorr(Y).items():
+        lag, peak = peakLag(r, dt, max_lag)
+        rows.append(dict(shot=shot, a=names[i], b=names[j], lag_s=lag, r=peak,
+                         n=len(grid), dt=dt))
+    return rows
+
+
+def shotSignals(path,
+                lines=(656.279, 486.135, 434.0462), # nm, H-alpha .. H-gamma
+                sweep=0.1, # s, probe bias sweep period
+                ):
+    '''
+    {name: (t s from 1904, y)} for the diagnostics found in a shot
+    directory or .muse archive
+    '''
+    from glob import glob
+
+    from .DoubleProbe import DoubleProbe
+    from .OceanSpectra import OceanSpectra
+    from .RF import RFpower
+    from .archive import isArchive
+    from .window import smooth
+
+    if isArchive(path):
+        probe_file = path
+        rf_files = [f"{path}:RFLog1", f"{path}:RFLog2"]
+        spec_files = [path]
+    else:
+        path = os.path.join(path, "")
+        shot = os.path.basename(os.path.dirname(path))
+        probe_file = path + "NIDAQtext.txt"
+        rf_files = [path + "RFLog1.txt", path + "RFLog2.txt"]
+        spec_files = glob(os.path.join(os.path.dirname(os.path.dirname(path)),
+                                       "spectroscopy", f"*{shot}*txt"))[:1]
+
+    signals = {}
+
+    # RF forward power, summed over both generators on the first one's clock
+    rfs = []
+    for fin in rf_files:
+        try:
+            rfs.append(RFpower(fin))
+        except (OSError, KeyError, ValueError):
+            continue
+    if rfs:
+        t = rfs[0].t_fwd_abs
+        signals["rf_fwd"] = (t, sum(np.interp(t, r.t_fwd_abs, r.P_fwd) for r in rfs))
+
+    # Balmer line intensities
+    for fin in spec_files:
+        try:
+            spec = OceanSpectra(fin)
+        except (OSError, KeyError, ValueError):
+            continue
+        t = spec.unix_time / 1e3 + t_gap
+        for f0 in lines:
+            spec.findPeak(f0)
+            signals[f"{f0:g}nm"] = (t, np.ma.filled(spec.lines[-1].astype(float), np.nan))
+
+    # probe current swing over one sweep, Isat (so ne at fixed Te)
+    try:
+        probe = DoubleProbe(probe_file)
+    except (OSError, KeyError, ValueError):
+        probe = None
+    if probe is not None:
+        n = max(int(round(sweep / probe.timebase.dt)), 1)
+        _, I = probe.probeVI()
+        signals["probe_I"] = (probe.unix_time, np.sqrt(smooth((I - np.median(I))**2, n)))
+
+    # masked (saturated) samples are bridged by interpolation
+    for name, (t, y) in signals.items():
+        bad = ~np.isfinite(y)
+        if bad.any() and not bad.all():
+            y = y.copy()
+            y[bad] = np.interp(t[bad], t[~bad], y[~bad])
+            signals[name] = (t, y)
+
+    return signals
+
+
+def shotLags(path, dt=0.01, max_lag=1.0, **kwargs):
+    '''
+    lag table rows for one shot
+    '''
+    signals = shotSignals(path, **kwargs)
+    if len(signals) < 2:
+        return []
+    return lagTable(signals, dt, max_lag, shot=str(path).rstrip("/"))
+
+
+def writeTable(rows, fout):
+    '''
+    csv with FIELDS as columns, fout is a path or an open file
+    '''
+    import csv
+
+    f = open(fout, "w", newline="") if isinstance(fout, str) else fout
+    try:
+        w = csv.DictWriter(f, FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+    finally:
+        if f is not fout:
+            f.close()
+
+
+def main():
+    '''
+    Lags between RF power, Balmer lines and probe current for each shot
+    '''
+    import argparse
+    import sys
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("shots", nargs="+", help="shot directories or .muse archives")
+    parser.add_argument("-o", "--output", help="csv table, default stdout")
+    parser.add_argument("--dt", type=float, default=0.01, help="s, common grid step")
+    parser.add_argument("--max-lag", type=float, default=1.0, help="s, largest lag searched")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="shots in parallel")
+    args = parser.parse_args()
+
+    kwargs = dict(dt=args.dt, max_lag=args.max_lag)
+    if args.workers > 1:
+        with ProcessPoolExecutor(args.workers) as pool:
+            futures = [pool.submit(shotLags, shot, **kwargs) for shot in args.shots]
+            results = [f.result() for f in futures]
+    else:
+        results = [shotLags(shot, **kwargs) for shot in args.shots]
+
+    rows = [row for res in results for row in res]
+    writeTable(rows, args.output or sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
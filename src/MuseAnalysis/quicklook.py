@@ -0,0 +1,185 @@
+import numpy as np
+import os
+
+'''
+Quick-look summary of shots, without plotting.
+
+Only what the headline numbers need is loaded: the time, pressure and
+probe columns of the NIDAQ table, the RF logs and the spectrometer pixels
+around the Balmer lines. The probes are fitted headless in one batched
+solve (DoubleProbe.fitProbes) on the detected plasma window, and each shot
+is printed as one JSON line:
+
+    Te, Isat, ne (first probe; every probe under "probes" when there are more),
+    pressure_peak, rf_fwd_mean, rf_rev_mean, rf_reflected_fraction,
+    balmer: {line: peak counts over dark, time and wavelength of the peak}
+
+usage: python -m MuseAnalysis.quicklook data/231223001/ data/2312230*/ shots/*.muse
+'''
+
+LINES = (656.279, 486.135, 434.0462) # nm, H-alpha .. H-gamma
+
+
+def shotFiles(path):
+    '''
+    (probe file, RF logs, spectra files) of a shot directory or .muse archive
+    '''
+    from glob import glob
+    from .archive import isArchive
+
+    if isArchive(path):
+        return path, [f"{path}:RFLog1", f"{path}:RFLog2"], [path]
+
+    path = os.path.join(path, "")
+    shot = os.path.basename(os.path.dirname(path))
+    spec_files = glob(os.path.join(os.path.dirname(os.path.dirname(path)),
+                                   "spectroscopy", f"*{shot}*txt"))[:1]
+    return path + "NIDAQtext.txt", [path + "RFLog1.txt", path + "RFLog2.txt"], spec_files
+
+
+def rfSummary(rfs):
+    '''
+    mean forward and reflected power of both generators while RF is on
+    '''
+    rf = rfs[0]
+    if len(rfs) > 1:
+        t, fwd, rev = rf.addPower(rfs[1], N=len(rf.T_fwd))
+    else:
+        fwd, rev = rf.P_fwd, rf.P_rev
+
+    on = fwd > 0.1 * fwd.max()
+    if not on.any():
+        return dict(rf_fwd_mean=0.0, rf_rev_mean=0.0, rf_reflected_fraction=None)
+    return dict(rf_fwd_mean=float(fwd[on].mean()),
+                rf_rev_mean=float(rev[on].mean()),
+                rf_reflected_fraction=float(rev[on].sum() / fwd[on].sum()))
+
+
+def probeSummary(probe, rfs=None, sg_window=50):
+    '''
+    peak pressure and the tanh fit of every probe on the plasma window
+    '''
+    from .DoubleProbe import pressure
+    from .window import smooth
+
+    out = {}
+    if "pressure" in probe.channels.channels:
+        P_raw, P_H2 = pressure(probe.signal("pressure"))
+        out["pressure_peak"] = float(smooth(P_H2, sg_window).max())
+
+    window = probe.plasmaWindow(rf=rfs or None)
+    out["window"] = window
+
+    fits = {name: {key: float(val) for key, val in fit.items()}
+            for name, fit in probe.fitProbes().items()}
+    first = next(iter(fits.values()))
+    for key in ["Te", "dTe", "Isat", "dIsat", "ne", "dne"]:
+        out[key] = first[key]
+    if len(fits) > 1:
+        out["probes"] = fits
+    return out
+
+
+def balmerSummary(spec, lines=LINES, width=1.0):
+    '''
+    {line: peak, time (s from the first spectrum) and wavelength} of each
+    line from spectra loaded in windows of +-width nm around the lines
+    '''
+    try:
+        spec.subtractDark()
+    except ValueError:
+        pass # no dark frame before the plasma, raw counts
+
+    out = {}
+    for f0 in lines:
+        cols = np.flatnonzero(np.abs(spec.spectral_axis - f0) <= width)
+        if len(cols) == 0:
+            cols = [np.argmin(np.abs(spec.spectral_axis - f0))]
+        block = spec.data[:, cols]
+        j, k = np.unravel_index(np.argmax(block), block.shape)
+        out[f"{f0:g}nm"] = dict(peak=float(block[j, k]),
+                                t=float(spec.time_axis[j] / 1e3),
+                                wavelength=float(spec.spectral_axis[cols[k]]))
+    return out
+
+
+def summary(path, lines=LINES, width=1.0, sg_window=50):
+    '''
+    headline numbers of one shot directory or .muse archive; diagnostics
+    that are missing are left out
+    '''
+    from .DoubleProbe import DoubleProbe
+    from .OceanSpectra import OceanSpectra
+    from .RF import RFpower
+
+    probe_file, rf_files, spec_files = shotFiles(path)
+    out = dict(shot=str(path).rstrip("/"))
+
+    rfs = []
+    for fin in rf_files:
+        try:
+            rfs.append(RFpower(fin))
+        except (OSError, KeyError, ValueError):
+            continue
+    if rfs:
+        out.update(rfSummary(rfs))
+
+    try:
+        # gains of the shot's date come with its channel map, as in comboPlot
+        probe = DoubleProbe(probe_file, only=["pressure", "probes"])
+    except (OSError, KeyError, ValueError):
+        probe = None
+    if probe is not None:
+        out.update(probeSummary(probe, rfs, sg_window))
+
+    windows = [(f0 - width, f0 + width) for f0 in lines]
+    for fin in spec_files:
+        try:
+            spec = OceanSpectra(fin, windows=windows)
+        except (OSError, KeyError, ValueError):
+            continue
+        out["balmer"] = balmerSummary(spec, lines, width)
+
+    return out
+
+
+def safeSummary(path, **kwargs):
+    '''
+    summary, or the error, so one bad shot does not stop a batch
+    '''
+    try:
+        return summary(path, **kwargs)
+    except Exception as err:
+        return dict(shot=str(path).rstrip("/"), error=repr(err))
+
+
+def main():
+    '''
+    Headline numbers of each shot (probe fit, pressure, RF, Balmer lines)
+    as one JSON line per shot, without plotting
+    '''
+    import argparse
+    import json
+    from functools import partial
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("shots", nargs="+", help="shot directories or .muse archives")
+    parser.add_argument("--lines", type=float, nargs="+", default=list(LINES), help="nm")
+    parser.add_argument("--width", type=float, default=1.0, help="nm either side of each line")
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    run = partial(safeSummary, lines=args.lines, width=args.width)
+    if args.workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(args.workers) as pool:
+            results = list(pool.map(run, args.shots))
+    else:
+        results = map(run, args.shots)
+
+    for out in results:
+        print(json.dumps(out), flush=True)
+
+
+if __name__ == "__main__":
+    main()
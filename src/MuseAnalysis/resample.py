@@ -0,0 +1,98 @@
+import hashlib
+
+import numpy as np
+
+'''
+Resampling of spectra onto a common wavelength grid.
+
+The interpolation (or rebinning) from a source spectral_axis to a target
+grid is a sparse (N_source, N_target) matrix, built once per pair of axes
+and cached by their hashes. Every spectrum of a file, or of many files
+sharing an axis, is then mapped with a single sparse product data @ M.
+Target points outside the source axis are 0.
+'''
+
+_cache = {}
+
+
+def axisKey(axis):
+    axis = np.ascontiguousarray(axis, dtype=float)
+    return hashlib.sha1(axis.tobytes()).hexdigest()
+
+
+def edges(axis):
+    '''
+    bin edges half way between pixel centres, extrapolated at the ends
+    '''
+    mid = 0.5 * (axis[1:] + axis[:-1])
+    return np.concatenate([[2 * axis[0] - mid[0]], mid, [2 * axis[-1] - mid[-1]]])
+
+
+def _linear(src, tgt):
+    n, m = len(src), len(tgt)
+    inside = np.flatnonzero((tgt >= src[0]) & (tgt <= src[-1]))
+    t = tgt[inside]
+
+    j1 = np.clip(np.searchsorted(src, t), 1, n - 1)
+    j0 = j1 - 1
+    w = (t - src[j0]) / (src[j1] - src[j0])
+
+    rows = np.concatenate([j0, j1])
+    cols = np.concatenate([inside, inside])
+    vals = np.concatenate([1 - w, w])
+    return rows, cols, vals
+
+
+def _rebin(src, tgt):
+    '''
+    each target bin is the overlap-weighted mean of the source bins it covers
+    '''
+    e_src, e_tgt = edges(src), edges(tgt)
+
+    # pieces between consecutive edges of either grid each lie in one
+    # source bin and one target bin
+    cuts = np.union1d(e_src, e_tgt)
+    cuts = cuts[(cuts >= max(e_src[0], e_tgt[0])) & (cuts <= min(e_src[-1], e_tgt[-1]))]
+    mid = 0.5 * (cuts[1:] + cuts[:-1])
+    length = np.diff(cuts)
+
+    rows = np.searchsorted(e_src, mid) - 1
+    cols = np.searchsorted(e_tgt, mid) - 1
+    # by the covered length, so edge bins past the source are not scaled down
+    covered = np.bincount(cols, length, minlength=len(tgt))[cols]
+    return rows, cols, length / covered
+
+
+def resampleOperator(source_axis, target_grid, method="linear"):
+    '''
+    cached sparse matrix M with data @ M the spectra on target_grid;
+    method is "linear" (interpolate) or "rebin" (overlap-weighted mean)
+    '''
+    from scipy import sparse
+
+    key = (axisKey(source_axis), axisKey(target_grid), method)
+    if key not in _cache:
+        src = np.asarray(source_axis, float)
+        tgt = np.asarray(target_grid, float)
+
+        # spectrometer axes may be stored descending
+        order = np.argsort(src)
+        if method == "linear":
+            rows, cols, vals = _linear(src[order], tgt)
+        elif method == "rebin":
+            rows, cols, vals = _rebin(src[order], tgt)
+        else:
+            raise ValueError(f"unknown resampling method {method!r}")
+
+        M = sparse.csr_matrix((vals, (order[rows], cols)), shape=(len(src), len(tgt)))
+        _cache[key] = M
+
+    return _cache[key]
+
+
+def resample(data, source_axis, target_grid, method="linear"):
+    '''
+    data (N_spectra, N_source) -> (N_spectra, N_target)
+    '''
+    M = resampleOperator(source_axis, target_grid, method)
+    return np.asarray((M.T @ np.asarray(data, float).T).T)
@@ -0,0 +1,263 @@
+import numpy as np
+import os
+import time
+
+'''
+Reflected power events in RF logs.
+
+A sample is flagged when the reflection ratio P_rev / P_fwd exceeds a
+threshold (while forward power is on) or reflected power changes faster
+than a rate threshold. Consecutive flagged samples, and runs closer than
+gap seconds, form one event with its start, end and peak. Flagging is a
+few array operations per batch. The same EventDetector runs over a whole
+log at once or over batches from a growing (tailed) log, and an event
+spanning two batches is stitched together.
+
+usage: python -m MuseAnalysis.rfevents data/231223001/RFLog1.txt data/2312*/ shots/*.muse
+       python -m MuseAnalysis.rfevents -f data/231223005/RFLog1.txt
+'''
+
+
+class EventDetector:
+
+    def __init__(self, ratio=0.2, # P_rev / P_fwd threshold
+                       rate=100.0, # W/s threshold on |dP_rev/dt|
+                       min_fwd=10.0, # W, below this the ratio is not used
+                       gap=0.0, # s, runs closer than this are one event
+                 ):
+        self.ratio = ratio
+        self.rate = rate
+        self.min_fwd = min_fwd
+        self.gap = gap
+
+        self.open = None # event that may continue in the next batch
+        self.last = None # (t, P_rev) of the previous sample
+
+
+    def flags(self, t, fwd, rev):
+        '''
+        (flag, ratio, rate) per sample of one batch
+        '''
+        if self.last is None:
+            t_prev, r_prev = t[0], rev[0]
+        else:
+            t_prev, r_prev = self.last
+
+        dt = np.diff(t, prepend=t_prev)
+        dr = np.diff(rev, prepend=r_prev)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = np.where(dt > 0, dr / dt, 0.0)
+            ratio = np.where(fwd > self.min_fwd, rev / fwd, 0.0)
+
+        flag = ratio > self.ratio
+        if self.rate is not None:
+            flag |= np.abs(rate) > self.rate
+        return flag, ratio, rate
+
+
+    def update(self, t, fwd, rev):
+        '''
+        scan one batch; returns the events that are complete
+        '''
+        t = np.asarray(t, float)
+        fwd = np.asarray(fwd, float)
+        rev = np.asarray(rev, float)
+        if len(t) == 0:
+            return []
+
+        flag, ratio, rate = self.flags(t, fwd, rev)
+        self.last = (t[-1], rev[-1])
+
+        edges = np.diff(np.concatenate([[0], flag.astype(np.int8), [0]]))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+
+        # did the open event run up to the last sample of the previous batch
+        at_end = self.open is not None and self.open.pop("_at_end", False)
+
+        done = []
+        for i0, i1 in zip(starts, stops):
+            j = i0 + np.argmax(rev[i0:i1])
+            run = dict(start=float(t[i0]), end=float(t[i1 - 1]),
+                       peak_t=float(t[j]), peak_rev=float(rev[j]), peak_fwd=float(fwd[j]),
+                       peak_ratio=float(ratio[i0:i1].max()),
+                       max_rate=float(np.abs(rate[i0:i1]).max()),
+                       n=int(i1 - i0))
+
+            ev = self.open
+            touching = at_end and i0 == 0
+            at_end = False
+            if ev is not None and (touching or run["start"] - ev["end"] <= self.gap):
+                self.open = _join(ev, run)
+            else:
+                if ev is not None:
+                    done.append(ev)
+                self.open = run
+
+        # an event is complete once the gap after it has passed
+        if self.open is not None:
+            if len(stops) and stops[-1] == len(t):
+                self.open["_at_end"] = True
+            elif t[-1] - self.open["end"] > self.gap:
+                done.append(self.open)
+                self.open = None
+
+        return done
+
+
+    def flush(self):
+        '''
+        close and return the event still open at the end of the data
+        '''
+        ev, self.open = self.open, None
+        if ev is None:
+            return []
+        ev.pop("_at_end", None)
+        return [ev]
+
+
+def _join(a, b):
+    '''
+    one event covering a and b
+    '''
+    peak = a if a["peak_rev"] >= b["peak_rev"] else b
+    return dict(start=a["start"], end=b["end"],
+                peak_t=peak["peak_t"], peak_rev=peak["peak_rev"], peak_fwd=peak["peak_fwd"],
+                peak_ratio=max(a["peak_ratio"], b["peak_ratio"]),
+                max_rate=max(a["max_rate"], b["max_rate"]),
+                n=a["n"] + b["n"])
+
+
+def detectEvents(t, fwd, rev, **kwargs):
+    '''
+    all events of a complete series; t in s (RFpower.t_rev_abs)
+    '''
+    det = EventDetector(**kwargs)
+    return det.update(t, fwd, rev) + det.flush()
+
+
+def totalPower(rfs):
+    '''
+    (t, forward, reflected) summed over generators on the first one's
+    reflected clock
+    '''
+    t = rfs[0].t_rev_abs
+    fwd = sum(np.interp(t, rf.t_fwd_abs, rf.P_fwd) for rf in rfs)
+    rev = sum(np.interp(t, rf.t_rev_abs, rf.P_rev) for rf in rfs)
+    return t, fwd, rev
+
+
+def sourceEvents(source, **kwargs):
+    '''
+    events of one RF log (file or "shot.muse:RFLog2"), or of the summed
+    generators of a shot directory or whole archive
+    '''
+    from .RF import RFpower
+    from .archive import isArchive
+
+    if os.path.isdir(source):
+        path = os.path.join(source, "")
+        logs = [path + name for name in ["RFLog1.txt", "RFLog2.txt"] if os.path.exists(path + name)]
+    elif isArchive(source) and ":" not in os.path.basename(source):
+        logs = [f"{source}:RFLog1", f"{source}:RFLog2"]
+    else:
+        logs = [source]
+
+    rfs = []
+    for fin in logs:
+        try:
+            rfs.append(RFpower(fin))
+        except (OSError, KeyError, ValueError):
+            continue
+    if not rfs:
+        return []
+
+    events = detectEvents(*totalPower(rfs), **kwargs)
+    for ev in events:
+        ev["source"] = source
+    return events
+
+
+def tailPower(fin, interval=0.5, idle=None):
+    '''
+    yield (t, forward, reflected) batches as lines are appended to an RF
+    log; stops after idle seconds without new data (None: never)
+    '''
+    from .RF import getPair
+
+    pending = ""
+    pairs = []
+    quiet = 0.0
+    with open(fin) as f:
+        while True:
+            chunk = f.read()
+            if not chunk:
+                if idle is not None and quiet >= idle:
+                    return
+                time.sleep(interval)
+                quiet += interval
+                continue
+            quiet = 0.0
+
+            # only whole lines, and forward / reflected lines in pairs
+            lines = (pending + chunk).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                data = getPair(line)
+                if data is not False and len(data) == 2:
+                    pairs.append(data)
+
+            n = len(pairs) // 2 * 2
+            if n:
+                arr = np.array(pairs[:n]).reshape(-1, 2, 2)
+                pairs = pairs[n:]
+                yield arr[:, 1, 0], arr[:, 0, 1], arr[:, 1, 1]
+
+
+def main():
+    '''
+    Find high reflected power events in RF logs, one JSON line per event
+    '''
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("sources", nargs="+",
+                        help="RF logs, shot directories or .muse archives (generators summed)")
+    parser.add_argument("--ratio", type=float, default=0.2, help="reflected / forward threshold")
+    parser.add_argument("--rate", type=float, default=100.0, help="W/s threshold on reflected power")
+    parser.add_argument("--min-fwd", type=float, default=10.0, help="W, forward power for the ratio test")
+    parser.add_argument("--gap", type=float, default=0.0, help="s, join events closer than this")
+    parser.add_argument("-f", "--follow", action="store_true", help="tail a single growing log")
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    kwargs = dict(ratio=args.ratio, rate=args.rate, min_fwd=args.min_fwd, gap=args.gap)
+
+    if args.follow:
+        det = EventDetector(**kwargs)
+        try:
+            for batch in tailPower(args.sources[0]):
+                for ev in det.update(*batch):
+                    print(json.dumps(ev), flush=True)
+        except KeyboardInterrupt:
+            pass
+        for ev in det.flush():
+            print(json.dumps(ev))
+        return
+
+    if args.workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+        with ProcessPoolExecutor(args.workers) as pool:
+            results = pool.map(partial(sourceEvents, **kwargs), args.sources)
+    else:
+        results = (sourceEvents(source, **kwargs) for source in args.sources)
+
+    for events in results:
+        for ev in events:
+            print(json.dumps(ev))
+
+
+if __name__ == "__main__":
+    main()
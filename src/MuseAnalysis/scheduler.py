@@ -0,0 +1,280 @@
+import asyncio
+import os
+import time
+
+from functools import partial
+
+from . import instrument
+
+'''
+Stage scheduler for batch analysis.
+
+A Pipeline is a graph of tasks. Each task belongs to a stage (e.g. load,
+compute, render, save) and may depend on others, whose results are
+appended to its arguments. Every stage has its own executor: a thread
+pool for I/O bound stages, a process pool for CPU bound ones, sized by
+the stage's concurrency limit. An asyncio loop starts each task as soon
+as its dependencies are done, so the stages of different shots overlap
+and a batch runs at the pace of its slowest stage rather than the sum of
+all of them.
+
+Tasks can be grouped (e.g. by shot) and window= bounds how many groups
+are in flight, which bounds memory. The tasks of an ordered stage start
+in the order they were added, whichever inputs are ready first. Process
+stages get numpy arrays and this package's objects through shared memory
+(shared.SharedStore), a store per task, removed when the task ends. A result is dropped once the
+tasks that need it have it, unless it has no dependents.
+
+    pipe = Pipeline(dict(load=Stage("thread", 4), fit=Stage("process", 2)))
+    for shot in shots:
+        pipe.add(("load", shot), "load", load, shot, group=shot)
+        pipe.add(("fit", shot), "fit", fit, after=[("load", shot)], group=shot)
+    results, errors = pipe.run()
+
+With instrumentation enabled (instrument.enable) every task emits one
+record, stage "pipeline.<stage>", with its queueing (wait_s) and run
+(wall_s) time. Stages inside the tasks log from the thread or worker
+process they ran on, as workers inherit the log.
+'''
+
+THREAD = "thread"
+PROCESS = "process"
+
+
+class Stage:
+
+    def __init__(self, kind=THREAD, # THREAD for I/O bound work, PROCESS for CPU bound
+                       limit=1, # tasks of this stage running at once
+                       ordered=False, # start tasks in the order they were added
+                       ):
+
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"unknown stage kind {kind!r}")
+        if limit < 1:
+            raise ValueError(f"stage limit must be at least 1, got {limit}")
+
+        self.kind = kind
+        self.limit = int(limit)
+        self.ordered = ordered
+
+
+    def __repr__(self):
+        return f"Stage({self.kind!r}, {self.limit}, ordered={self.ordered})"
+
+
+    def executor(self, name):
+        if self.kind == THREAD:
+            from concurrent.futures import ThreadPoolExecutor
+            return ThreadPoolExecutor(self.limit, thread_name_prefix=f"muse-{name}")
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # forking while other stages' threads hold locks can hang a worker
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+        return ProcessPoolExecutor(self.limit, mp_context=multiprocessing.get_context(method))
+
+
+class Task:
+
+    def __init__(self, key, stage, fn, args, after, group):
+
+        self.key = key
+        self.stage = stage
+        self.fn = fn
+        self.args = args
+        self.after = tuple(after)
+        self.group = group
+
+
+class Pipeline:
+
+    def __init__(self, stages, # name -> Stage
+                       window=None, # groups in flight, None for no bound
+                       shared=True, # process stages read their inputs from shared memory
+                       ):
+
+        self.stages = dict(stages)
+        self.window = window
+        self.shared = shared
+        self.tasks = {} # key -> Task, in the order added
+        self.results = {}
+        self.errors = {}
+
+
+    def add(self, key, stage, fn, *args, after=(), group=None):
+        '''
+        task key runs fn(*args, *results of after) in stage; returns key
+        '''
+        if stage not in self.stages:
+            raise KeyError(f"unknown stage {stage!r}")
+        if key in self.tasks:
+            raise KeyError(f"task {key!r} already added")
+        for dep in after:
+            if dep not in self.tasks:
+                raise KeyError(f"task {key!r} depends on {dep!r}, which is not added yet")
+
+        self.tasks[key] = Task(key, stage, fn, args, after, group)
+        return key
+
+
+    def run(self):
+        '''
+        run every task; returns (results, errors), dicts by task key. A
+        failed task's exception is also the error of every task after it.
+        '''
+        self.results, self.errors = {}, {}
+        asyncio.run(self._run())
+        return self.results, self.errors
+
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        executors = {name: s.executor(name) for name, s in self.stages.items()}
+
+        # dependents per task, to drop results once consumed
+        self._users = {key: 0 for key in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.after:
+                self._users[dep] += 1
+        self._sinks = {key for key, n in self._users.items() if n == 0}
+
+        # in an ordered stage each task waits for the previous one to start
+        self._prev, last = {}, {}
+        for task in self.tasks.values():
+            if self.stages[task.stage].ordered:
+                if task.stage in last:
+                    self._prev[task.key] = last[task.stage]
+                last[task.stage] = task.key
+        self._started = {key: asyncio.Event() for key in self.tasks}
+
+        # groups are admitted in the order their first task was added
+        groups = {}
+        for task in self.tasks.values():
+            groups.setdefault(task.group, []).append(task.key)
+        self._admitted = {g: asyncio.Event() for g in groups}
+        self._left = {g: len(keys) for g, keys in groups.items()}
+        self._slots = asyncio.Semaphore(self.window) if self.window else None
+
+        try:
+            admit = asyncio.ensure_future(self._admit(list(groups)))
+            futures = {}
+            for key in self.tasks:
+                futures[key] = asyncio.ensure_future(self._task(loop, executors, futures, key))
+            await asyncio.gather(*futures.values())
+            await admit
+        finally:
+            for ex in executors.values():
+                ex.shutdown(wait=True, cancel_futures=True)
+
+
+    async def _admit(self, groups):
+        for g in groups:
+            if self._slots is not None and g is not None:
+                await self._slots.acquire()
+            self._admitted[g].set()
+
+
+    def _done(self, task):
+        # free consumed inputs, and the group's slot when it is complete
+        for dep in task.after:
+            self._users[dep] -= 1
+            if self._users[dep] == 0 and dep not in self._sinks:
+                self.results.pop(dep, None)
+
+        g = task.group
+        self._left[g] -= 1
+        if self._left[g] == 0 and self._slots is not None and g is not None:
+            self._slots.release()
+
+
+    async def _task(self, loop, executors, futures, key):
+        task = self.tasks[key]
+        await self._admitted[task.group].wait()
+        for dep in task.after:
+            await futures[dep]
+
+        if key in self._prev:
+            await self._started[self._prev[key]].wait()
+
+        failed = [dep for dep in task.after if dep in self.errors]
+        if failed:
+            self.errors[key] = self.errors[failed[0]]
+            self._started[key].set()
+            self._done(task)
+            return
+
+        args = task.args + tuple(self.results[dep] for dep in task.after)
+        stage = self.stages[task.stage]
+
+        store = None
+        if stage.kind == PROCESS and self.shared:
+            from .shared import SharedStore
+            store = SharedStore()
+            call = partial(_call, task.fn, _share(store, args))
+        else:
+            call = partial(task.fn, *args)
+
+        t_queued = t_start = time.time()
+        try:
+            future = loop.run_in_executor(executors[task.stage], _timed, call)
+            self._started[key].set() # queued in order, so it starts in order
+            t_start, self.results[key] = await future
+        except Exception as e:
+            self.errors[key] = e
+        finally:
+            if store is not None:
+                store.close()
+            self._done(task)
+
+        if instrument.enabled():
+            t_end = time.time()
+            instrument.emit({"stage": f"pipeline.{task.stage}", "task": str(key),
+                             "wait_s": t_start - t_queued, "wall_s": t_end - t_start,
+                             "ok": key not in self.errors, "pid": os.getpid(), "t": t_end})
+
+
+def _timed(call):
+    # in the executor: (time the task left the queue, result)
+    return time.time(), call()
+
+
+def _share(store, x):
+    '''
+    x with arrays and this package's objects replaced by store handles
+    '''
+    import numpy as np
+    from .shared import PACKAGE
+
+    if isinstance(x, np.ndarray):
+        return store.put(x) if x.dtype != object else x
+    if isinstance(x, (list, tuple)):
+        return type(x)(_share(store, v) for v in x)
+    if isinstance(x, dict):
+        return {key: _share(store, v) for key, v in x.items()}
+    if type(x).__module__.startswith(PACKAGE + ".") and hasattr(x, "__dict__"):
+        return store.share(x)
+    return x
+
+
+def _attach(x):
+    from .shared import attach
+
+    if isinstance(x, (list, tuple)):
+        return type(x)(_attach(v) for v in x)
+    if isinstance(x, dict):
+        return {key: _attach(v) for key, v in x.items()}
+    return attach(x)
+
+
+def _call(fn, args):
+    '''
+    run fn in a worker process on the shared inputs
+    '''
+    from .shared import detach
+
+    try:
+        return fn(*_attach(args))
+    finally:
+        # the worker outlives the task, its store is removed after it
+        detach()
@@ -0,0 +1,262 @@
+import numpy as np
+import os
+import secrets
+import weakref
+
+'''
+Shared memory handoff of analysis objects to process pools.
+
+SharedStore.share(obj) copies the arrays of a DoubleProbe, OceanSpectra or
+RFpower (any object whose data are numpy arrays among its attributes) once
+into shared memory segments, or into memory-mapped .npy files with
+directory=, and returns a small picklable handle. Sending the handle to a
+pool worker costs a few hundred bytes instead of the arrays, and
+attach(handle) in the worker rebuilds the object around read-only views
+of the same memory, so N workers add no copies. An array found under
+several attributes (DoubleProbe.AI0 and DoubleProbe.raw["AI0"]) stays
+one array. A worker that lives across tasks calls detach() at the end of
+each, so it does not keep segments the owner has already removed mapped.
+
+The store owns what it creates: close(), the end of a with block, garbage
+collection or interpreter exit remove it. Workers only attach, so a
+crashed worker leaves nothing behind. Segments and directories are named
+after the owner's pid, and a new SharedStore removes those of owners that
+no longer run (a killed owner's segments are also unlinked by the
+multiprocessing resource tracker).
+
+    with SharedStore() as store, ProcessPoolExecutor() as pool:
+        h = store.share(probe)
+        pool.map(work, [(h, t0, t1) for ...]) # work calls attach(h), then detach()
+'''
+
+PREFIX = "muse"
+MIN_BYTES = 1 << 12 # smaller arrays travel inside the handle
+SKIP = ("raw_data",) # OceanSpectra source text lines, not needed by workers
+PACKAGE = __name__.rsplit(".", 1)[0]
+
+_attached = {} # segment or file -> read-only array, per process
+_segments = {} # segment -> SharedMemory kept open for its views
+
+
+class ArrayHandle:
+
+    def __init__(self, name, shape, dtype, path=None):
+
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+        self.path = path
+
+
+    def open(self):
+        '''
+        read-only view of the shared array, attached once per process
+        '''
+        key = self.path or self.name
+        arr = _attached.get(key)
+        if arr is not None:
+            return arr
+
+        if self.path:
+            arr = np.load(self.path, mmap_mode="r")
+        else:
+            shm = _segments.get(self.name) or _attach(self.name)
+            _segments[self.name] = shm
+            arr = np.ndarray(self.shape, self.dtype, buffer=shm.buf)
+            arr.flags.writeable = False
+        _attached[key] = arr
+        return arr
+
+
+class ObjectHandle:
+
+    def __init__(self, cls, state):
+
+        self.cls = cls
+        self.state = state # attributes, arrays replaced by ArrayHandles
+
+
+    def open(self):
+        '''
+        a new cls instance with the shared arrays as attributes, without
+        running __init__ (nothing is reloaded)
+        '''
+        obj = self.cls.__new__(self.cls)
+        obj.__dict__.update(_unpack(self.state))
+        return obj
+
+
+def attach(x):
+    '''
+    the array or object behind a handle; anything else is returned as is
+    '''
+    if isinstance(x, (ArrayHandle, ObjectHandle)):
+        return x.open()
+    return x
+
+
+def detach():
+    '''
+    drop this process's views, so memory of closed stores is released;
+    call it when a task is done with its handles
+    '''
+    _attached.clear()
+    for name, shm in list(_segments.items()):
+        try:
+            shm.close()
+        except BufferError:
+            continue # a view is still in use, closed by a later detach()
+        del _segments[name]
+
+
+class SharedStore:
+
+    def __init__(self, directory=None, # None for shared memory, else memory-mapped files under it
+                 ):
+        import tempfile
+
+        sweep(directory)
+        self.prefix = f"{PREFIX}_{os.getpid()}_{secrets.token_hex(4)}_"
+        self.segments = [] # SharedMemory objects this store created
+        self.directory = None
+        if directory is not None:
+            self.directory = tempfile.mkdtemp(prefix=self.prefix, dir=directory)
+
+        self._count = 0
+        self._finalize = weakref.finalize(self, _release, self.segments, self.directory)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        '''
+        unlink every segment (or file) of this store, open views in other
+        processes stay valid until they are dropped
+        '''
+        self._finalize()
+
+
+    def put(self, arr):
+        '''
+        copy arr into the store, returns its ArrayHandle
+        '''
+        from multiprocessing.shared_memory import SharedMemory
+
+        arr = np.ascontiguousarray(arr)
+        self._count += 1
+
+        if self.directory is not None:
+            path = os.path.join(self.directory, f"{self._count}.npy")
+            np.save(path, arr)
+            return ArrayHandle(None, arr.shape, arr.dtype, path)
+
+        shm = SharedMemory(name=f"{self.prefix}{self._count}", create=True, size=max(arr.nbytes, 1))
+        self.segments.append(shm)
+        view = np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)
+        view[...] = arr
+        del view # no export left, so close() can unmap
+        return ArrayHandle(shm.name, arr.shape, arr.dtype)
+
+
+    def share(self, obj):
+        '''
+        ObjectHandle of obj, its arrays (also inside dicts, lists and this
+        package's helper objects such as Timebase) copied into the store
+        '''
+        state = {key: val for key, val in vars(obj).items() if key not in SKIP}
+        return ObjectHandle(type(obj), self._pack(state, {}))
+
+
+    def _pack(self, val, memo):
+        if isinstance(val, np.ndarray) and val.dtype != object and val.nbytes >= MIN_BYTES:
+            if id(val) not in memo:
+                memo[id(val)] = self.put(val)
+            return memo[id(val)]
+        if isinstance(val, dict):
+            return {key: self._pack(v, memo) for key, v in val.items()}
+        if isinstance(val, (list, tuple)):
+            return type(val)(self._pack(v, memo) for v in val)
+        if type(val).__module__.startswith(PACKAGE + ".") and hasattr(val, "__dict__"):
+            return ObjectHandle(type(val), self._pack(dict(vars(val)), memo))
+        return val
+
+
+def _unpack(val):
+    if isinstance(val, (ArrayHandle, ObjectHandle)):
+        return val.open()
+    if isinstance(val, dict):
+        return {key: _unpack(v) for key, v in val.items()}
+    if isinstance(val, (list, tuple)):
+        return type(val)(_unpack(v) for v in val)
+    return val
+
+
+def _attach(name):
+    from multiprocessing.shared_memory import SharedMemory
+
+    try:
+        return SharedMemory(name=name, track=False) # 3.13+, the owner tracks it
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+def _release(segments, directory):
+    import shutil
+
+    for shm in segments:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    segments.clear()
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def sweep(directory=None):
+    '''
+    remove segments (in /dev/shm) and memory-map directories left by
+    stores whose owner process has died
+    '''
+    import re
+    import shutil
+    import tempfile
+
+    pattern = re.compile(rf"^{PREFIX}_(\d+)_[0-9a-f]+_")
+    places = [("/dev/shm", False), (directory or tempfile.gettempdir(), True)]
+    for place, is_dir in places:
+        try:
+            names = os.listdir(place)
+        except OSError:
+            continue
+        for name in names:
+            m = pattern.match(name)
+            if m is None or _alive(int(m.group(1))):
+                continue
+            path = os.path.join(place, name)
+            if is_dir and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif not is_dir and os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
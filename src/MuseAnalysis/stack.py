@@ -0,0 +1,219 @@
+import numpy as np
+import os
+import tempfile
+
+'''
+Out-of-core stacking of spectra from many shots.
+
+Shots are added one at a time. Each is aligned to its plasma start,
+interpolated onto a common time grid and folded into memory-mapped
+accumulators per (time bin, wavelength): Welford mean / variance, min,
+max and a histogram for approximate percentiles. Memory use depends on
+the grid size, not on the number of shots.
+
+usage: python -m MuseAnalysis.stack stack.npz spec1.txt spec2.muse ... [--t1 8000 --dt 20]
+'''
+
+
+class SpectraStack:
+
+    def __init__(self, t_grid, # ms relative to plasma start
+                       spectral_axis,
+                       workdir=None, # memmap directory, temporary if None
+                       bins=None, # histogram edges for percentiles, None for default, False to skip
+                 ):
+
+        self.t_grid = np.asarray(t_grid, float)
+        self.spectral_axis = np.asarray(spectral_axis, float)
+        self.shape = (len(self.t_grid), len(self.spectral_axis))
+
+        if workdir is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="musestack")
+            workdir = self._tmp.name
+        os.makedirs(workdir, exist_ok=True)
+        self.workdir = workdir
+
+        # counts can differ per time bin (shots of different length), not per pixel
+        self.count = np.zeros(self.shape[0], np.int64)
+        self.mean = self._memmap("mean", np.float64, 0.0)
+        self.M2 = self._memmap("M2", np.float64, 0.0)
+        self.min = self._memmap("min", np.float64, np.inf)
+        self.max = self._memmap("max", np.float64, -np.inf)
+
+        if bins is None:
+            # log-spaced over the 16 bit detector range, plus under/overflow
+            bins = np.concatenate([[-np.inf, 0], np.geomspace(1, 2**16, 126), [np.inf]])
+        self.bins = None if bins is False else np.asarray(bins, float)
+        self.hist = None
+        if self.bins is not None:
+            self.hist = self._memmap("hist", np.uint32, 0, self.shape + (len(self.bins) - 1,))
+
+        self.shots = []
+
+
+    def _memmap(self, name, dtype, fill, shape=None):
+        shape = self.shape if shape is None else shape
+        arr = np.lib.format.open_memmap(os.path.join(self.workdir, name + ".npy"),
+                                        mode="w+", dtype=dtype, shape=shape)
+        arr[...] = fill
+        return arr
+
+
+    def align(self, spec, t_start=None):
+        '''
+        spec.data interpolated onto t_grid (relative to plasma start) and the
+        stack's wavelength axis, and the mask of grid rows the shot covers
+        '''
+
+        if t_start is None:
+            t_start = spec.plasmaStart()
+        t = spec.time_axis - t_start
+
+        # spectra from other spectrometer configs go onto the stack's axis
+        data = spec.data
+        if not np.array_equal(spec.spectral_axis, self.spectral_axis):
+            from .resample import resample
+            data = resample(data, spec.spectral_axis, self.spectral_axis)
+
+        valid = (self.t_grid >= t[0]) & (self.t_grid <= t[-1])
+        tg = self.t_grid[valid]
+
+        # linear interpolation weights along time, shared by all pixels
+        j1 = np.clip(np.searchsorted(t, tg), 1, len(t) - 1)
+        j0 = j1 - 1
+        w = ((tg - t[j0]) / np.where(t[j1] > t[j0], t[j1] - t[j0], 1))[:, None]
+        x = data[j0] * (1 - w) + data[j1] * w
+
+        return x, valid
+
+
+    def add(self, spec, t_start=None):
+        '''
+        fold one OceanSpectra into the accumulators
+        '''
+
+        x, valid = self.align(spec, t_start)
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            return
+
+        # Welford update, row-wise counts
+        self.count[rows] += 1
+        n = self.count[rows][:, None]
+        mean = self.mean[rows]
+        delta = x - mean
+        mean += delta / n
+        self.mean[rows] = mean
+        self.M2[rows] += delta * (x - mean)
+
+        self.min[rows] = np.minimum(self.min[rows], x)
+        self.max[rows] = np.maximum(self.max[rows], x)
+
+        if self.hist is not None:
+            # every (row, pixel) cell gets one value, so fancy-index += is exact
+            b = np.clip(np.searchsorted(self.bins, x, side="right") - 1, 0, len(self.bins) - 2)
+            r = np.repeat(rows, self.shape[1])
+            p = np.tile(np.arange(self.shape[1]), len(rows))
+            self.hist[r, p, b.ravel()] += 1
+
+        self.shots.append(str(spec.fname))
+
+
+    def addFiles(self, fins):
+        '''
+        stream spectra files (text or archive) one at a time
+        '''
+        from .OceanSpectra import OceanSpectra
+
+        for fin in fins:
+            self.add(OceanSpectra(fin))
+
+
+    def variance(self):
+        n = self.count[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 1, self.M2 / (n - 1), np.nan)
+
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+
+    def percentile(self, q, block=16):
+        '''
+        approximate q-th percentile per cell from the histogram, linear within
+        a bin and clamped to the observed min / max; computed in row blocks
+        '''
+
+        if self.hist is None:
+            raise ValueError("stack was built without a histogram (bins=False)")
+
+        out = np.full(self.shape, np.nan)
+        edges = self.bins
+        for r0 in range(0, self.shape[0], block):
+            r1 = min(r0 + block, self.shape[0])
+            n = self.count[r0:r1]
+            if not n.any():
+                continue
+
+            cum = np.cumsum(self.hist[r0:r1], axis=2)
+            target = (q / 100) * n[:, None, None]
+            b = np.minimum(np.argmax(cum >= np.maximum(target, 1), axis=2), len(edges) - 2)
+
+            below = np.take_along_axis(cum, b[..., None], 2)[..., 0] - \
+                    np.take_along_axis(self.hist[r0:r1], b[..., None], 2)[..., 0]
+            inbin = np.take_along_axis(self.hist[r0:r1], b[..., None], 2)[..., 0]
+            frac = np.clip((target[..., 0] - below) / np.maximum(inbin, 1), 0, 1)
+
+            lo = np.maximum(edges[b], self.min[r0:r1])
+            hi = np.minimum(edges[b + 1], self.max[r0:r1])
+            val = lo + frac * (hi - lo)
+            out[r0:r1] = np.where(n[:, None] > 0, val, np.nan)
+
+        return out
+
+
+    def save(self, fout, percentiles=(5, 50, 95)):
+        '''
+        write the stack statistics to an .npz
+        '''
+        result = dict(t_grid=self.t_grid, spectral_axis=self.spectral_axis, count=self.count,
+                      mean=np.asarray(self.mean), std=self.std(),
+                      min=np.asarray(self.min), max=np.asarray(self.max),
+                      shots=np.array(self.shots))
+        if self.hist is not None:
+            for q in percentiles:
+                result[f"p{q:g}"] = self.percentile(q)
+
+        np.savez_compressed(fout, **result)
+        return fout
+
+
+def main():
+    '''
+    Stack spectra from many shots aligned on plasma start
+    '''
+    import argparse
+
+    from .OceanSpectra import OceanSpectra
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("output", help="npz file for the statistics")
+    parser.add_argument("spectra", nargs="+")
+    parser.add_argument("--t0", type=float, default=-1000, help="ms before plasma start")
+    parser.add_argument("--t1", type=float, default=6000, help="ms after plasma start")
+    parser.add_argument("--dt", type=float, default=20, help="ms per time bin")
+    parser.add_argument("-w", "--workdir", help="memmap directory")
+    args = parser.parse_args()
+
+    first = OceanSpectra(args.spectra[0])
+    stack = SpectraStack(np.arange(args.t0, args.t1, args.dt), first.spectral_axis, args.workdir)
+    stack.add(first)
+    del first
+    stack.addFiles(args.spectra[1:])
+
+    print(stack.save(args.output))
+
+
+if __name__ == "__main__":
+    main()
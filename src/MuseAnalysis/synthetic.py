@@ -0,0 +1,223 @@
+import numpy as np
+import os
+
+'''
+Synthetic MUSE data in the same on-disk formats as the real diagnostics.
+
+Used by the benchmarks to produce shots of any size without lab data.
+usage: python -m MuseAnalysis.synthetic data/ 231223001 [duration_s]
+'''
+
+# seconds between Jan 1 1904 and Jan 1 1970, both GMT midnight
+t_gap = 2082844800.0
+
+# default shot start, Dec 23 2023 in LabVIEW (1904) seconds
+T_START = 1703347200.0 + t_gap
+
+
+def plasmaEnvelope(t, t_on=2.0, t_off=7.0, rise=0.1):
+    '''
+    smooth 0 -> 1 -> 0 window for when the plasma is on
+    '''
+    return 0.25 * (1 + np.tanh((t - t_on) / rise)) * (1 - np.tanh((t - t_off) / rise))
+
+
+def writeNIDAQ(fout, duration=10.0, rate=1000.0, t_start=T_START,
+                     Te=5.0, # eV
+                     Isat=0.5, # mA
+                     V_FACTOR=40/1.76,
+                     I_FACTOR=4e-2/0.85,
+                     sweep_hz=10.0,
+                     seed=0,
+                     probes=1, # extra probes add bias / shunt columns AI4, AI5, ...
+               ):
+    '''
+    write NIDAQtext.txt: time (s from 1904), AI0..AI3, AO0, AO1, comma separated
+    '''
+
+    rng = np.random.default_rng(seed)
+    N = int(duration * rate)
+    t = np.arange(N) / rate
+    on = plasmaEnvelope(t)
+
+    # pressure gauge voltage, P = 10**((V - 5.5)/0.5)
+    P = 2e-4 + 1e-3 * on
+    AI0 = 5.5 + 0.5 * np.log10(P * 0.42) + 2e-3 * rng.standard_normal(N)
+
+    # bias sweep, requested and measured
+    AO0 = 2.0 * np.sin(2 * np.pi * sweep_hz * t)
+    V_bias = 45 * AO0 / 2.0
+    AI2 = V_bias / V_FACTOR + 5e-3 * rng.standard_normal(N)
+
+    # probe current through shunt
+    I = on * Isat * np.tanh(V_bias / 2 / Te) + 0.02 * on
+    AI3 = I / I_FACTOR + 0.2 * rng.standard_normal(N)
+
+    # floating probe, fluctuations only during plasma
+    AI1 = 0.1 + on * (0.5 + 0.2 * rng.standard_normal(N))
+    AO1 = np.zeros(N)
+
+    cols = [t + t_start, AI0, AI1, AI2, AI3, AO0, AO1]
+
+    # more probes on the same sweep, each a little hotter
+    for k in range(1, probes):
+        I = on * Isat * np.tanh(V_bias / 2 / (Te * (1 + 0.2*k))) + 0.02 * on
+        cols.append(V_bias / V_FACTOR + 5e-3 * rng.standard_normal(N))
+        cols.append(I / I_FACTOR + 0.2 * rng.standard_normal(N))
+
+    data = np.column_stack(cols)
+    np.savetxt(fout, data, delimiter=',', fmt='%.6f')
+
+
+def writeChannels(fout, probes):
+    '''
+    write the channels.json for a writeNIDAQ table with this many probes
+    '''
+    from .channels import ChannelMap
+
+    cm = ChannelMap.default()
+    for k in range(1, probes):
+        V, I = f"AI{2 + 2*k}", f"AI{3 + 2*k}"
+        cm.columns += [V, I]
+        cm.channels[f"bias{k+1}"] = dict(cm.channels["bias"], column=V)
+        cm.channels[f"shunt{k+1}"] = dict(cm.channels["shunt"], column=I)
+        cm.probes[f"probe{k+1}"] = dict(cm.probes["probe"], V=f"bias{k+1}", I=f"shunt{k+1}")
+    cm.save(fout)
+
+
+def writeRFLog(fout, duration=10.0, rate=5.0, t_start=T_START,
+                     P_set=300.0, # W
+                     fixed_width=False,
+                     seed=0,
+               ):
+    '''
+    write RFLog*.txt: alternating forward / reflected lines of (time, power)
+
+    fixed_width=False gives "time,power" CSV lines,
+    fixed_width=True gives a 14 character time followed directly by power.
+    '''
+
+    rng = np.random.default_rng(seed)
+    N = int(duration * rate)
+    t = np.arange(N) / rate
+    on = plasmaEnvelope(t)
+
+    P_fwd = P_set * on + rng.normal(0, 1, N).clip(0)
+    P_rev = 0.05 * P_fwd * (1 + 0.3 * rng.random(N))
+
+    # reflected is logged a few ms after forward
+    t_fwd = t + t_start
+    t_rev = t_fwd + 0.004
+
+    sep = "" if fixed_width else ","
+    with open(fout, "w") as f:
+        for j in range(N):
+            f.write(f"{t_fwd[j]:14.3f}{sep}{P_fwd[j]:.2f}\n")
+            f.write(f"{t_rev[j]:14.3f}{sep}{P_rev[j]:.2f}\n")
+
+
+def writeSpectra(fout, duration=10.0, integration=0.02, t_start=T_START,
+                       N_pixels=2048,
+                       lines={656.279: 4e4, 486.135: 1.2e4, 434.0462: 4e3}, # nm: peak counts
+                       dark=1000,
+                       seed=0,
+                 ):
+    '''
+    write an Ocean spectrometer text file (header, >>> marker, axis, spectra)
+    '''
+
+    rng = np.random.default_rng(seed)
+    N = int(duration / integration)
+    t = np.arange(N) * integration
+    on = plasmaEnvelope(t)
+
+    s_ax = np.linspace(200, 1000, N_pixels)
+    profile = np.zeros(N_pixels)
+    for f0, amp in lines.items():
+        profile += amp * np.exp(-0.5 * ((s_ax - f0) / 0.6)**2)
+
+    counts = dark + np.outer(on, profile)
+    counts = rng.poisson(counts).clip(0, 65535)
+
+    unix_ms = np.round((t + t_start - t_gap) * 1e3).astype(np.int64)
+
+    with open(fout, "w") as f:
+        f.write("Data from synthetic.txt Node\n\n")
+        f.write("Date: Sat Dec 23 00:00:00 GMT 2023\n")
+        f.write("User: muse\n")
+        f.write("Spectrometer: SYN00000\n")
+        f.write("Trigger mode: 0\n")
+        f.write(f"Integration Time (sec): {integration:.6E}\n")
+        f.write("Scans to average: 1\n")
+        f.write("Electric dark correction enabled: false\n")
+        f.write("Nonlinearity correction enabled: false\n")
+        f.write("Boxcar width: 0\n")
+        f.write("XAxis mode: Wavelengths\n")
+        f.write(f"Number of Pixels in Spectrum: {N_pixels}\n")
+        f.write(">>>>>Begin Spectral Data<<<<<\n")
+        f.write("\t\t" + "\t".join(f"{x:.3f}" for x in s_ax) + "\n")
+        for j in range(N):
+            sec = t_start - t_gap + t[j]
+            human = f"2023-12-23 00:00:{sec % 60:06.3f}"
+            f.write(f"{human}\t{unix_ms[j]}\t" + "\t".join(map(str, counts[j])) + "\n")
+
+
+def writeSettings(fout, shot, P_set=300.0):
+    '''
+    write settings.txt, one "key: value" per line
+    '''
+
+    settings = {
+        "Shot": shot,
+        "RF1 Power (W)": P_set,
+        "RF2 Power (W)": P_set,
+        "Gas": "H2",
+        "Gas Flow (sccm)": 10.0,
+        "Magnet Current (A)": 120.0,
+        "Bias Sweep (Hz)": 10.0,
+    }
+    with open(fout, "w") as f:
+        for key, val in settings.items():
+            f.write(f"{key}: {val}\n")
+
+
+def makeShot(root, shot, duration=10.0,
+                   daq_rate=1000.0,
+                   rf_rate=5.0,
+                   integration=0.02,
+                   N_pixels=2048,
+                   fixed_width=False,
+                   seed=0,
+                   probes=1,
+             ):
+    '''
+    write a complete shot: root/shot/{NIDAQtext,RFLog1,RFLog2,settings}.txt
+    (and channels.json with more than one probe)
+    and root/spectroscopy/spec_<shot>.txt. Returns the shot path (with trailing '/').
+    '''
+
+    shot = str(shot)
+    path = os.path.join(root, shot) + "/"
+    spec_dir = os.path.join(root, "spectroscopy")
+    os.makedirs(path, exist_ok=True)
+    os.makedirs(spec_dir, exist_ok=True)
+
+    writeNIDAQ(path + "NIDAQtext.txt", duration, daq_rate, seed=seed, probes=probes)
+    if probes > 1:
+        writeChannels(path + "channels.json", probes)
+    writeRFLog(path + "RFLog1.txt", duration, rf_rate, fixed_width=fixed_width, seed=seed)
+    writeRFLog(path + "RFLog2.txt", duration, rf_rate, fixed_width=fixed_width, seed=seed+1)
+    writeSettings(path + "settings.txt", shot)
+    writeSpectra(os.path.join(spec_dir, f"spec_{shot}.txt"), duration, integration,
+                 N_pixels=N_pixels, seed=seed)
+
+    return path
+
+
+if __name__ == "__main__":
+    import sys
+
+    root = sys.argv[1]
+    shot = sys.argv[2]
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    print(makeShot(root, shot, duration))
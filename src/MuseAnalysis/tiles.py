@@ -0,0 +1,419 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+'''
+Local tile server for browsing shots interactively.
+
+Every time series of a shot (the calibrated NIDAQ channels, forward and
+reflected power of each RF log) is put on a uniform grid and reduced to
+a min/max pyramid: level 0 holds the samples and each level above pairs
+the bins of the one below, keeping their min and max. Spectrometer
+spectra and the STFT spectrogram of the floating probe are max-pooled the
+same way along time, after pooling wavelength / frequency once to at most
+IMAGE_ROWS bins. Levels are cut into tiles.
+
+Pyramids are built the first time a shot is opened and kept as .npz in a
+cache directory, keyed by the size and mtime of the source files, so
+later requests are array slices and the source files are not read again.
+The browser view (tiles.html) fetches the tiles for the level that
+matches its pixel width, so panning and zooming a long shot stays
+instant.
+
+    GET /                                        browser view
+    GET /api/shots                               shots under the data directory
+    GET /api/<shot>/index                        series and images, their grids and levels
+    GET /api/<shot>/series/<name>/<level>/<k>    float32, TILE mins then TILE maxs
+    GET /api/<shot>/image/<name>/<level>/<k>     float32, IMAGE_TILE columns of rows
+
+Standard library only (http.server), bound to localhost by default.
+
+usage: python -m MuseAnalysis.tiles data/ [-p 8050] [--cache ~/.cache/muse-tiles]
+'''
+
+TILE = 1024 # bins per series tile
+IMAGE_TILE = 256 # time columns per image tile
+IMAGE_ROWS = 256 # wavelength / frequency bins of images
+
+VIEW = os.path.join(os.path.dirname(__file__), "tiles.html")
+
+
+def minmaxPyramid(y, tile=TILE):
+    '''
+    [(min, max), ...] per level, from the samples up to the first level
+    that fits one tile; NaN (gaps) are ignored where a bin has data
+    '''
+    lo = hi = np.asarray(y, np.float32)
+    levels = [(lo, hi)]
+    while len(lo) > tile:
+        n = len(lo) // 2 * 2
+        lo2 = np.fmin(lo[:n:2], lo[1:n:2])
+        hi2 = np.fmax(hi[:n:2], hi[1:n:2])
+        if n < len(lo): # odd bin carried up
+            lo2 = np.append(lo2, lo[-1])
+            hi2 = np.append(hi2, hi[-1])
+        lo, hi = lo2, hi2
+        levels.append((lo, hi))
+    return levels
+
+
+def poolRows(Z, rows=IMAGE_ROWS):
+    '''
+    max over groups of columns of Z (n_t, n_y) so at most rows remain;
+    returns (Z, group size)
+    '''
+    n_t, n_y = Z.shape
+    g = -(-n_y // rows)
+    if g <= 1:
+        return Z, 1
+    pad = g * (-(-n_y // g)) - n_y
+    Z = np.pad(Z, ((0, 0), (0, pad)), constant_values=np.nan)
+    return np.nanmax(Z.reshape(n_t, -1, g), axis=2), g
+
+
+def imagePyramid(Z, tile=IMAGE_TILE):
+    '''
+    [Z, ...] per level, time columns pairwise max-pooled up to the first
+    level that fits one tile
+    '''
+    Z = np.asarray(Z, np.float32)
+    levels = [Z]
+    while len(Z) > tile:
+        n = len(Z) // 2 * 2
+        Z2 = np.fmax(Z[:n:2], Z[1:n:2])
+        if n < len(Z):
+            Z2 = np.vstack([Z2, Z[-1:]])
+        Z = Z2
+        levels.append(Z)
+    return levels
+
+
+def uniform(t, y, dt=None):
+    '''
+    (t0, dt, y) of y resampled onto a uniform grid from t[0]; dt defaults
+    to the median sample spacing
+    '''
+    t = np.asarray(t, float)
+    if dt is None:
+        dt = float(np.median(np.diff(t))) if len(t) > 1 else 1.0
+    n = max(int(round((t[-1] - t[0]) / dt)) + 1, 1)
+    grid = t[0] + np.arange(n) * dt
+    return float(t[0]), dt, np.interp(grid, t, y)
+
+
+def shotSources(path):
+    '''
+    (probe file, RF logs, spectra file or None) of a shot directory or archive
+    '''
+    from .quicklook import shotFiles
+
+    probe_file, rf_files, spec_files = shotFiles(path)
+    return probe_file, rf_files, spec_files[0] if spec_files else None
+
+
+def signature(path):
+    '''
+    short key from the size and mtime of a shot's source files
+    '''
+    import hashlib
+    from .archive import splitSelector
+
+    probe_file, rf_files, spec_file = shotSources(path)
+    h = hashlib.sha1(os.path.abspath(path).encode())
+    for fin in [probe_file, spec_file] + rf_files:
+        fin = fin and splitSelector(fin)[0]
+        if fin and os.path.exists(fin):
+            st = os.stat(fin)
+            h.update(f"{fin}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:12]
+
+
+def buildPyramids(path, fout, fluctuation=("float",)):
+    '''
+    load one shot, write every pyramid level to fout (.npz name or file)
+    and return the index: series and images with their t0 (s from 1904),
+    dt, levels
+    '''
+    from .DoubleProbe import DoubleProbe
+    from .OceanSpectra import OceanSpectra
+    from .RF import RFpower
+    from .instrument import stage
+    from .lag import t_gap
+
+    probe_file, rf_files, spec_file = shotSources(path)
+    arrays = {}
+    index = dict(series={}, images={}, tile=TILE, image_tile=IMAGE_TILE)
+
+    def addSeries(name, t0, dt, y, unit=""):
+        levels = minmaxPyramid(y)
+        for L, (lo, hi) in enumerate(levels):
+            arrays[f"s/{name}/{L}"] = np.stack([lo, hi])
+        index["series"][name] = dict(t0=t0, dt=dt, n=len(y), levels=len(levels), unit=unit)
+
+    def addImage(name, t0, dt, Z, y0, y1, unit=""):
+        Z, g = poolRows(Z)
+        levels = imagePyramid(Z)
+        for L, Zl in enumerate(levels):
+            arrays[f"i/{name}/{L}"] = Zl
+        finite = Z[np.isfinite(Z)]
+        vmin, vmax = np.percentile(finite, [1, 99.9]) if len(finite) else (0.0, 1.0)
+        index["images"][name] = dict(t0=t0, dt=dt, n=len(Z), rows=Z.shape[1], levels=len(levels),
+                                     y0=y0, y1=y1, vmin=float(vmin), vmax=float(vmax), unit=unit)
+
+    with stage("tiles.build", shot=str(path)):
+        try:
+            probe = DoubleProbe(probe_file)
+        except (OSError, KeyError, ValueError):
+            probe = None
+        if probe is not None:
+            tb = probe.timebase
+            t = probe.unix_time
+            for name in probe.channels.channels:
+                y = probe.signal(name)
+                if tb.uniform and len(tb.seg_i) == 1:
+                    addSeries(name, tb.t0, tb.dt, y)
+                else:
+                    addSeries(name, *uniform(t, y, tb.dt))
+
+            from .fluctuation import spectrogram
+            for name in fluctuation:
+                if name not in probe.channels.channels:
+                    continue
+                try:
+                    times, freqs, S = spectrogram(probe.signal(name), 1 / tb.dt, tb, average=4)
+                except ValueError:
+                    continue # too short
+                floor = S.max() * 1e-8 or np.finfo(float).tiny # 80 dB
+                dt = float(times[1] - times[0]) if len(times) > 1 else tb.dt
+                addImage(f"{name} PSD", float(times[0]), dt, 10 * np.log10(np.maximum(S, floor)),
+                         float(freqs[0]), float(freqs[-1]), "Hz")
+
+        for fin in rf_files:
+            try:
+                rf = RFpower(fin)
+            except (OSError, KeyError, ValueError):
+                continue
+            log = os.path.basename(fin.replace(":", "/")).replace(".txt", "")
+            addSeries(f"{log} fwd", *uniform(rf.t_fwd_abs, rf.P_fwd), unit="W")
+            addSeries(f"{log} rev", *uniform(rf.t_rev_abs, rf.P_rev), unit="W")
+
+        if spec_file is not None:
+            try:
+                spec = OceanSpectra(spec_file)
+            except (OSError, KeyError, ValueError):
+                spec = None
+            if spec is not None:
+                t = spec.unix_time / 1e3 + t_gap
+                dt = float(np.median(np.diff(t))) if len(t) > 1 else spec.dt
+                Z = spec.data
+                # dropped frames: rows onto a uniform grid, nearest spectrum
+                n = int(round((t[-1] - t[0]) / dt)) + 1
+                if n != len(t):
+                    grid = t[0] + np.arange(n) * dt
+                    Z = Z[np.clip(np.searchsorted(t, grid + dt/2) - 1, 0, len(t) - 1)]
+                ax = spec.spectral_axis
+                addImage("spectra", float(t[0]), dt, Z, float(ax[0]), float(ax[-1]), "nm")
+
+    np.savez(fout, **arrays)
+    return index
+
+
+class ShotTiles:
+
+    def __init__(self, path, cache_dir):
+
+        self.path = path
+        key = signature(path)
+        base = os.path.join(cache_dir, f"{os.path.basename(str(path).rstrip('/'))}-{key}")
+
+        if not (os.path.exists(base + ".npz") and os.path.exists(base + ".json")):
+            self._build(path, key, base, cache_dir)
+
+        with open(base + ".json") as f:
+            self.index = json.load(f)
+        self.npz = np.load(base + ".npz")
+        self.levels = {} # array name -> loaded level
+        self.lock = threading.Lock()
+
+
+    @staticmethod
+    def _build(path, key, base, cache_dir):
+        import tempfile
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # temporary names of this process only, servers may share a cache
+        prefix = os.path.basename(base) + "."
+        fd_npz, tmp_npz = tempfile.mkstemp(".npz", prefix, cache_dir)
+        fd_json, tmp_json = tempfile.mkstemp(".json", prefix, cache_dir)
+        try:
+            with os.fdopen(fd_npz, "wb") as f:
+                index = buildPyramids(path, f)
+            index["version"] = key
+            with os.fdopen(fd_json, "w") as f:
+                json.dump(index, f)
+            # both files appear complete or not at all
+            os.replace(tmp_npz, base + ".npz")
+            os.replace(tmp_json, base + ".json")
+        finally:
+            for tmp in [tmp_npz, tmp_json]:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+
+    def _level(self, name):
+        with self.lock:
+            arr = self.levels.get(name)
+            if arr is None:
+                arr = self.levels[name] = self.npz[name]
+            return arr
+
+
+    def series(self, name, level, k):
+        '''
+        tile k of a series level as float32 bytes, mins then maxs
+        '''
+        arr = self._level(f"s/{name}/{level}")
+        if not 0 <= k*TILE < arr.shape[1]:
+            raise IndexError(f"no tile {k} in level {level} of {name}")
+        lo, hi = arr[:, k*TILE:(k+1)*TILE]
+        return np.concatenate([lo, hi]).astype("<f4").tobytes()
+
+
+    def image(self, name, level, k):
+        '''
+        tile k of an image level as float32 bytes, IMAGE_TILE rows of
+        (time column) values
+        '''
+        Z = self._level(f"i/{name}/{level}")
+        if not 0 <= k*IMAGE_TILE < len(Z):
+            raise IndexError(f"no tile {k} in level {level} of {name}")
+        Z = Z[k*IMAGE_TILE:(k+1)*IMAGE_TILE]
+        return np.ascontiguousarray(Z, "<f4").tobytes()
+
+
+def findShots(root):
+    '''
+    {name: path} of shot directories and .muse archives under root
+    '''
+    from .archive import SUFFIX
+
+    shots = {}
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and any(os.path.exists(os.path.join(path, f))
+                                       for f in ["NIDAQtext.txt", "RFLog1.txt"]):
+            shots[name] = path
+        elif name.endswith(SUFFIX):
+            shots[name] = path
+    return shots
+
+
+class TileServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, root, cache_dir):
+
+        super().__init__(address, TileHandler)
+        self.root = root
+        self.cache_dir = cache_dir
+        self.shots = {} # name -> ShotTiles
+        self.building = {} # name -> lock, one build per shot
+        self.lock = threading.Lock()
+
+
+    def shot(self, name):
+        '''
+        ShotTiles of a listed shot, built on first use; KeyError otherwise
+        '''
+        tiles = self.shots.get(name)
+        if tiles is not None:
+            return tiles
+
+        path = findShots(self.root)[name]
+        with self.lock:
+            build = self.building.setdefault(name, threading.Lock())
+        with build:
+            if name not in self.shots:
+                self.shots[name] = ShotTiles(path, self.cache_dir)
+        return self.shots[name]
+
+
+class TileHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        parts = [unquote(p) for p in urlparse(self.path).path.split("/") if p]
+        try:
+            if not parts:
+                with open(VIEW, "rb") as f:
+                    return self.reply(f.read(), "text/html; charset=utf-8")
+
+            if parts == ["api", "shots"]:
+                return self.json(list(findShots(self.server.root)))
+
+            if parts[0] == "api" and len(parts) >= 3:
+                tiles = self.server.shot(parts[1])
+                if parts[2] == "index" and len(parts) == 3:
+                    return self.json(tiles.index)
+                if parts[2] in ["series", "image"] and len(parts) == 6:
+                    name, level, k = parts[3], int(parts[4]), int(parts[5])
+                    get = tiles.series if parts[2] == "series" else tiles.image
+                    # tile URLs carry ?v=version, so the browser may keep them
+                    return self.reply(get(name, level, k), "application/octet-stream",
+                                      cache="max-age=86400, immutable")
+
+            self.send_error(404)
+        except (KeyError, ValueError, IndexError):
+            self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+    def json(self, obj):
+        self.reply(json.dumps(obj).encode(), "application/json")
+
+
+    def reply(self, body, ctype, cache="no-cache"):
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, fmt, *args):
+        pass # one line per tile is too much
+
+
+def main():
+    '''
+    Serve min/max and spectrogram tile pyramids of the shots in a data
+    directory to a browser view
+    '''
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("root", nargs="?", default=os.getenv("MUSE_DATA_PATH", "data"),
+                        help="directory of shot directories and .muse archives")
+    parser.add_argument("-p", "--port", type=int, default=8050)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--cache", default=os.path.join(os.path.expanduser("~"), ".cache", "muse-tiles"))
+    args = parser.parse_args()
+
+    server = TileServer((args.host, args.port), args.root, args.cache)
+    print(f"serving {args.root} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import numpy as np
+
+'''
+Compact time axis for regularly sampled data.
+
+A DAQ clock is stored as uniform segments (start index, start time, dt)
+plus a sparse list of samples that sit off the grid by more than tol.
+By default tol is float rounding only: 2 units in the last place of the
+largest time, under 1 us for times in s from 1904, so any real jitter is
+kept exactly and rebuilt times are never further than tol from the
+samples. A clock written with fewer decimals than its step needs is off
+the grid everywhere and is kept as is.
+A clean record is one segment; each gap in acquisition starts a new one.
+Times are rebuilt arithmetically and time -> index lookups are O(1).
+'''
+
+
+class Timebase:
+
+    def __init__(self, n, seg_i, seg_t, seg_dt, exc_i=(), exc_t=(), values=None):
+        '''
+        n samples; segment k covers indices seg_i[k] .. seg_i[k+1]-1 with
+        t = seg_t[k] + (i - seg_i[k]) * seg_dt[k]; exc_i / exc_t override
+        single samples. values, if given, is an explicit fallback array.
+        '''
+
+        self.n = int(n)
+        self.seg_i = np.asarray(seg_i, dtype=np.int64)
+        self.seg_t = np.asarray(seg_t, dtype=float)
+        self.seg_dt = np.asarray(seg_dt, dtype=float)
+        self.exc_i = np.asarray(exc_i, dtype=np.int64)
+        self.exc_t = np.asarray(exc_t, dtype=float)
+        self._values = values
+
+
+    @classmethod
+    def fromSamples(cls, t, tol=None, min_run=16, max_exceptions=0.01):
+        '''
+        compress a sample-time array; tol defaults to the float rounding of
+        the grid arithmetic (2 ulp of the largest |t|), the largest error of
+        the rebuilt times. A step off by more than 1% ends a segment. Falls
+        back to storing t as is when more than max_exceptions of the samples
+        would need to be stored explicitly.
+        '''
+
+        t = np.asarray(t, dtype=float)
+        n = len(t)
+        if n < 2:
+            return cls(n, [0], t[:1], [0.0], values=t.copy())
+
+        d = np.diff(t)
+        dt = np.median(d)
+        if tol is None:
+            tol = 2 * np.spacing(np.abs(t).max())
+
+        # runs of on-grid steps; a step that is off by more than 1% ends a run
+        off = np.abs(d - dt) > 1e-2 * abs(dt)
+        starts = np.concatenate([[0], np.flatnonzero(off) + 1])
+        ends = np.concatenate([starts[1:], [n]])
+        long = (ends - starts) >= min_run
+
+        # merge consecutive short runs into their preceding long run
+        seg_i = starts[long]
+        if len(seg_i) == 0 or seg_i[0] != 0:
+            seg_i = np.concatenate([[0], seg_i])
+        seg_end = np.concatenate([seg_i[1:], [n]])
+
+        # per-segment step from the long run at its start, to follow slow drift
+        run_end = np.minimum(ends[np.searchsorted(starts, seg_i)], seg_end)
+        span = run_end - 1 - seg_i
+        seg_t = t[seg_i]
+        seg_dt = np.where(span > 0, (t[run_end - 1] - seg_t) / np.maximum(span, 1), dt)
+
+        tb = cls(n, seg_i, seg_t, seg_dt)
+        resid = t - tb.grid()
+        exc_i = np.flatnonzero(np.abs(resid) > tol)
+
+        if len(exc_i) + len(seg_i) > max_exceptions * n:
+            return cls(n, [0], t[:1], [dt], values=t.copy())
+
+        tb.exc_i = exc_i
+        tb.exc_t = t[exc_i]
+        return tb
+
+
+    def __len__(self):
+        return self.n
+
+
+    @property
+    def uniform(self):
+        return self._values is None
+
+
+    @property
+    def dt(self):
+        return float(self.seg_dt[0])
+
+
+    @property
+    def t0(self):
+        return float(self.seg_t[0])
+
+
+    def grid(self):
+        '''
+        segment grid times, without exceptions
+        '''
+        seg = np.repeat(np.arange(len(self.seg_i)), np.diff(np.concatenate([self.seg_i, [self.n]])))
+        i = np.arange(self.n)
+        return self.seg_t[seg] + (i - self.seg_i[seg]) * self.seg_dt[seg]
+
+
+    def values(self, dtype=float):
+        '''
+        full time array (newly allocated)
+        '''
+        if self._values is not None:
+            return self._values.astype(dtype, copy=True)
+
+        t = self.grid()
+        t[self.exc_i] = self.exc_t
+        return t.astype(dtype, copy=False)
+
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values(dtype or float)
+
+
+    def at(self, i):
+        '''
+        time of sample index (or indices) i
+        '''
+        i = np.asarray(i, dtype=np.int64)
+        if self._values is not None:
+            return self._values[i]
+
+        k = np.searchsorted(self.seg_i, i, side="right") - 1
+        t = self.seg_t[k] + (i - self.seg_i[k]) * self.seg_dt[k]
+
+        if len(self.exc_i):
+            j = np.clip(np.searchsorted(self.exc_i, i), 0, len(self.exc_i) - 1)
+            t = np.where(self.exc_i[j] == i, self.exc_t[j], t)
+
+        return t
+
+
+    def index(self, t):
+        '''
+        index of the sample nearest to time t (scalar or array)
+        '''
+        t = np.asarray(t, dtype=float)
+        if self._values is not None:
+            i = np.clip(np.searchsorted(self._values, t), 1, self.n - 1)
+            left = self._values[i - 1]
+            return np.where(np.abs(t - left) <= np.abs(self._values[i] - t), i - 1, i)
+
+        k = np.clip(np.searchsorted(self.seg_t, t, side="right") - 1, 0, len(self.seg_i) - 1)
+        last = np.concatenate([self.seg_i[1:], [self.n]]) - 1
+        i = np.rint((t - self.seg_t[k]) / self.seg_dt[k]).astype(np.int64) + self.seg_i[k]
+        i = np.clip(i, self.seg_i[k], last[k])
+
+        # in a gap, the first sample of the next segment may be nearer
+        nxt = np.minimum(k + 1, len(self.seg_i) - 1)
+        closer = (k + 1 < len(self.seg_i)) & (np.abs(self.seg_t[nxt] - t) < np.abs(self.at(i) - t))
+        return np.where(closer, self.seg_i[nxt], i)
+
+
+    @property
+    def nbytes(self):
+        if self._values is not None:
+            return self._values.nbytes
+        return sum(a.nbytes for a in [self.seg_i, self.seg_t, self.seg_dt, self.exc_i, self.exc_t])
@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Watch MUSE_DATA_PATH for new shot directories and run comboPlot on each
+one as soon as its files have stopped growing.
+
+Each analysis runs in its own process (matplotlib is not thread safe and a
+bad shot must not take the daemon down) on a bounded pool. Finished shots
+get a .analysis_done marker, so restarts skip them. Backlogs are worked
+newest first, so the shot just taken is never stuck behind old ones. With
+retry_failed a failed shot is run again retry_after seconds later, and
+after a restart.
+
+usage: museWatch [-d data/] [-w 2] [--settle 2] [--interval 0.5] [--retry-failed]
+'''
+
+# files that must exist and be stable before a shot is analysed
+REQUIRED = ["NIDAQtext.txt", "RFLog1.txt", "RFLog2.txt", "settings.txt"]
+
+DONE = ".analysis_done"
+
+SHOT = re.compile(r"^\d{9}$")
+
+
+class ShotWatcher:
+
+    def __init__(self, data_path,
+                       workers=2, # concurrent analyses
+                       settle=2.0, # s without growth before a shot counts as complete
+                       interval=0.5, # s between scans
+                       required=REQUIRED,
+                       retry_failed=False,
+                       retry_after=60.0, # s before a failed shot is run again
+                       command=None, # argv prefix, shot number is appended
+                       log=print,
+                 ):
+
+        self.data_path = data_path
+        self.workers = workers
+        self.settle = settle
+        self.interval = interval
+        self.required = list(required)
+        self.retry_failed = retry_failed
+        self.retry_after = retry_after
+        self.log = log
+
+        if command is None:
+            command = [sys.executable, "-m", "MuseAnalysis.comboPlot", "-t"]
+        self.command = list(command)
+
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.seen = {} # shot -> (file sizes, time they last changed)
+        self.running = {} # shot -> future
+        self.finished = set()
+        self.failed = {} # shot -> time it may be run again, with retry_failed
+
+
+    def shotPath(self, shot):
+        return os.path.join(self.data_path, shot) + "/"
+
+
+    def isDone(self, shot):
+        if shot in self.finished:
+            return True
+
+        try:
+            with open(self.shotPath(shot) + DONE) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if status.get("returncode") != 0 and self.retry_failed:
+            return False
+        self.finished.add(shot)
+        return True
+
+
+    def scan(self):
+        '''
+        shot numbers in data_path that are not yet analysed or running
+        '''
+
+        try:
+            entries = list(os.scandir(self.data_path))
+        except OSError:
+            return []
+
+        shots = []
+        for e in entries:
+            if e.is_dir() and SHOT.match(e.name) and e.name not in self.running:
+                if e.name not in self.failed and not self.isDone(e.name):
+                    shots.append(e.name)
+
+        return shots
+
+
+    def isStable(self, shot, now):
+        '''
+        True once every required file exists and none has changed size or
+        mtime for self.settle seconds
+        '''
+
+        path = self.shotPath(shot)
+        sizes = []
+        for name in self.required:
+            try:
+                st = os.stat(path + name)
+            except OSError:
+                self.seen.pop(shot, None)
+                return False
+            sizes.append((st.st_size, st.st_mtime_ns))
+
+        sizes = tuple(sizes)
+        last = self.seen.get(shot)
+        if last is None or last[0] != sizes:
+            self.seen[shot] = (sizes, now)
+            return False
+
+        return now - last[1] >= self.settle
+
+
+    def analyse(self, shot):
+        '''
+        run the analysis command for one shot and write the done marker
+        '''
+
+        env = dict(os.environ)
+        env["MUSE_DATA_PATH"] = os.path.join(self.data_path, "")
+        env.setdefault("MPLBACKEND", "Agg")
+
+        t = time.time()
+        proc = subprocess.run(self.command + [shot], env=env, capture_output=True, text=True)
+        status = dict(shot=shot,
+                      returncode=proc.returncode,
+                      started=t,
+                      seconds=time.time() - t,
+                      stderr=proc.stderr[-2000:])
+
+        with open(self.shotPath(shot) + DONE, "w") as f:
+            json.dump(status, f)
+
+        return status
+
+
+    def step(self, now=None):
+        '''
+        one scan: reap finished analyses, then submit the newest stable shots
+        while the pool has free slots
+        '''
+
+        if now is None:
+            now = time.monotonic()
+
+        for shot, future in list(self.running.items()):
+            if future.done():
+                del self.running[shot]
+                ok = False
+                try:
+                    status = future.result()
+                    ok = status["returncode"] == 0
+                    self.log(f"{shot}: done in {status['seconds']:.1f} s (rc={status['returncode']})")
+                except Exception as err:
+                    self.log(f"{shot}: failed {err!r}")
+
+                if ok or not self.retry_failed:
+                    self.finished.add(shot)
+                else:
+                    self.failed[shot] = now + self.retry_after
+
+        for shot, t in list(self.failed.items()):
+            if now >= t:
+                del self.failed[shot]
+
+        # newest first, so a backlog never delays the shot just taken
+        for shot in sorted(self.scan(), reverse=True):
+            stable = self.isStable(shot, now)
+            if stable and len(self.running) < self.workers:
+                self.seen.pop(shot, None)
+                self.running[shot] = self.pool.submit(self.analyse, shot)
+                self.log(f"{shot}: queued")
+
+
+    def run(self):
+
+        self.log(f"watching {self.data_path} with {self.workers} workers")
+        try:
+            while True:
+                self.step()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            self.log("stopping, waiting for running analyses")
+        finally:
+            self.pool.shutdown(wait=True)
+
+
+def main():
+    '''
+    Watch the data directory and run comboPlot on every new, complete shot
+    '''
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("-d", "--data", default=os.getenv("MUSE_DATA_PATH", "./"))
+    parser.add_argument("-w", "--workers", type=int, default=2)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds without file growth")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between scans")
+    parser.add_argument("--retry-failed", action="store_true")
+    parser.add_argument("--retry-after", type=float, default=60.0, help="seconds before a failed shot is run again")
+    args = parser.parse_args()
+
+    watcher = ShotWatcher(args.data,
+                          workers=args.workers,
+                          settle=args.settle,
+                          interval=args.interval,
+                          retry_failed=args.retry_failed,
+                          retry_after=args.retry_after)
+    watcher.run()
+
+
+if __name__ == "__main__":
+    main()
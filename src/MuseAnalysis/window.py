@@ -0,0 +1,168 @@
+import numpy as np
+
+'''
+Detection of the plasma-on window of a shot.
+
+RF forward power, pressure and the (first) probe current swing all step
+up while the plasma is on. Each is smoothed, scaled to 0 (baseline) .. 1
+(plateau) and put on the probe time axis; their mean is thresholded and
+the longest run above threshold is the window. The change points are where
+that run starts and ends. Everything is a few vectorized passes, O(N).
+
+usage: python -m MuseAnalysis.window data/231223001/ data/231223002.muse ...
+'''
+
+# crop used before detection existed, and when nothing is detected
+DEFAULT = (2.2, 6.8)
+
+
+def smooth(x, n):
+    '''
+    centred moving average over n samples along the last axis (edges shrink)
+    '''
+    n = max(int(n), 1)
+    c = np.cumsum(np.pad(x, [(0, 0)] * (x.ndim - 1) + [(1, 0)]), axis=-1)
+    N = x.shape[-1]
+    i = np.arange(N)
+    lo = np.clip(i - n // 2, 0, N)
+    hi = np.clip(i + (n + 1) // 2, 0, N)
+    return (c[..., hi] - c[..., lo]) / (hi - lo)
+
+
+def noiseLevel(x):
+    '''
+    robust white-noise sigma from the point to point differences
+    '''
+    d = np.diff(x, axis=-1)
+    mad = np.median(np.abs(d - np.median(d, axis=-1, keepdims=True)), axis=-1)
+    return 1.4826 * mad / np.sqrt(2)
+
+
+def scale(S, sigma, contrast=10.0):
+    '''
+    rows of S mapped to 0 .. 1 between their 1st and 99th percentiles;
+    rows whose step is not contrast times above their noise sigma become NaN
+    '''
+    lo, hi = np.percentile(S, [1, 99], axis=-1, keepdims=True)
+    ok = (hi - lo)[..., 0] > contrast * sigma
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.clip((S - lo) / (hi - lo), 0, 1)
+    out[~ok] = np.nan
+    return out
+
+
+def longestRun(mask):
+    '''
+    (start, stop) indices of the longest run of True, None if there is none
+    '''
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return None
+
+    k = np.argmax(stops - starts)
+    return starts[k], stops[k]
+
+
+def plasmaWindow(probe, rf=None,
+                 width=0.2, # s smoothing, at least one bias sweep period
+                 threshold=0.5, # fraction of the baseline to plateau step
+                 margin=0.2, # s trimmed inside each change point
+                 ):
+    '''
+    (t0, t1) in seconds from the first probe sample (as DoubleProbe.time)
+    where the plasma is on, or None if no signal shows a clear step.
+    rf is an RFpower, a list of them (forward powers are summed), or None.
+    '''
+
+    t = probe.unix_time
+    dt = probe.timebase.dt
+    n = max(int(round(width / dt)), 1) if dt > 0 else 1
+
+    # pressure is a level, the shunt current a swing around its off level
+    _, I = probe.probeVI()
+    rows = [np.abs(I - np.median(I))]
+    if "pressure" in probe.channels.channels:
+        rows.insert(0, probe.signal("pressure"))
+
+    if rf is not None:
+        rfs = rf if isinstance(rf, (list, tuple)) else [rf]
+        P = sum(np.interp(t, r.t_fwd_abs, r.P_fwd, left=0, right=0) for r in rfs)
+        rows.append(P)
+
+    X = np.vstack(rows).astype(float)
+    S = scale(smooth(X, n), noiseLevel(X) / np.sqrt(n))
+    used = ~np.isnan(S[:, 0])
+    if not used.any():
+        return None
+
+    score = S[used].mean(axis=0)
+    run = longestRun(score > threshold)
+    if run is None:
+        return None
+
+    i0, i1 = run
+    t0 = t[i0] - t[0] + margin
+    t1 = t[i1 - 1] - t[0] - margin
+    if t1 <= t0:
+        return None
+    return float(t0), float(t1)
+
+
+def shotWindow(path, **kwargs):
+    '''
+    load the probe and RF logs of one shot (directory or .muse archive)
+    and detect its window; returns a dict for batch tables
+    '''
+    import os
+
+    from .DoubleProbe import DoubleProbe
+    from .RF import RFpower
+    from .archive import isArchive
+
+    if isArchive(path):
+        probe_file = path
+        rf_files = [f"{path}:RFLog1", f"{path}:RFLog2"]
+    else:
+        path = os.path.join(path, "")
+        probe_file = path + "NIDAQtext.txt"
+        rf_files = [path + "RFLog1.txt", path + "RFLog2.txt"]
+
+    probe = DoubleProbe(probe_file)
+    rfs = []
+    for fin in rf_files:
+        try:
+            rfs.append(RFpower(fin))
+        except (OSError, KeyError, ValueError):
+            continue
+
+    window = plasmaWindow(probe, rfs or None, **kwargs)
+    return dict(shot=str(path).rstrip("/"),
+                t0=None if window is None else window[0],
+                t1=None if window is None else window[1],
+                n_rf=len(rfs))
+
+
+def main():
+    '''
+    Detect the plasma-on window of each shot, one JSON line per shot
+    '''
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("shots", nargs="+", help="shot directories or .muse archives")
+    parser.add_argument("--width", type=float, default=0.2, help="s smoothing")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--margin", type=float, default=0.2, help="s trimmed inside the window")
+    args = parser.parse_args()
+
+    for shot in args.shots:
+        print(json.dumps(shotWindow(shot, width=args.width, threshold=args.threshold,
+                                    margin=args.margin)))
+
+
+if __name__ == "__main__":
+    main()
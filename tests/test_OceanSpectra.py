@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis.OceanSpectra import OceanSpectra
+
+
+@pytest.fixture
+def fin(tmp_path):
+    from MuseAnalysis.synthetic import writeSpectra
+
+    fout = str(tmp_path / "spec_231223001.txt")
+    writeSpectra(fout, duration=4, N_pixels=512)
+    return fout
+
+
+def saturate(spec):
+    # a line at full scale in the middle of the shot
+    spec.data[80:120, 300:303] = 65535
+    return spec
+
+
+def test_saturation_independent_of_dark(fin):
+    first = saturate(OceanSpectra(fin))
+    first.rejectArtifacts()
+    first.subtractDark()
+
+    second = saturate(OceanSpectra(fin))
+    second.subtractDark()
+    second.rejectArtifacts()
+
+    assert first.artifacts["saturated"] == 120
+    assert np.array_equal(first.mask, second.mask)
+    assert first.artifacts == second.artifacts
+    assert np.allclose(first.data, second.data)
+
+
+def test_no_raw_counts_after_continuum(fin):
+    spec = OceanSpectra(fin)
+    spec.subtractContinuum()
+    with pytest.raises(ValueError):
+        spec.rejectArtifacts()
+
+
+def test_subtract_dark(fin, tmp_path):
+    from MuseAnalysis.synthetic import writeSpectra
+
+    spec = OceanSpectra(fin)
+    raw = spec.data.copy()
+    spec.subtractDark()
+    pre = spec.time_axis < spec.plasmaStart() - 100
+    assert abs(spec.data[pre].mean()) < 1e-9
+    assert np.allclose(spec.data + spec.dark, raw)
+
+    # a dark file, the same as an array
+    dark = str(tmp_path / "dark.txt")
+    writeSpectra(dark, duration=1, N_pixels=512, lines={}, seed=5)
+    a, b = OceanSpectra(fin), OceanSpectra(fin)
+    a.subtractDark(dark)
+    b.subtractDark(OceanSpectra(dark).data.mean(axis=0))
+    assert np.array_equal(a.data, b.data)
+
+
+def test_subtract_continuum_keeps_lines(fin):
+    spec = OceanSpectra(fin)
+    ax = spec.spectral_axis
+    slope = 2000 + 3 * (ax - 600) # a broadband continuum
+    spec.data = spec.data + slope
+    spec.subtractDark(np.full(len(ax), 1000.0))
+    spec.subtractContinuum(order=3)
+
+    far = np.ones(len(ax), bool)
+    for line in [656.279, 486.135, 434.0462]:
+        far &= np.abs(ax - line) > 5
+    assert abs(spec.data[:, far].mean()) < 1
+    j = np.argmin(np.abs(ax - 656.279))
+    assert spec.data[:, j].max() > 1000
+    assert spec.continuum.shape == (len(spec.data), 4)
+
+
+def test_cosmic_rays_repaired(fin):
+    spec = OceanSpectra(fin)
+    clean = spec.data.copy()
+    rng = np.random.default_rng(4)
+    rows = rng.choice(len(clean), 12, replace=False)
+    cols = rng.choice(np.arange(20, 480), 12, replace=False)
+    spec.data[rows, cols] += 20000
+
+    out = spec.rejectArtifacts()
+    assert out == dict(spikes=12, saturated=0)
+    # replaced by the time median, back within the noise
+    assert np.all(np.abs(spec.data[rows, cols] - clean[rows, cols]) < 500)
+    # the lines, bright and turning on with the plasma, are not spikes
+    others = np.ones(clean.shape, bool)
+    others[rows, cols] = False
+    assert np.array_equal(spec.data[others], clean[others])
+
+
+def test_find_peak_masks_saturation(fin):
+    spec = saturate(OceanSpectra(fin))
+    spec.rejectArtifacts()
+    spec.findPeak(spec.spectral_axis[301])
+    line = spec.lines[-1]
+    assert line.mask[80:120].all() and not line.mask[:80].any()
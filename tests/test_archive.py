@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from MuseAnalysis import archive
+
+
+@pytest.fixture
+def shot(tmp_path, monkeypatch):
+    # small chunks, so ranges cross chunk boundaries
+    from MuseAnalysis.synthetic import makeShot
+
+    monkeypatch.setattr(archive, "CHUNK", 512)
+    path = makeShot(str(tmp_path / "data"), "231223001", duration=4, daq_rate=500)
+    return archive.ShotArchive(archive.exportShot(path))
+
+
+@pytest.mark.parametrize("i0, i1", [(0, None), (100, 1500), (511, 513), (1024, 1024), (1900, 5000)])
+def test_channel_range(shot, i0, i1):
+    full = shot.channel("AI3")
+    assert np.array_equal(shot.channel("AI3", i0, i1), full[i0:i1])
+
+
+@pytest.mark.parametrize("i0", [2000, 2048, 10_000])
+def test_range_past_the_end_is_empty(shot, i0):
+    n = shot.meta["nidaq"]["n"]
+    assert n == 2000
+
+    out = shot.channel("AI3", i0)
+    assert out.shape == (0,) and out.dtype == shot.channel("AI3").dtype
+    assert shot.nidaq(i0).shape == (0, len(shot.meta["nidaq"]["columns"]))
+
+    m = shot.meta["spectra"]
+    assert shot.spectra(m["n"] + i0).shape == (0, len(shot.read("spectra/spectral_axis.npy")))
+
+
+def test_unpack_round_trip(shot, tmp_path):
+    # the text files written back read as the originals
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.RF import RFpower
+
+    src = str(tmp_path / "data" / "231223001") + "/"
+    out = str(tmp_path / "unpacked") + "/"
+    archive.unpackShot(shot.fname, out)
+
+    a, b = DoubleProbe(src + "NIDAQtext.txt"), DoubleProbe(out + "NIDAQtext.txt")
+    for name in a.channels.columns[1:]:
+        assert np.array_equal(a.raw[name], b.raw[name])
+    assert np.array_equal(RFpower(src + "RFLog2.txt").data, RFpower(out + "RFLog2.txt").data)
+    assert archive.readSettings(out + "settings.txt") == archive.readSettings(src + "settings.txt")
+
+    # and the archive itself reads with the same classes
+    assert np.array_equal(DoubleProbe(shot.fname).raw["AI3"], a.raw["AI3"])
+    assert np.array_equal(RFpower(shot.fname + ":RFLog2").data, RFpower(src + "RFLog2.txt").data)
+
+
+@pytest.fixture
+def spec(tmp_path):
+    from MuseAnalysis.OceanSpectra import OceanSpectra
+    from MuseAnalysis.synthetic import writeSpectra
+
+    fout = str(tmp_path / "spec_231223001.txt")
+    writeSpectra(fout, duration=10, N_pixels=512)
+    return OceanSpectra(fout)
+
+
+def test_spectra_lossless_and_smaller(spec, tmp_path):
+    from MuseAnalysis.OceanSpectra import OceanSpectra
+
+    fout = str(tmp_path / "spec.muse")
+    spec.save(fout)
+    back = OceanSpectra(fout)
+
+    assert np.array_equal(back.data, spec.data)
+    assert np.array_equal(back.unix_time, spec.unix_time)
+    assert np.array_equal(back.spectral_axis, spec.spectral_axis)
+    assert os.path.getsize(fout) < os.path.getsize(spec.fname) / 3
+
+    with archive.ShotArchive(fout) as ar:
+        m = ar.meta["spectra"]
+        assert not m["quantized"]
+        assert m["chunks"] == 2 and set(m["encoding"]) <= {"raw", "delta"}
+        # chunks decode on their own
+        assert np.array_equal(ar.spectra(250, 300), spec.data[250:300])
+
+
+def test_delta_encoding_for_slow_spectra(spec, tmp_path):
+    # a steady signal differences to small integers
+    spec.data = np.cumsum(np.ones_like(spec.data), axis=0) * 1000 + spec.data[0]
+    fout = str(tmp_path / "steady.muse")
+    spec.save(fout)
+
+    with archive.ShotArchive(fout) as ar:
+        assert ar.meta["spectra"]["encoding"] == ["delta", "delta"]
+        assert np.array_equal(ar.spectra(), spec.data)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis.bootstrap import bootstrapIV, resampleResiduals
+from MuseAnalysis.DoubleProbe import IV_tanh
+from MuseAnalysis.ivfit import fitBatch
+
+
+def curve(seed=0, Te=5.0, Isat=2.0, offset=0.1, noise=0.05, N=2000):
+    rng = np.random.default_rng(seed)
+    V = np.linspace(-40, 40, N)
+    return V, IV_tanh(V, Te, Isat, offset) + noise * rng.standard_normal(N)
+
+
+def test_fit_batch_matches_curve_fit():
+    from scipy.optimize import curve_fit
+
+    curves = [curve(seed, Te=3 + seed) for seed in range(4)]
+    V = curves[0][0]
+    Y = np.stack([I for V, I in curves])
+    P = fitBatch(V, Y, (4.0, 1.0, 0.0))
+    for I, p in zip(Y, P):
+        ref, _ = curve_fit(IV_tanh, V, I, p0=(4.0, 1.0, 0.0))
+        assert p == pytest.approx(ref, rel=1e-6)
+
+
+def test_resample_residuals():
+    resid = np.arange(100.0)
+    R = resampleResiduals(resid, 50, rng=0)
+    assert R.shape == (50, 100) and np.isin(R, resid).all()
+
+    # blocks are runs of consecutive residuals
+    R = resampleResiduals(resid, 50, block=10, rng=0)
+    assert R.shape == (50, 100)
+    assert np.all(np.diff(R.reshape(50, 10, 10), axis=2) == 1)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_interval_width(workers):
+    V, I = curve()
+    param = fitBatch(V, I[None], (4.0, 1.0, 0.0))[0]
+    out = bootstrapIV(V, I, param, n_boot=400, workers=workers, seed=1)
+
+    # around the fit, as wide as the least-squares standard errors say
+    from scipy.optimize import curve_fit
+    _, cov = curve_fit(IV_tanh, V, I, p0=param)
+    for k, key in enumerate(["Te", "Isat"]):
+        lo, hi = out[key]
+        assert lo < param[k] < hi
+        assert hi - lo == pytest.approx(2 * 1.96 * np.sqrt(cov[k, k]), rel=0.25)
+    assert len(out["samples"]["Te"]) == 400
+
+    again = bootstrapIV(V, I, param, n_boot=400, workers=workers, seed=1)
+    assert np.array_equal(again["samples"]["Te"], out["samples"]["Te"])
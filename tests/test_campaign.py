@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis import campaign
+
+
+@pytest.fixture
+def x():
+    rng = np.random.default_rng(3)
+    return np.concatenate([rng.lognormal(1, 1, 5000), -rng.lognormal(0, 0.5, 1000), np.zeros(10)])
+
+
+def test_summary_matches_numpy(x):
+    s = campaign.Summary(bins=np.linspace(-5, 20, 26))
+    for part in np.array_split(x, 7):
+        s.add(part)
+    s.add([np.nan, np.inf])
+
+    assert s.n == len(x)
+    assert s.mean == pytest.approx(x.mean())
+    assert s.variance == pytest.approx(x.var(ddof=1))
+    assert (s.min, s.max) == (x.min(), x.max())
+    assert s.hist.tolist() == np.histogram(x, s.bins)[0].tolist()
+    for q in [0.01, 0.1, 0.5, 0.9, 0.99]:
+        assert s.sketch.quantile(q) == pytest.approx(np.quantile(x, q, method="lower"), rel=0.011)
+
+
+def test_merge_is_exact(x):
+    whole = campaign.Summary(bins=np.linspace(-5, 20, 26))
+    whole.add(x)
+    a, b = campaign.Summary(bins=whole.bins), campaign.Summary(bins=whole.bins)
+    a.add(x[:100])
+    b.add(x[100:])
+    merged = a.merge(b).result()
+    for key, val in whole.result().items():
+        assert merged[key] == pytest.approx(val), key
+
+    with pytest.raises(ValueError):
+        campaign.Summary(bins=[0, 1]).merge(campaign.Summary(bins=[0, 2]))
+    assert np.isnan(campaign.QuantileSketch().quantile(0.5))
+
+
+def test_campaign_over_shots(tmp_path):
+    from MuseAnalysis.synthetic import makeShot
+
+    paths = [makeShot(str(tmp_path), f"23122300{k}", duration=6, daq_rate=500, seed=k) for k in (1, 2, 3)]
+    missing = str(tmp_path / "231223009")
+    res = campaign.aggregate(paths + [missing]).result()
+    # a shot without diagnostics adds nothing, but is not a failure
+    assert (res["n_shots"], res["failed"]) == (4, [])
+    Te = res["quantities"]["Te"]
+    assert Te["count"] == 3 and "hist" in Te
+    assert 0 < res["quantities"]["rf_reflected_fraction"]["mean"] < 0.2
+
+    # the same campaign split in two and merged
+    parts = campaign.aggregate(paths[:1]).merge(campaign.aggregate(paths[1:]))
+    assert parts.result()["quantities"]["Te"] == pytest.approx(Te)
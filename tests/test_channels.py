@@ -0,0 +1,42 @@
+import pytest
+
+from MuseAnalysis.channels import BIAS_BOX, ChannelMap, resolve, shotNumber
+
+
+def test_default_gains_by_shot():
+    new = ChannelMap.default(231223001)
+    old = ChannelMap.default(231219001)
+    assert new.toDict() == ChannelMap.default().toDict()
+    assert old.gain("bias") == 10
+    assert old.gain("shunt") == pytest.approx(97.8757/5)
+
+
+def test_shot_number():
+    assert shotNumber("data/231219001/NIDAQtext.txt") == 231219001
+    assert shotNumber("data/231219001.muse") == 231219001
+    assert shotNumber("data/test/NIDAQtext.txt") is None
+
+
+def test_stored_default_map_is_rebuilt():
+    # an archive of an old shot written with the default gains
+    stored = ChannelMap.default().toDict()
+    assert resolve(None, "data/231219001.muse", stored).gain("bias") == 10
+
+    # any other stored map is kept as written
+    stored["channels"]["bias"]["gain"] = 5
+    assert resolve(None, "data/231219001.muse", stored).gain("bias") == 5
+
+
+def test_campaign_uses_old_gains(tmp_path):
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.campaign import shotValues
+    from MuseAnalysis.comboPlot import analyseProbe, loadProbe, loadRF
+    from MuseAnalysis.synthetic import makeShot
+
+    shot = str(BIAS_BOX - 3000 + 1)
+    path = makeShot(str(tmp_path / "data"), shot, duration=4, daq_rate=500)
+    probe = loadProbe(shot, path)
+    assert probe.V_factor == 10
+
+    fit = analyseProbe(probe, loadRF(path + "RFLog1.txt"), loadRF(path + "RFLog2.txt"))["fit"]
+    assert shotValues(path)["Te"] == pytest.approx(fit["Te"], rel=1e-6)
@@ -0,0 +1,46 @@
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+
+from MuseAnalysis import comboPlot, figures
+
+
+def test_render_without_fit(tmp_path, monkeypatch):
+    # a failed I-V fit still gives the raw and time plots
+    from MuseAnalysis.synthetic import makeShot
+
+    shot = "231223001"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(figures, "mode", "close")
+    path = makeShot("data", shot, duration=4, daq_rate=500)
+
+    rf1 = comboPlot.loadRF(path + "RFLog1.txt")
+    rf2 = comboPlot.loadRF(path + "RFLog2.txt")
+    probe = comboPlot.loadProbe(shot, path)
+    spec = comboPlot.loadSpectra(shot)
+
+    drawn = comboPlot.renderShot(shot, path, "close", rf1, rf2, probe, spec, None)
+    comboPlot.saveShot(drawn)
+
+    assert os.path.exists(path + "plotTime.png")
+    assert os.path.exists(path + "plotRaw.png")
+    assert not os.path.exists(path + "plotIV.png")
+
+
+def test_run_after_pipeline_writes(tmp_path, monkeypatch):
+    # the pipeline's deferred saves end with it
+    from MuseAnalysis.synthetic import makeShot
+
+    shots = ["231223001", "231223002"]
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(figures, "mode", "close")
+    for k, shot in enumerate(shots):
+        makeShot("data", shot, duration=4, daq_rate=500, seed=k)
+
+    assert comboPlot.pipeline(shots[:1], "data/", dict(compute=1)) == {}
+    assert os.path.exists("data/231223001/plotTime.png")
+    assert (figures.mode, figures.defer) == ("close", False)
+
+    comboPlot.run(shots[1], "data/")
+    assert os.path.exists("data/231223002/plotTime.png")
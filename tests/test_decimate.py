@@ -0,0 +1,65 @@
+import numpy as np
+
+from MuseAnalysis.decimate import minmax
+
+
+def test_masked_spike_is_dropped():
+    y = np.ma.masked_array(np.sin(np.linspace(0, 20, 10_000)))
+    y[5000] = 1e9
+    y[5000] = np.ma.masked
+
+    x, yd = minmax(None, y, 100)
+    assert len(yd) <= 202
+    assert np.nanmax(yd) <= 1
+    assert np.nanmin(yd) >= -1
+
+
+def test_all_masked_bin_is_a_gap():
+    y = np.ma.masked_array(np.arange(1000.0), mask=np.zeros(1000, bool))
+    y[:100] = np.ma.masked
+
+    x, yd = minmax(np.arange(1000), y, 10)
+    assert np.isnan(yd[1:3]).all()
+    assert np.nanmin(yd) == 100
+    assert yd[-1] == 999
+
+
+def test_unmasked_unchanged():
+    y = np.random.default_rng(0).standard_normal(10_000)
+    x, yd = minmax(None, y, 50)
+    assert yd.max() == y.max()
+    assert yd.min() == y.min()
+
+
+def test_envelope_per_bin_in_time_order():
+    y = np.random.default_rng(1).standard_normal(10_000)
+    x = np.linspace(0, 1, len(y))
+    xd, yd = minmax(x, y, 100)
+
+    assert len(yd) == 202 and (xd[0], xd[-1]) == (x[0], x[-1])
+    assert np.all(np.diff(xd) >= 0)
+    bins = y.reshape(100, 100)
+    inner = yd[1:-1].reshape(100, 2)
+    assert np.array_equal(np.sort(inner, axis=1), np.stack([bins.min(1), bins.max(1)], 1))
+
+
+def test_spike_survives_and_short_series_pass_through():
+    y = np.zeros(1_000_001)
+    y[123_457] = 5.0
+    x, yd = minmax(None, y, 500)
+    assert yd.max() == 5.0 and x[yd.argmax()] == 123_457
+
+    short = np.arange(100.0)
+    x, yd = minmax(None, short, 50)
+    assert yd is short or np.array_equal(yd, short)
+
+
+def test_max_columns():
+    from MuseAnalysis.decimate import maxColumns
+
+    Z = np.zeros((1000, 3))
+    Z[501, 1] = 7.0
+    x, Zd = maxColumns(np.arange(1000.0), Z, 100)
+    assert Zd.shape == (100, 3)
+    assert Zd[50, 1] == 7.0 and Zd.sum() == 7.0
+    assert x[0] == 4.5
@@ -0,0 +1,85 @@
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from MuseAnalysis import figures
+
+
+@pytest.fixture
+def mode(monkeypatch):
+    def set(name):
+        monkeypatch.setattr(figures, "mode", name)
+    yield set
+    figures.release()
+    plt.close("all")
+
+
+def layout():
+    return plt.subplots(2)
+
+
+def test_reuse_keeps_figure_and_lines(mode):
+    mode("reuse")
+    fig, (ax, _), fresh = figures.figure("test", layout)
+    assert fresh
+    ln = figures.line(ax, "a", None, np.arange(5.0), label="one", decimated=False)
+    leg = figures.legend(ax)
+
+    again, (ax2, _), fresh = figures.figure("test", layout)
+    assert again is fig and ax2 is ax and not fresh
+    assert figures.line(ax, "a", None, np.arange(50.0), label="two", decimated=False) is ln
+    assert len(ax.lines) == 1 and len(ln.get_ydata()) == 50
+    assert ax.get_ylim()[1] >= 49
+    assert figures.legend(ax) is leg and leg.get_texts()[0].get_text() == "two"
+
+    figures.blank(ax, "a")
+    assert len(ln.get_xdata()) == 0
+
+    # a template closed elsewhere is rebuilt
+    plt.close(fig)
+    assert figures.figure("test", layout)[0] is not fig
+
+
+def test_keep_and_close(mode, tmp_path):
+    mode("keep")
+    a = figures.figure("test", layout)[0]
+    assert figures.figure("test", layout)[0] is not a
+
+    mode("close")
+    fig = figures.figure("test", layout)[0]
+    figures.save(fig, str(tmp_path / "a.png"))
+    assert (tmp_path / "a.png").exists()
+    assert not plt.fignum_exists(fig.number)
+    figures.finish()
+    assert plt.get_fignums() == []
+
+
+def test_deferred_matches_savefig(mode, monkeypatch, tmp_path):
+    mode("keep")
+    fig = figures.figure("test", layout)[0]
+    fig.axes[0].plot(np.sin(np.arange(100)))
+    figures.save(fig, str(tmp_path / "direct.png"))
+
+    monkeypatch.setattr(figures, "defer", True)
+    figures.save(fig, str(tmp_path / "deferred.png"))
+    assert not (tmp_path / "deferred.png").exists()
+    (item,) = figures.queued()
+    assert figures.queued() == []
+    figures.write(*item)
+    assert np.array_equal(plt.imread(tmp_path / "direct.png"), plt.imread(tmp_path / "deferred.png"))
+
+
+def test_plotRF_reuses_template(mode, tmp_path):
+    from MuseAnalysis.RF import RFpower
+    from MuseAnalysis.synthetic import makeShot
+
+    mode("reuse")
+    figs = []
+    for shot, duration in [("231223001", 10), ("231223002", 6)]:
+        path = makeShot(str(tmp_path), shot, duration=duration, daq_rate=100)
+        figs.append(RFpower(path + "RFLog1.txt").plotRF(save=str(tmp_path / f"{shot}.png")))
+    assert figs[0] is figs[1]
+    assert len(figs[1].axes[0].lines) == 2
+    assert figs[1].axes[0].get_xlim()[1] < 7
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis import fluctuation
+
+
+@pytest.fixture
+def noise():
+    fs = 10000.0
+    t = np.arange(40000) / fs
+    x = np.sin(2 * np.pi * 1250 * t) + 0.1 * np.random.default_rng(2).standard_normal(len(t))
+    return x, fs
+
+
+def test_welch_matches_scipy(noise):
+    signal = pytest.importorskip("scipy.signal")
+    x, fs = noise
+    f, P = fluctuation.welch(x, fs, nperseg=256, chunk=7)
+    f_ref, P_ref = signal.welch(x, fs, nperseg=256)
+    assert np.allclose(f, f_ref)
+    assert np.allclose(P, P_ref)
+    assert f[np.argmax(P)] == pytest.approx(1250, abs=fs / 256)
+
+
+def test_spectrogram_chunks_and_average(noise):
+    x, fs = noise
+    times, freqs, S = fluctuation.spectrogram(x, fs, nperseg=256, average=4)
+    _, _, S_small = fluctuation.spectrogram(x, fs, nperseg=256, average=4, chunk=5)
+    assert np.allclose(S, S_small)
+
+    # 311 segments of 256 with 128 overlap, in columns of 4
+    assert S.shape == (311 // 4, 129)
+    assert np.allclose(np.diff(times), 4 * 128 / fs)
+    assert times[0] == pytest.approx((3 * 128 + 256) // 2 / fs)
+
+    # the mean of the columns is the Welch PSD of the segments they cover
+    _, P = fluctuation.welch(x[:(311 // 4 * 4 - 1) * 128 + 256], fs, nperseg=256)
+    assert np.allclose(S.mean(axis=0), P)
+
+
+def test_short_record():
+    with pytest.raises(ValueError):
+        fluctuation.welch(np.zeros(100), 1.0, nperseg=256)
+    with pytest.raises(ValueError):
+        fluctuation.spectrogram(np.zeros(300), 1.0, nperseg=256, average=4)
+
+
+def test_probe_fluctuations(tmp_path):
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.synthetic import makeShot
+
+    path = makeShot(str(tmp_path), "231223001", duration=5, daq_rate=1000)
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    res = probe.fluctuations("AI1", nperseg=128, average=2)
+    assert res["S"].shape[1] == len(res["freqs"]) == len(res["psd"]) == 65
+    # column times are on the probe's unix_time clock
+    assert probe.unix_time[0] < res["times"][0] < res["times"][-1] < probe.unix_time[-1]
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from MuseAnalysis import instrument
+
+
+@pytest.fixture
+def log(tmp_path):
+    fout = tmp_path / "log.jsonl"
+    instrument.enable(str(fout))
+    yield fout
+    instrument.disable()
+    tracemalloc.stop() # slows every later test
+
+
+def records(fout):
+    with open(fout) as f:
+        return {rec["stage"]: rec for rec in map(json.loads, f)}
+
+
+def test_overlapping_stages_on_threads(log):
+    # a opens, b opens, a closes, b closes: each keeps its own peak
+    opened, closed = threading.Event(), threading.Event()
+    a_done = threading.Event()
+
+    def a():
+        with instrument.stage("a"):
+            x = np.ones(5_000_000) # 40 MB, freed before b starts
+            del x
+            opened.set()
+            closed.wait()
+        a_done.set()
+
+    def b():
+        opened.wait()
+        with instrument.stage("b"):
+            closed.set()
+            a_done.wait()
+
+    threads = [threading.Thread(target=a), threading.Thread(target=b)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    rec = records(log)
+    assert rec["a"]["peak_mb"] > 39
+    assert rec["b"]["peak_mb"] < 1
+
+
+def test_workers_inherit_the_log(log):
+    assert os.environ["MUSE_INSTRUMENT"] == str(log)
+
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(instrument.__file__) + "/..")
+    code = "from MuseAnalysis.instrument import stage\nwith stage('child'): pass"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+    rec = records(log)["child"]
+    assert rec["pid"] != os.getpid() and "peak_mb" in rec
+
+    instrument.disable()
+    assert "MUSE_INSTRUMENT" not in os.environ
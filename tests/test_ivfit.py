@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis import ivfit
+from MuseAnalysis.DoubleProbe import IV_tanh
+
+
+def test_batch_matches_curve_fit():
+    optimize = pytest.importorskip("scipy.optimize")
+    rng = np.random.default_rng(4)
+    V = np.linspace(-60, 60, 400)
+    truth = np.array([[5.0, 0.5, 0.01], [12.0, 1.5, -0.05], [25.0, 0.2, 0.0]])
+    Y = np.stack([IV_tanh(V, *p) + 0.02 * rng.standard_normal(len(V)) for p in truth])
+
+    P, err = ivfit.fitIV(V, Y)
+    for y, p, e in zip(Y, P, err):
+        ref, cov = optimize.curve_fit(IV_tanh, V, y, p0=[10, 1, 0])
+        assert p == pytest.approx(ref, rel=1e-4, abs=1e-6)
+        assert e == pytest.approx(np.sqrt(np.diag(cov)), rel=1e-3)
+
+
+def test_fit_probes(tmp_path):
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.synthetic import makeShot
+
+    path = makeShot(str(tmp_path), "231223001", duration=6, daq_rate=1000, probes=3)
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    probe.plasmaWindow()
+    fits = probe.fitProbes()
+    assert list(fits) == ["probe", "probe2", "probe3"]
+
+    # each extra probe is 20 % hotter
+    Te = np.array([fits[name]["Te"] for name in fits])
+    assert Te / Te[0] == pytest.approx([1, 1.2, 1.4], rel=0.05)
+    assert all(f["ne"] > 0 and f["dTe"] < 0.1 * f["Te"] for f in fits.values())
+
+    # the first probe agrees with the single curve_fit of plotIV
+    probe.plotIV(plot=False)
+    assert fits["probe"]["Te"] == pytest.approx(probe.fit["Te"], rel=1e-3)
+    assert probe.fitProbes(["probe2"]).keys() == {"probe2"}
@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+import pytest
+
+from MuseAnalysis import lag
+
+
+def pulse(t, t0):
+    return np.exp(-0.5 * ((t - t0) / 0.2)**2)
+
+
+def test_known_delay():
+    # the second signal follows the first by 0.137 s, off the 0.01 s grid
+    t = np.arange(0, 10, 0.001) + 3e9
+    signals = {"a": (t, pulse(t, 3e9 + 4)), "b": (t, pulse(t, 3e9 + 4.137))}
+    (row,) = lag.lagTable(signals, dt=0.01, max_lag=1.0, shot="x")
+    assert (row["a"], row["b"]) == ("a", "b")
+    assert row["lag_s"] == pytest.approx(0.137, abs=2e-3)
+    assert row["r"] == pytest.approx(1, abs=5e-3)
+
+
+def test_xcorr_matches_direct():
+    rng = np.random.default_rng(1)
+    Y = rng.standard_normal((2, 50))
+    r = lag.xcorr(Y)[0, 1]
+    Z = Y - Y.mean(axis=1, keepdims=True)
+    direct = np.correlate(Z[1], Z[0], "full") / (50 * Z[0].std() * Z[1].std())
+    assert np.allclose(r, direct)
+
+
+def test_max_lag_and_overlap():
+    r = np.zeros(21)
+    r[0] = 1.0 # lag -10 samples
+    r[12] = 0.5 # lag +2 samples
+    assert lag.peakLag(r, 0.1)[0] == pytest.approx(-1.0)
+    assert lag.peakLag(r, 0.1, max_lag=0.5) == (pytest.approx(0.2), 0.5)
+
+    t = np.arange(5.0)
+    with pytest.raises(ValueError):
+        lag.commonGrid({"a": (t, t), "b": (t + 10, t)}, 0.1)
+
+
+def test_shot_lags(tmp_path):
+    from MuseAnalysis.synthetic import makeShot
+
+    path = makeShot(str(tmp_path), "231223001", duration=10, daq_rate=1000)
+    rows = lag.shotLags(path)
+    names = {row["a"] for row in rows} | {row["b"] for row in rows}
+    assert {"rf_fwd", "656.279nm", "probe_I"} <= names
+    # every diagnostic switches on with the same plasma
+    assert all(abs(row["lag_s"]) < 0.5 for row in rows)
+
+    f = io.StringIO()
+    lag.writeTable(rows, f)
+    assert f.getvalue().splitlines()[0] == ",".join(lag.FIELDS)
+    assert len(f.getvalue().splitlines()) == len(rows) + 1
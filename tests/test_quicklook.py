@@ -0,0 +1,20 @@
+import pytest
+
+from MuseAnalysis.channels import BIAS_BOX
+
+
+@pytest.mark.parametrize("shot", [str(BIAS_BOX - 3000 + 1), str(BIAS_BOX + 1001)])
+@pytest.mark.parametrize("archived", [False, True])
+def test_summary_matches_comboPlot(tmp_path, shot, archived):
+    # the same bias box gains as comboPlot, before and after the change
+    from MuseAnalysis.archive import exportShot
+    from MuseAnalysis.comboPlot import analyseProbe, loadProbe, loadRF
+    from MuseAnalysis.quicklook import summary
+    from MuseAnalysis.synthetic import makeShot
+
+    path = makeShot(str(tmp_path / "data"), shot, duration=4, daq_rate=500)
+    fit = analyseProbe(loadProbe(shot, path), loadRF(path + "RFLog1.txt"), loadRF(path + "RFLog2.txt"))["fit"]
+
+    out = summary(exportShot(path) if archived else path)
+    for key in ["Te", "Isat", "ne"]:
+        assert out[key] == pytest.approx(fit[key], rel=1e-4)
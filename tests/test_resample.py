@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis.resample import resample
+
+
+def test_rebin_flat_past_source_edges():
+    # a flat spectrum stays flat in target bins only partly covered
+    src = np.linspace(400, 700, 2048)
+    tgt = np.arange(395, 711, 5.0)
+    out = resample(np.full((2, len(src)), 160000.0), src, tgt, method="rebin")
+
+    covered = (tgt + 2.5 > src[0]) & (tgt - 2.5 < src[-1])
+    assert out[:, covered] == pytest.approx(160000.0)
+    assert np.all(out[:, ~covered] == 0)
+
+
+def test_rebin_descending_axis():
+    # the mean of a linear spectrum over a bin is its value at the centre
+    src = np.linspace(700, 400, 1000)
+    tgt = np.arange(420, 680, 10.0)
+    out = resample(src[None], src, tgt, method="rebin")
+    assert out[0] == pytest.approx(tgt, abs=1e-2)
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+
+from MuseAnalysis import rfevents
+
+
+@pytest.fixture
+def series():
+    # 10 Hz log, 300 W forward, reflected bursts at 2-2.5 s and 6 s
+    t = np.arange(100) / 10 + 3.7e9
+    fwd = np.full(100, 300.0)
+    rev = np.full(100, 10.0)
+    rev[20:26] = 120.0
+    rev[23] = 150.0
+    rev[60] = 90.0
+    return t, fwd, rev
+
+
+def test_events(series):
+    t, fwd, rev = series
+    events = rfevents.detectEvents(t, fwd, rev, rate=None)
+    assert [(ev["start"], ev["end"], ev["n"]) for ev in events] == [(t[20], t[25], 6), (t[60], t[60], 1)]
+    assert events[0]["peak_t"] == t[23]
+    assert events[0]["peak_ratio"] == pytest.approx(0.5)
+
+    # the rate test also flags the falling edge after each burst
+    assert [ev["end"] for ev in rfevents.detectEvents(t, fwd, rev)] == [t[26], t[61]]
+
+    # without forward power the ratio is not used
+    assert rfevents.detectEvents(t, fwd * 0, rev, rate=None) == []
+
+    joined = rfevents.detectEvents(t, fwd, rev, rate=None, gap=4.0)
+    assert len(joined) == 1 and joined[0]["n"] == 7 and joined[0]["peak_rev"] == 150.0
+
+
+@pytest.mark.parametrize("size", [1, 3, 21, 25, 26, 100])
+def test_batches_match_whole(series, size):
+    t, fwd, rev = series
+    whole = rfevents.detectEvents(t, fwd, rev, gap=0.5)
+
+    det = rfevents.EventDetector(gap=0.5)
+    events = []
+    for i in range(0, len(t), size):
+        events += det.update(t[i:i + size], fwd[i:i + size], rev[i:i + size])
+    events += det.flush()
+    assert events == whole
+
+
+def test_tail_and_sources(tmp_path):
+    from MuseAnalysis.RF import RFpower
+    from MuseAnalysis.synthetic import makeShot, writeRFLog
+
+    fin = str(tmp_path / "RFLog1.txt")
+    writeRFLog(fin, duration=4)
+    batches = list(rfevents.tailPower(fin, interval=0.01, idle=0.02))
+    t = np.concatenate([b[0] for b in batches])
+    rf = RFpower(fin)
+    assert len(t) == len(rf.P_rev) == 20
+    assert np.allclose(np.concatenate([b[2] for b in batches]), rf.P_rev)
+
+    path = makeShot(str(tmp_path), "231223001", duration=10, daq_rate=100)
+    events = rfevents.sourceEvents(path, ratio=0.06)
+    assert events and all(ev["source"] == path for ev in events)
+    json.dumps(events)
+    assert rfevents.sourceEvents(str(tmp_path / "missing.txt")) == []
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from scipy.signal import savgol_filter
+
+from MuseAnalysis import savgol as sg
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    # many cores, so an ignored workers= would show up as 8 threads
+    monkeypatch.setattr(sg.os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(sg, "_pools", {})
+    return sg._pools
+
+
+@pytest.mark.parametrize("shape", [(10_000,), (3, 10_000)])
+@pytest.mark.parametrize("deriv", [0, 1])
+def test_workers_match_savgol_filter(pools, shape, deriv):
+    x = np.random.default_rng(0).standard_normal(shape)
+    ref = savgol_filter(x, 51, 3, deriv=deriv, mode="interp")
+
+    # workers=1 filters in one call, without a pool
+    out = sg.savgol(x, 51, 3, deriv=deriv, mode="interp", chunk=1000, workers=1)
+    assert pools == {}
+    assert np.array_equal(out, ref)
+
+    # workers=2 cuts 10 chunks and runs them on 2 threads
+    out = sg.savgol(x, 51, 3, deriv=deriv, mode="interp", chunk=1000, workers=2)
+    assert list(pools) == [2]
+    assert pools[2]._max_workers == 2
+    assert np.array_equal(out, ref)
+
+
+def test_default_workers_is_cpu_count(pools):
+    x = np.random.default_rng(1).standard_normal(5000)
+    out = sg.savgol(x, 21, 2, chunk=1000)
+    assert list(pools) == [8]
+    assert np.array_equal(out, savgol_filter(x, 21, 2))
+
+
+def test_one_thread_in_worker_processes(pools, monkeypatch):
+    # pool workers are already one per core
+    import multiprocessing
+    monkeypatch.setattr(multiprocessing, "parent_process", lambda: object())
+
+    x = np.random.default_rng(2).standard_normal(5000)
+    out = sg.savgol(x, 21, 2, chunk=1000)
+    assert pools == {}
+    assert np.array_equal(out, savgol_filter(x, 21, 2))
+
+
+def workerPools():
+    sg._pools.clear() # a forked worker starts with the parent's
+    sg.os.cpu_count = lambda: 8
+    sg.savgol(np.zeros(5000), 21, 2, chunk=1000)
+    return list(sg._pools)
+
+
+def test_worker_process_default():
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(1) as ex:
+        assert ex.submit(workerPools).result() == []
@@ -0,0 +1,37 @@
+import time
+
+from MuseAnalysis.scheduler import Pipeline, Stage
+
+
+def load(k):
+    # later shots load first
+    time.sleep(0.02 * (4 - k))
+    return k
+
+
+def fail(k):
+    raise RuntimeError(k)
+
+
+def test_ordered_stage_starts_in_order():
+    order = []
+    pipe = Pipeline(dict(load=Stage("thread", 4), render=Stage("thread", 1, ordered=True)))
+    for k in range(4):
+        fn = fail if k == 1 else load
+        pipe.add(("load", k), "load", fn, k, group=k)
+        pipe.add(("render", k), "render", order.append, after=[("load", k)], group=k)
+
+    results, errors = pipe.run()
+    assert order == [0, 2, 3] # a failed load does not hold up the rest
+    assert set(errors) == {("load", 1), ("render", 1)}
+
+
+def test_unordered_stage_starts_when_ready():
+    order = []
+    pipe = Pipeline(dict(load=Stage("thread", 4), render=Stage("thread", 1)))
+    for k in range(4):
+        pipe.add(("load", k), "load", load, k, group=k)
+        pipe.add(("render", k), "render", order.append, after=[("load", k)], group=k)
+
+    pipe.run()
+    assert order == [3, 2, 1, 0]
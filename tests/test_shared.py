@@ -0,0 +1,76 @@
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from MuseAnalysis import shared
+from MuseAnalysis.shared import SharedStore, attach, detach
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    yield
+    detach()
+
+
+def total(h):
+    try:
+        return float(attach(h).sum())
+    finally:
+        detach()
+
+
+@pytest.mark.parametrize("in_files", [False, True])
+def test_round_trip(tmp_path, in_files):
+    x = np.random.default_rng(0).standard_normal((100, 30))
+    with SharedStore(str(tmp_path) if in_files else None) as store:
+        h = store.put(x)
+        assert len(pickle.dumps(h)) < 500
+        y = attach(h)
+        assert np.array_equal(x, y) and not y.flags.writeable
+        assert attach(h) is y
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(1) as pool:
+            assert pool.submit(total, h).result() == pytest.approx(x.sum())
+        detach()
+
+    if in_files:
+        assert not os.path.exists(h.path)
+    else:
+        assert not os.path.exists("/dev/shm/" + h.name)
+
+
+def test_share_probe(tmp_path):
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.synthetic import makeShot
+
+    path = makeShot(str(tmp_path), "231223001", duration=5, daq_rate=1000)
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    with SharedStore() as store:
+        h = store.share(probe)
+        assert len(pickle.dumps(h)) < len(pickle.dumps(probe)) / 10
+        copy = attach(h)
+        assert type(copy) is DoubleProbe
+        assert np.array_equal(copy.AI0, probe.AI0)
+        # one array under several attributes stays one array
+        assert copy.AI0 is copy.raw["AI0"]
+        assert np.array_equal(copy.unix_time, probe.unix_time)
+        assert copy.plasmaWindow() == probe.plasmaWindow()
+        del copy
+        detach()
+
+
+def test_sweep_dead_owner(tmp_path):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    left = tmp_path / f"{shared.PREFIX}_{dead.pid}_0123abcd_x"
+    mine = tmp_path / f"{shared.PREFIX}_{os.getpid()}_0123abcd_x"
+    left.mkdir()
+    mine.mkdir()
+
+    shared.sweep(str(tmp_path))
+    assert not left.exists() and mine.exists()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis.OceanSpectra import OceanSpectra
+from MuseAnalysis.stack import SpectraStack
+
+
+@pytest.fixture
+def specs(tmp_path):
+    from MuseAnalysis.synthetic import writeSpectra
+
+    out = []
+    for seed in range(3):
+        fout = str(tmp_path / f"spec_23122300{seed}.txt")
+        writeSpectra(fout, duration=10, N_pixels=256, seed=seed)
+        out.append(OceanSpectra(fout))
+    return out
+
+
+def test_stack_matches_aligned_mean_and_variance(specs, tmp_path):
+    stack = SpectraStack(np.arange(-1500, 4000, 20.0), specs[0].spectral_axis, workdir=str(tmp_path / "work"))
+    for spec in specs:
+        stack.add(spec)
+
+    aligned = [stack.align(spec) for spec in specs]
+    assert all(np.array_equal(valid, aligned[0][1]) for x, valid in aligned)
+    rows = aligned[0][1]
+    x = np.stack([x for x, valid in aligned])
+
+    assert np.all(stack.count[rows] == 3) and np.all(stack.count[~rows] == 0)
+    assert np.allclose(stack.mean[rows], x.mean(axis=0))
+    assert np.allclose(stack.variance()[rows], x.var(axis=0, ddof=1))
+    assert np.array_equal(stack.min[rows], x.min(axis=0))
+    assert np.array_equal(stack.max[rows], x.max(axis=0))
+
+    # aligned to plasma start: dark before it, lines after
+    line = np.argmin(np.abs(stack.spectral_axis - 656.279))
+    t = stack.t_grid
+    assert stack.mean[(t > -400) & (t < -100), line].max() < 1500
+    assert stack.mean[(t > 500) & (t < 1500), line].min() > 3000
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis.synthetic import makeShot
+
+
+@pytest.mark.parametrize("fixed_width", [False, True])
+def test_shot_reads_back(tmp_path, fixed_width):
+    # every generated file parses with the package's own readers
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.OceanSpectra import OceanSpectra
+    from MuseAnalysis.RF import RFpower
+    from MuseAnalysis.archive import readSettings
+
+    root = str(tmp_path)
+    path = makeShot(root, "231223001", duration=4, daq_rate=500, rf_rate=5, integration=0.02,
+                    N_pixels=256, fixed_width=fixed_width)
+
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    assert len(probe.unix_time) == 2000
+    assert probe.timebase.dt == pytest.approx(1 / 500)
+
+    for log in ["RFLog1", "RFLog2"]:
+        rf = RFpower(path + log + ".txt")
+        assert len(rf.P_fwd) == len(rf.P_rev) == 20
+        assert np.all(rf.P_fwd >= rf.P_rev)
+        assert rf.P_fwd.max() == pytest.approx(300, rel=0.05)
+
+    spec = OceanSpectra(f"{root}/spectroscopy/spec_231223001.txt")
+    assert spec.data.shape == (200, 256)
+
+    assert readSettings(path + "settings.txt")["Shot"] == "231223001"
+
+
+def test_multi_probe_shot(tmp_path):
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+
+    path = makeShot(str(tmp_path), "231223001", duration=2, daq_rate=500, probes=3)
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    assert list(probe.channels.probes) == ["probe", "probe2", "probe3"]
+    assert probe.raw["AI7"].shape == (1000,)
+
+
+def test_seeded(tmp_path):
+    a = makeShot(str(tmp_path / "a"), "231223001", duration=2, seed=3)
+    b = makeShot(str(tmp_path / "b"), "231223001", duration=2, seed=3)
+    for name in ["NIDAQtext.txt", "RFLog1.txt"]:
+        with open(a + name) as fa, open(b + name) as fb:
+            assert fa.read() == fb.read()
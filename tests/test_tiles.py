@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from MuseAnalysis import tiles
+
+
+def test_minmax_pyramid():
+    y = np.random.default_rng(0).standard_normal(5000).astype(np.float32)
+    y[100:300] = np.nan # a gap
+    levels = tiles.minmaxPyramid(y, tile=1000)
+
+    assert [len(lo) for lo, hi in levels] == [5000, 2500, 1250, 625]
+    lo, hi = levels[2] # bins of 4 samples
+    assert np.array_equal(lo, np.fmin.reduce(y.reshape(-1, 4), axis=1), equal_nan=True)
+    assert np.array_equal(hi, np.fmax.reduce(y.reshape(-1, 4), axis=1), equal_nan=True)
+    assert np.isnan(lo[30]) and not np.isnan(lo[24]) # only all-NaN bins stay NaN
+
+
+def test_minmax_pyramid_odd_bin_carried():
+    levels = tiles.minmaxPyramid(np.arange(5.0), tile=2)
+    assert [lo.tolist() for lo, hi in levels] == [[0, 1, 2, 3, 4], [0, 2, 4], [0, 4]]
+    assert [hi.tolist() for lo, hi in levels] == [[0, 1, 2, 3, 4], [1, 3, 4], [3, 4]]
+
+
+def test_pool_rows():
+    Z = np.arange(20.0).reshape(2, 10)
+    assert tiles.poolRows(Z, rows=10)[1] == 1
+
+    out, g = tiles.poolRows(Z, rows=4)
+    assert g == 3
+    assert out.tolist() == [[2, 5, 8, 9], [12, 15, 18, 19]] # last group padded with NaN
+
+
+@pytest.fixture
+def shot(tmp_path):
+    from MuseAnalysis.synthetic import makeShot
+
+    makeShot(str(tmp_path / "data"), "231223001", duration=10, daq_rate=500)
+    return tiles.ShotTiles(str(tmp_path / "data" / "231223001"), str(tmp_path / "cache"))
+
+
+def test_shot_tiles(shot, tmp_path):
+    s = shot.index["series"]["shunt"]
+    assert s["n"] == 5000 and s["levels"] == 4
+
+    level = shot.npz["s/shunt/0"]
+    for k in range(5):
+        data = np.frombuffer(shot.series("shunt", 0, k), "<f4")
+        part = level[:, k*tiles.TILE:(k+1)*tiles.TILE]
+        assert np.array_equal(data, part.ravel())
+    assert len(shot.series("shunt", 0, 4)) == 2 * 4 * (5000 - 4*tiles.TILE)
+
+    for k in [5, 6, -1]:
+        with pytest.raises(IndexError):
+            shot.series("shunt", 0, k)
+
+    img = shot.index["images"]["spectra"]
+    Z = shot.npz["i/spectra/0"]
+    last = (img["n"] - 1) // tiles.IMAGE_TILE
+    data = np.frombuffer(shot.image("spectra", 0, last), "<f4")
+    assert np.array_equal(data, Z[last*tiles.IMAGE_TILE:].ravel())
+    with pytest.raises(IndexError):
+        shot.image("spectra", 0, last + 1)
+
+    # built once, no temporary files left, reused by the next server
+    cache = tmp_path / "cache"
+    assert sorted(p.suffix for p in cache.iterdir()) == [".json", ".npz"]
+    again = tiles.ShotTiles(shot.path, str(cache))
+    assert again.index == shot.index
+
+
+def test_server_404(shot, tmp_path):
+    server = tiles.TileServer(("127.0.0.1", 0), str(tmp_path / "data"), str(tmp_path / "cache"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/231223001"
+    try:
+        index = json.load(urllib.request.urlopen(url + "/index"))
+        assert "shunt" in index["series"]
+        assert len(urllib.request.urlopen(url + "/series/shunt/0/0").read()) == 8 * tiles.TILE
+        for tail in ["/series/shunt/0/5", "/series/shunt/9/0", "/image/spectra/0/99", "/series/nope/0/0"]:
+            with pytest.raises(urllib.error.HTTPError) as e:
+                urllib.request.urlopen(url + tail)
+            assert e.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
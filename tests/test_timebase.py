@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis.timebase import Timebase
+
+
+def jittered(path, i, shift):
+    # move sample i of a shot's NIDAQ clock by shift seconds
+    data = np.loadtxt(path + "NIDAQtext.txt", delimiter=",")
+    data[i, 0] += shift
+    np.savetxt(path + "NIDAQtext.txt", data, delimiter=",", fmt="%.6f")
+    return data[:, 0]
+
+
+@pytest.mark.parametrize("shift", [5e-6, 2e-6, -5e-6])
+def test_jitter_is_kept(shift):
+    t = 3786192000 + np.arange(10_000) / 1000
+    t[1234] += shift
+
+    tb = Timebase.fromSamples(t)
+    assert tb.uniform and len(tb.exc_i) <= 2
+    assert tb.values()[1234] == t[1234]
+    assert np.abs(tb.values() - t).max() <= 2 * np.spacing(t.max())
+
+
+def test_clean_clock_is_one_segment():
+    t = np.array([f"{v:.6f}" for v in 3786192000 + np.arange(20_000) / 20_000]).astype(float)
+    tb = Timebase.fromSamples(t)
+    assert (len(tb.seg_i), len(tb.exc_i)) == (1, 0)
+    assert np.abs(tb.values() - t).max() <= 2 * np.spacing(t.max())
+
+
+def test_jitter_survives_export_and_unpack(tmp_path):
+    from MuseAnalysis.archive import ShotArchive, exportShot, unpackShot
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+    from MuseAnalysis.synthetic import makeShot
+
+    path = makeShot(str(tmp_path / "data"), "231223001", duration=4, daq_rate=500)
+    t = jittered(path, 700, 5e-6)
+    tol = 2 * np.spacing(t.max())
+
+    with ShotArchive(exportShot(path)) as ar:
+        packed = ar.channel("time")
+        unpackShot(ar.fname, str(tmp_path / "unpacked"))
+    unpacked = DoubleProbe(str(tmp_path / "unpacked" / "NIDAQtext.txt")).unix_time
+
+    for out in [packed, unpacked]:
+        assert out[700] == t[700]
+        assert np.abs(out - t).max() <= tol
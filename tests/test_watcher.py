@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+
+import pytest
+
+from MuseAnalysis import watcher
+
+
+def writeShot(root, shot, size=10):
+    path = os.path.join(root, shot)
+    os.makedirs(path, exist_ok=True)
+    for name in watcher.REQUIRED:
+        with open(os.path.join(path, name), "w") as f:
+            f.write("x" * size)
+    return path
+
+
+def make(root, rc=0, **kwargs):
+    # the "analysis" appends the shot to runs.txt and exits with rc
+    code = ("import os, sys; open(os.environ['MUSE_DATA_PATH'] + 'runs.txt', 'a')"
+            f".write(sys.argv[1] + chr(10)); sys.exit({rc})")
+    return watcher.ShotWatcher(str(root), workers=1, settle=2.0, command=[sys.executable, "-c", code],
+                               log=lambda msg: None, **kwargs)
+
+
+def wait(w, now):
+    for future in list(w.running.values()):
+        future.result()
+    w.step(now)
+
+
+def runs(root):
+    try:
+        with open(root / "runs.txt") as f:
+            return f.read().split()
+    except OSError:
+        return []
+
+
+def test_waits_until_files_are_stable(tmp_path):
+    w = make(tmp_path)
+    writeShot(tmp_path, "231223001")
+
+    w.step(0.0) # first seen
+    w.step(1.0)
+    assert not w.running
+
+    writeShot(tmp_path, "231223001", size=20) # still growing
+    w.step(2.5)
+    w.step(4.0)
+    assert not w.running
+
+    w.step(4.5)
+    assert list(w.running) == ["231223001"]
+    wait(w, 5.0)
+    assert runs(tmp_path) == ["231223001"]
+    assert w.isDone("231223001")
+    with open(tmp_path / "231223001" / watcher.DONE) as f:
+        assert json.load(f)["returncode"] == 0
+
+
+def test_missing_file_is_not_analysed(tmp_path):
+    w = make(tmp_path)
+    writeShot(tmp_path, "231223001")
+    os.remove(tmp_path / "231223001" / "settings.txt")
+    for now in range(10):
+        w.step(float(now))
+    assert not w.running and runs(tmp_path) == []
+
+
+@pytest.mark.parametrize("retry", [False, True])
+def test_retry_failed(tmp_path, retry):
+    w = make(tmp_path, rc=1, retry_failed=retry, retry_after=10.0)
+    writeShot(tmp_path, "231223001")
+
+    w.step(0.0)
+    w.step(2.0)
+    wait(w, 3.0)
+    assert runs(tmp_path) == ["231223001"]
+
+    # not before retry_after, then once the files have settled again
+    for now in [5.0, 12.0, 13.0, 15.0]:
+        w.step(now)
+    if w.running:
+        wait(w, 16.0)
+    assert runs(tmp_path) == ["231223001"] * (2 if retry else 1)
+    assert w.isDone("231223001") != retry
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from MuseAnalysis import window
+
+
+@pytest.fixture(scope="module")
+def path(tmp_path_factory):
+    from MuseAnalysis.synthetic import makeShot
+
+    return makeShot(str(tmp_path_factory.mktemp("data")), "231223001", duration=10, daq_rate=1000)
+
+
+def test_window_of_synthetic_shot(path):
+    # the plasma is on from 2 to 7 s, trimmed by the 0.2 s margin
+    from MuseAnalysis.archive import exportShot
+
+    out = window.shotWindow(path)
+    assert out["n_rf"] == 2
+    assert out["t0"] == pytest.approx(2.2, abs=0.1)
+    assert out["t1"] == pytest.approx(6.8, abs=0.1)
+
+    archived = window.shotWindow(exportShot(path))
+    assert (archived["t0"], archived["t1"]) == (out["t0"], out["t1"])
+
+
+def test_window_without_rf(path):
+    from MuseAnalysis.DoubleProbe import DoubleProbe
+
+    probe = DoubleProbe(path + "NIDAQtext.txt")
+    t0, t1 = probe.plasmaWindow()
+    assert (t0, t1) == pytest.approx((2.2, 6.8), abs=0.1)
+    assert probe.window == (t0, t1)
+
+
+def test_no_step_is_no_window():
+    x = np.random.default_rng(0).standard_normal((2, 5000))
+    S = window.scale(window.smooth(x, 100), window.noiseLevel(x) / 10)
+    assert np.isnan(S).all()
+
+
+def test_helpers():
+    assert window.longestRun(np.array([0, 1, 1, 0, 1, 1, 1, 0], bool)) == (4, 7)
+    assert window.longestRun(np.zeros(5, bool)) is None
+
+    x = np.arange(10.0)[None]
+    assert np.allclose(window.smooth(x, 3)[0, 1:-1], x[0, 1:-1])
+    assert window.smooth(x, 3)[0, 0] == 0.5 # edges shrink